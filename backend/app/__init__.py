@@ -2,17 +2,15 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from flask_caching import Cache
-from redis import Redis
+from redis import Redis, ConnectionPool
 from config import Config
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
-bcrypt = Bcrypt()
 redis_client = Redis()
 cache = Cache()
 
@@ -22,11 +20,17 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Engine options and SQLite pragmas for the configured database
+    from app.db_profiles import engine_options, init_engine_profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+        engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    
     # Initialize extensions with app
     db.init_app(app)
+    init_engine_profile(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
-    bcrypt.init_app(app)
     
     # ✅ CRITICAL: Enable CORS for Vue.js frontend
     CORS(app, resources={
@@ -55,10 +59,34 @@ def create_app(config_class=Config):
     
     # Initialize Redis
     try:
-        redis_client.from_url(app.config['REDIS_URL'])
+        redis_client.connection_pool = ConnectionPool.from_url(app.config['REDIS_URL'])
     except Exception as e:
         app.logger.warning(f"Redis connection failed: {e}")
     
+    # Initialize slot engine
+    from app.services.slots import slot_engine
+    slot_engine.init_app(app)
+    
+    # Initialize slot change events
+    from app.services.slot_events import slot_events
+    slot_events.init_app(app)
+    
+    # bcrypt work factor and hashing pool
+    from app.services.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    # Token-bucket limits on login, registration and booking
+    from app.services.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+    
+    # Revoke access tokens of deactivated and deleted users
+    from app.services.token_revocation import token_revocation
+    token_revocation.init_app(app)
+    
+    # Shared user identity cache (Redis with an in-process L1)
+    from app.services.identity_cache import identity_cache
+    identity_cache.init_app(app)
+    
     # Initialize Celery
     global celery
     from app.celery_config import make_celery
@@ -72,6 +100,11 @@ def create_app(config_class=Config):
         app.register_blueprint(doctor.bp)
         app.register_blueprint(patient.bp)
     
+    # flask stats rebuild|check
+    from app.commands import stats_cli, archive_cli
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(archive_cli)
+    
     # ✅ Add a health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -57,6 +57,15 @@ def make_celery(app):
                 }
             },
             
+            # 5 Archive Old Appointments - Daily at 2:00 AM
+            'archive-old-appointments': {
+                'task': 'app.tasks.archive.archive_old_appointments',
+                'schedule': crontab(hour=2, minute=0),  # 2:00 AM daily
+                'options': {
+                    'expires': 3600,  # Task expires after 1 hour
+                }
+            },
+            
             # Uncomment to test if beat scheduler is working
             'test-beat-schedule': {
                 'task': 'app.tasks.cleanup.cleanup_old_availability',
@@ -79,6 +88,8 @@ def make_celery(app):
             'app.tasks.send_daily_reminders': {'queue': 'high_priority'},
             'app.tasks.send_monthly_reports': {'queue': 'low_priority'},
             'app.tasks.export_patient_treatments': {'queue': 'medium_priority'},
+            'app.tasks.archive.archive_old_appointments': {'queue': 'low_priority'},
+            'app.tasks.cascade_delete.permanent_delete': {'queue': 'low_priority'},
         },
         
         # Task time limits
@@ -0,0 +1,68 @@
+from flask.cli import AppGroup
+from app import db
+from app.services.daily_stats import rebuild_daily_stats, check_daily_stats, refresh_daily_stats
+from app.services.archive import archive_appointments, archive_cutoff
+from datetime import date, timedelta
+import click
+
+stats_cli = AppGroup('stats', help='Daily doctor statistics rollup (daily_doctor_stats).')
+archive_cli = AppGroup('archive', help='Cold storage of old appointments (appointments_archive).')
+
+
+def _scope_options(command):
+    command = click.option('--doctor-id', type=int, help='Only this doctor')(command)
+    command = click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day (YYYY-MM-DD)')(command)
+    command = click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day (YYYY-MM-DD)')(command)
+    return command
+
+
+@stats_cli.command('rebuild')
+@_scope_options
+def rebuild(doctor_id, start, end):
+    """Backfill or rebuild the rollup from appointments."""
+    written = rebuild_daily_stats(doctor_id, start and start.date(), end and end.date())
+    db.session.commit()
+    click.echo(f'Rebuilt {written} daily rollup rows')
+
+
+@stats_cli.command('check')
+@_scope_options
+@click.option('--repair', is_flag=True, help='Recompute the doctor-days that differ')
+def check(doctor_id, start, end, repair):
+    """Compare the rollup against appointments; exits 1 on differences."""
+    mismatches = check_daily_stats(doctor_id, start and start.date(), end and end.date())
+    for mismatch in mismatches[:50]:
+        click.echo(f"doctor {mismatch['doctor_id']} {mismatch['day']} {mismatch['field']}: "
+                   f"rollup={mismatch['rollup']} actual={mismatch['actual']}")
+    if len(mismatches) > 50:
+        click.echo(f'... and {len(mismatches) - 50} more')
+
+    days = {(mismatch['doctor_id'], mismatch['day']) for mismatch in mismatches}
+    if not days:
+        click.echo('Rollup is consistent with appointments')
+        return
+    if repair:
+        refresh_daily_stats(days)
+        db.session.commit()
+        click.echo(f'Repaired {len(days)} doctor-days')
+        return
+    click.echo(f'{len(days)} doctor-days differ; run with --repair to fix them')
+    raise SystemExit(1)
+
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, help='Override ARCHIVE_AFTER_DAYS')
+@click.option('--batch-size', type=int, help='Override ARCHIVE_BATCH_SIZE')
+@click.option('--all', 'run_all', is_flag=True, help='Keep going past ARCHIVE_MAX_BATCHES until done')
+def run_archive(older_than_days, batch_size, run_all):
+    """Move old completed and cancelled appointments to the archive tables."""
+    cutoff = date.today() - timedelta(days=older_than_days) if older_than_days is not None else archive_cutoff()
+    archived = 0
+    while True:
+        result = archive_appointments(cutoff, batch_size)
+        archived += result['archived']
+        if result['done'] or not run_all:
+            break
+    click.echo(f'Archived {archived} appointments dated before {cutoff}')
+    if not result['done']:
+        click.echo('More remain; run again or pass --all')
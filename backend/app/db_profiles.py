@@ -0,0 +1,68 @@
+from app import db
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Config key -> PRAGMA, in the order they are applied. busy_timeout goes
+# first so switching journal mode waits out other connections.
+SQLITE_PRAGMAS = [
+    ('SQLITE_BUSY_TIMEOUT', 'busy_timeout'),
+    ('SQLITE_JOURNAL_MODE', 'journal_mode'),
+    ('SQLITE_SYNCHRONOUS', 'synchronous'),
+    ('SQLITE_CACHE_SIZE', 'cache_size'),
+    ('SQLITE_MMAP_SIZE', 'mmap_size'),
+]
+
+
+def is_sqlite(config):
+    return make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """
+    SQLAlchemy engine options for the configured database. SQLite keeps
+    SQLAlchemy's default pool (one connection per thread is cheap); a
+    server database gets a sized, pre-pinged, recycled pool.
+    """
+    if is_sqlite(config):
+        return {}
+    return {
+        'pool_size': config.get('DATABASE_POOL_SIZE', 10),
+        'max_overflow': config.get('DATABASE_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DATABASE_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DATABASE_POOL_PRE_PING', True),
+    }
+
+
+def sqlite_pragmas(config):
+    """[(pragma, value)] for the SQLite settings that are not None"""
+    return [
+        (pragma, config[key]) for key, pragma in SQLITE_PRAGMAS
+        if config.get(key) is not None
+    ]
+
+
+def init_engine_profile(app):
+    """Run the SQLite pragmas on every connection the app's engine opens"""
+    if not is_sqlite(app.config):
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+    if not pragmas:
+        return
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            try:
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+            except Exception as e:
+                # e.g. a read-only file can't switch to WAL; run without it
+                logger.warning(f"Could not apply PRAGMA {pragma}: {str(e)}")
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', apply_pragmas)
@@ -3,5 +3,10 @@ from app.models.department import Department
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
 from app.models.availability import DoctorAvailability
+from app.models.availability_rule import AvailabilityRule
+from app.models.waitlist import WaitlistEntry
+from app.models.daily_stats import DailyDoctorStats
+from app.models.archive import ArchivedAppointment, ArchivedTreatment
 
-__all__ = ['User', 'Department', 'Appointment', 'Treatment', 'DoctorAvailability']
\ No newline at end of file
+__all__ = ['User', 'Department', 'Appointment', 'Treatment', 'DoctorAvailability', 'AvailabilityRule', 'WaitlistEntry',
+           'DailyDoctorStats', 'ArchivedAppointment', 'ArchivedTreatment']
\ No newline at end of file
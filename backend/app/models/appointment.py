@@ -3,6 +3,36 @@ from datetime import datetime
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Only one booked appointment may hold a doctor's slot
+        db.Index(
+            'uq_appointments_booked_slot',
+            'doctor_id', 'appointment_date', 'appointment_time',
+            unique=True,
+            sqlite_where=db.text("status = 'booked'"),
+            postgresql_where=db.text("status = 'booked'")
+        ),
+        # Doctor schedules, dashboards, capacity and booking conflict checks
+        db.Index('ix_appointments_doctor_date_status', 'doctor_id', 'appointment_date', 'status'),
+        # Patient dashboard, appointment lists and history
+        db.Index('ix_appointments_patient_status_date', 'patient_id', 'status', 'appointment_date'),
+        # Daily reminders and missed-appointment cancellation only look at
+        # booked rows, a small fraction of the table once history builds up
+        db.Index(
+            'ix_appointments_booked_date',
+            'appointment_date', 'appointment_time',
+            sqlite_where=db.text("status = 'booked'"),
+            postgresql_where=db.text("status = 'booked'")
+        ),
+        # Admin dashboard recent appointments
+        db.Index('ix_appointments_created_at', 'created_at'),
+        # Cursor-paged appointment listings seek on (date, time, id), newest first
+        db.Index('ix_appointments_date_time', 'appointment_date', 'appointment_time', 'id'),
+        db.Index('ix_appointments_doctor_date_time', 'doctor_id', 'appointment_date', 'appointment_time', 'id'),
+        # Archived appointments keep their ids (appointments_archive), so
+        # SQLite must never hand an archived id out again
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -0,0 +1,59 @@
+from app import db
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from datetime import datetime
+
+
+class ArchivedAppointment(db.Model):
+    """
+    A completed or cancelled appointment moved out of the live table by
+    app.services.archive once it is older than ARCHIVE_AFTER_DAYS. Keeps
+    the live id and columns, so it serializes like an Appointment.
+    """
+    __tablename__ = 'appointments_archive'
+    __table_args__ = (
+        # Patient history and exports
+        db.Index('ix_appointments_archive_patient_date', 'patient_id', 'appointment_date'),
+        # Daily rollup refresh and rebuild by doctor-day
+        db.Index('ix_appointments_archive_doctor_date', 'doctor_id', 'appointment_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    appointment_date = db.Column(db.Date, nullable=False)
+    appointment_time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20))
+    reason = db.Column(db.Text)
+    consultation_fee = db.Column(db.Numeric(10, 2))
+    payment_status = db.Column(db.String(20))
+    payment_method = db.Column(db.String(20))
+    transaction_id = db.Column(db.String(100))
+    refund_status = db.Column(db.String(20))
+    refund_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    patient = db.relationship('User', foreign_keys=[patient_id])
+    doctor = db.relationship('User', foreign_keys=[doctor_id])
+    treatment = db.relationship('ArchivedTreatment', backref='appointment', uselist=False)
+
+    to_dict = Appointment.to_dict
+
+
+class ArchivedTreatment(db.Model):
+    """The treatment of an archived appointment, keeping its live id"""
+    __tablename__ = 'treatments_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments_archive.id'),
+                               nullable=False, unique=True)
+    diagnosis = db.Column(db.Text, nullable=False)
+    prescription = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    next_visit_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+    to_dict = Treatment.to_dict
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class DoctorAvailability(db.Model):
     __tablename__ = 'doctor_availability'
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', name='uq_doctor_availability_doctor_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -12,6 +15,8 @@ class DoctorAvailability(db.Model):
     is_available = db.Column(db.Boolean, default=True)
     lunch_break_start = db.Column(db.Time, nullable=True)
     lunch_break_end = db.Column(db.Time, nullable=True)
+    # Bookable 10-minute slots, kept in sync by app.services.slots
+    slot_capacity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def slot_str(self):
@@ -0,0 +1,88 @@
+from app import db
+from datetime import datetime, date
+
+
+class AvailabilityRule(db.Model):
+    """Recurring weekly working hours; expanded to dates on read, never stored per day"""
+    __tablename__ = 'availability_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    lunch_break_start = db.Column(db.Time, nullable=True)
+    lunch_break_end = db.Column(db.Time, nullable=True)
+    effective_from = db.Column(db.Date, nullable=False)
+    effective_until = db.Column(db.Date, nullable=True)  # open-ended when empty
+    exception_dates = db.Column(db.Text, default='')  # comma-separated YYYY-MM-DD
+    # Bookable 10-minute slots per day, kept in sync by app.services.slots
+    slot_capacity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def exceptions(self):
+        return {
+            date.fromisoformat(value)
+            for value in (self.exception_dates or '').split(',') if value
+        }
+    
+    @exceptions.setter
+    def exceptions(self, dates):
+        self.exception_dates = ','.join(sorted(d.isoformat() for d in dates))
+    
+    def applies_on(self, day):
+        if day.weekday() != self.weekday or day < self.effective_from:
+            return False
+        if self.effective_until and day > self.effective_until:
+            return False
+        return day not in self.exceptions
+    
+    def expand(self, day):
+        """Availability for one date generated from this rule"""
+        return ExpandedAvailability(self, day)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'doctor_id': self.doctor_id,
+            'weekday': self.weekday,
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M'),
+            'lunch_break_start': self.lunch_break_start.strftime('%H:%M') if self.lunch_break_start else None,
+            'lunch_break_end': self.lunch_break_end.strftime('%H:%M') if self.lunch_break_end else None,
+            'effective_from': self.effective_from.isoformat(),
+            'effective_until': self.effective_until.isoformat() if self.effective_until else None,
+            'exception_dates': sorted(d.isoformat() for d in self.exceptions)
+        }
+
+
+class ExpandedAvailability:
+    """Read-only stand-in for a DoctorAvailability row produced by a rule"""
+    
+    is_available = True
+    
+    def __init__(self, rule, day):
+        self.id = None
+        self.rule_id = rule.id
+        self.doctor_id = rule.doctor_id
+        self.date = day
+        self.start_time = rule.start_time
+        self.end_time = rule.end_time
+        self.lunch_break_start = rule.lunch_break_start
+        self.lunch_break_end = rule.lunch_break_end
+        self.slot_capacity = rule.slot_capacity
+    
+    def to_dict(self):
+        return {
+            # Stable key for clients; not a DoctorAvailability id
+            'id': f'rule-{self.rule_id}-{self.date.isoformat()}',
+            'rule_id': self.rule_id,
+            'doctor_id': self.doctor_id,
+            'date': self.date.isoformat(),
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M'),
+            'is_available': True,
+            'lunch_break_start': self.lunch_break_start.strftime('%H:%M') if self.lunch_break_start else None,
+            'lunch_break_end': self.lunch_break_end.strftime('%H:%M') if self.lunch_break_end else None,
+        }
@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+
+
+class DailyDoctorStats(db.Model):
+    """
+    One doctor's appointments on one date, rolled up. Maintained by
+    app.services.daily_stats whenever appointments change; rebuild with
+    `flask stats rebuild`, verify with `flask stats check`.
+    """
+    __tablename__ = 'daily_doctor_stats'
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'day', name='uq_daily_doctor_stats_doctor_day'),
+        # Hospital-wide dashboards and reports by date range
+        db.Index('ix_daily_doctor_stats_day', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    refunded = db.Column(db.Integer, nullable=False, default=0)  # refund approved/completed
+    paid_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    patients = db.Column(db.Integer, nullable=False, default=0)  # distinct that day
+    hour_counts = db.Column(db.JSON, nullable=False, default=list)  # 24 appointment counts by hour
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'doctor_id': self.doctor_id,
+            'day': self.day.isoformat(),
+            'total': self.total,
+            'booked': self.booked,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'refunded': self.refunded,
+            'paid_revenue': float(self.paid_revenue),
+            'patients': self.patients,
+            'hour_counts': self.hour_counts
+        }
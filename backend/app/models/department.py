@@ -14,5 +14,5 @@ class Department(db.Model):
             'id': self.id,
             'name': self.name,
             'description': self.description,
-            'doctors_count': len(self.doctors)
+            'doctors_count': self.doctors.count()
         }
\ No newline at end of file
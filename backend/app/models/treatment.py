@@ -3,6 +3,8 @@ from datetime import datetime
 
 class Treatment(db.Model):
     __tablename__ = 'treatments'
+    # Ids stay unique across treatments_archive too (see Appointment)
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), 
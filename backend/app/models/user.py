@@ -1,8 +1,14 @@
-from app import db, bcrypt
+from app import db
 from datetime import datetime
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Doctor and patient listings filter on role and active flag
+        db.Index('ix_users_role_active', 'role', 'is_active'),
+        # Cursor-paged doctor and patient listings seek on id within a role
+        db.Index('ix_users_role_id', 'role', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -25,7 +31,7 @@ class User(db.Model):
     consultation_fee = db.Column(db.Numeric(10, 2), default=0.0)
     
     # Relationships
-    specialization = db.relationship('Department', backref='doctors')
+    specialization = db.relationship('Department', backref=db.backref('doctors', lazy='dynamic'))
     doctor_appointments = db.relationship('Appointment', 
                                          foreign_keys='Appointment.doctor_id',
                                          backref='doctor', 
@@ -38,12 +44,25 @@ class User(db.Model):
                                           cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash and set password (app.services.passwords worker pool)"""
+        from app.services.passwords import password_hasher
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verify password"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        from app.services.passwords import password_hasher
+        return password_hasher.verify(password, self.password_hash)
+    
+    def rehash_password_if_needed(self, password):
+        """
+        After a successful login, re-hash at the configured cost if the stored
+        hash used another one. Returns True when password_hash changed.
+        """
+        from app.services.passwords import password_hasher
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        self.password_hash = password_hasher.hash(password)
+        return True
     
     def to_dict(self):
         data = {
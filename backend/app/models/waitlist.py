@@ -0,0 +1,40 @@
+from app import db
+from datetime import datetime
+
+
+class WaitlistEntry(db.Model):
+    """A patient waiting for any slot with a doctor on one date"""
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        db.Index('ix_waitlist_doctor_date_status', 'doctor_id', 'date', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default='waiting')  # waiting, offered, booked, expired, cancelled
+    # Slot held for the patient while status is offered
+    offered_time = db.Column(db.Time, nullable=True)
+    offer_expires_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    patient = db.relationship('User', foreign_keys=[patient_id])
+    doctor = db.relationship('User', foreign_keys=[doctor_id])
+    
+    @property
+    def has_active_offer(self):
+        return self.status == 'offered' and self.offer_expires_at > datetime.utcnow()
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'patient_id': self.patient_id,
+            'doctor_id': self.doctor_id,
+            'doctor_name': self.doctor.full_name,
+            'date': self.date.isoformat(),
+            'status': self.status,
+            'offered_time': self.offered_time.strftime('%H:%M') if self.offered_time else None,
+            'offer_expires_at': self.offer_expires_at.isoformat() if self.offer_expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -1,12 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app import cache
 from app.models import User, Department, Appointment, DoctorAvailability
 from app.utils.decorators import role_required, get_current_user
-from app.utils.validators import validate_date, validate_time, validate_email, validate_phone
+from app.utils.schemas import USER, APPOINTMENT
+from app.utils.pagination import wants_cursor, request_keyset_page, InvalidCursor, APPOINTMENTS, USERS
+from app.utils.validators import validate_email, validate_phone
 from datetime import datetime, date, timedelta
-from sqlalchemy import or_, func
+from app.services.slots import slot_engine, SLOT_MINUTES
+from app.services.booking import commit_slot_change, SlotConflict, BookingBusy
+from app.services.slot_validation import claim_slot, release_claim, SlotRejected
+from app.services.capacity import parse_calendar_args, doctor_calendar
+from app.services.availability import effective_availability_range
+from app.services.departments import department_listing, invalidate_department_listing
+from app.services.dashboard_stats import appointment_stats
+from app.services.cascade_delete import CascadeDelete
+from app.services.user_search import user_search
+from app.services.rate_limit import rate_limiter
+from app.services.passwords import HashingBusy
+from app.services.token_revocation import RevocationUnavailable
+from app.services.waitlist import free_slot
+from app.services.batch_booking import book_batch, summarize_booking_results
+from app.services.availability_bulk import bulk_set_availability, summarize_results
+from app.tasks.booking_notifications import send_bulk_booking_notifications
+from app.tasks.cascade_delete import permanent_delete
+import logging
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -18,44 +39,52 @@ bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 @cache.cached(timeout=60, key_prefix='admin_dashboard')
 def dashboard():
     """Admin dashboard statistics"""
-    total_doctors = User.query.filter_by(role='doctor', is_active=True).count()
-    total_patients = User.query.filter_by(role='patient', is_active=True).count()
-    total_appointments = Appointment.query.count()
-    
-    # Appointments by status
-    booked = Appointment.query.filter_by(status='booked').count()
-    completed = Appointment.query.filter_by(status='completed').count()
-    cancelled = Appointment.query.filter_by(status='cancelled').count()
+    # User and appointment counts in one aggregate query
+    stats = appointment_stats(include_users=True)
     
     # Recent appointments (last 10)
-    recent_appointments = Appointment.query.order_by(
+    recent_appointments = APPOINTMENT.query(Appointment.query).order_by(
         Appointment.created_at.desc()
     ).limit(10).all()
     
     return jsonify({
         'statistics': {
-            'total_doctors': total_doctors,
-            'total_patients': total_patients,
-            'total_appointments': total_appointments,
-            'booked_appointments': booked,
-            'completed_appointments': completed,
-            'cancelled_appointments': cancelled
+            'total_doctors': stats['active_doctors'],
+            'total_patients': stats['active_patients'],
+            'total_appointments': stats['total'],
+            'booked_appointments': stats['booked'],
+            'completed_appointments': stats['completed'],
+            'cancelled_appointments': stats['cancelled']
         },
-        'recent_appointments': [apt.to_dict() for apt in recent_appointments],
+        'recent_appointments': APPOINTMENT.dump_many(recent_appointments),
         'cached': True
     }), 200
 
 
+@bp.route('/rate-limits', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def rate_limit_counters():
+    """Configured rate limit policies with allowed and throttled request counts"""
+    return jsonify({
+        'enabled': rate_limiter.enabled,
+        'policies': {
+            policy: {name: {'burst': burst, 'seconds': seconds} for name, (burst, seconds) in limits.items()}
+            for policy, limits in rate_limiter.policies.items()
+        },
+        'counters': rate_limiter.counters()
+    }), 200
+
+
 # ==================== DEPARTMENT/SPECIALIZATION MANAGEMENT ✓ ENHANCED ====================
 
 @bp.route('/departments', methods=['GET'])
 @jwt_required()
 @role_required('admin')
 def get_departments():
-    """Get all departments"""
-    departments = Department.query.all()
+    """Get all departments with doctor counts"""
     return jsonify({
-        'departments': [dept.to_dict() for dept in departments]
+        'departments': department_listing()
     }), 200
 
 
@@ -82,7 +111,7 @@ def add_department():
     db.session.commit()
     
     # Clear cache
-    cache.delete('all_departments')
+    invalidate_department_listing()
     
     return jsonify({
         'message': 'Department added successfully',
@@ -115,7 +144,7 @@ def update_department(dept_id):
     db.session.commit()
     
     # Clear cache
-    cache.delete('all_departments')
+    invalidate_department_listing()
     
     return jsonify({
         'message': 'Department updated successfully',
@@ -144,7 +173,7 @@ def delete_department(dept_id):
     db.session.commit()
     
     # Clear cache
-    cache.delete('all_departments')
+    invalidate_department_listing()
     
     return jsonify({'message': 'Department deleted successfully'}), 200
 
@@ -160,21 +189,23 @@ def get_doctors():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    query = User.query.filter_by(role='doctor')
+    query = USER.query(User.query.filter_by(role='doctor'))
+    rank = User.id
     
     if search:
-        query = query.filter(
-            or_(
-                User.full_name.ilike(f'%{search}%'),
-                User.username.ilike(f'%{search}%'),
-                User.email.ilike(f'%{search}%')
-            )
-        )
+        query, rank = user_search.apply(query, search, ('full_name', 'username', 'email'))
     
-    doctors = query.paginate(page=page, per_page=per_page, error_out=False)
+    if wants_cursor():
+        try:
+            listing = request_keyset_page(query, USERS, default_limit=10)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(dict({'doctors': USER.dump_many(listing.items)}, **listing.meta())), 200
+    
+    doctors = query.order_by(rank, User.id).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'doctors': [doctor.to_dict() for doctor in doctors.items],
+        'doctors': USER.dump_many(doctors.items),
         'total': doctors.total,
         'pages': doctors.pages,
         'current_page': page
@@ -253,13 +284,17 @@ def add_doctor():
         experience_years=data.get('experience_years', 0),
         consultation_fee=data.get('consultation_fee', 0.0)
     )
-    doctor.set_password(data['password'])
+    try:
+        doctor.set_password(data['password'])
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     db.session.add(doctor)
     db.session.commit()
     
     # Clear cache
     cache.delete('admin_dashboard')
+    invalidate_department_listing()
     
     return jsonify({
         'message': 'Doctor added successfully',
@@ -295,7 +330,11 @@ def update_doctor(doctor_id):
     
     # Update password if provided
     if 'password' in data and data['password']:
-        doctor.set_password(data['password'])
+        try:
+            doctor.set_password(data['password'])
+        except HashingBusy:
+            db.session.rollback()
+            return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     # Update other fields
     if 'full_name' in data:
@@ -313,7 +352,15 @@ def update_doctor(doctor_id):
     if 'is_active' in data:
         doctor.is_active = data['is_active']
     
-    db.session.commit()
+    try:
+        db.session.commit()
+    except RevocationUnavailable:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    
+    # Moving or deactivating a doctor changes the department counts
+    if 'specialization_id' in data or 'is_active' in data:
+        invalidate_department_listing()
     
     return jsonify({
         'message': 'Doctor updated successfully',
@@ -333,10 +380,15 @@ def delete_doctor(doctor_id):
     
     # Soft delete - just deactivate
     doctor.is_active = False
-    db.session.commit()
+    try:
+        db.session.commit()
+    except RevocationUnavailable:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     # Clear cache
     cache.delete('admin_dashboard')
+    invalidate_department_listing()
     
     return jsonify({'message': 'Doctor deactivated successfully'}), 200
 
@@ -352,22 +404,23 @@ def get_patients():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    query = User.query.filter_by(role='patient')
+    query = USER.query(User.query.filter_by(role='patient'))
+    rank = User.id
     
     if search:
-        query = query.filter(
-            or_(
-                User.full_name.ilike(f'%{search}%'),
-                User.username.ilike(f'%{search}%'),
-                User.email.ilike(f'%{search}%'),
-                User.phone.ilike(f'%{search}%')
-            )
-        )
+        query, rank = user_search.apply(query, search)
     
-    patients = query.paginate(page=page, per_page=per_page, error_out=False)
+    if wants_cursor():
+        try:
+            listing = request_keyset_page(query, USERS, default_limit=10)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(dict({'patients': USER.dump_many(listing.items)}, **listing.meta())), 200
+    
+    patients = query.order_by(rank, User.id).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'patients': [patient.to_dict() for patient in patients.items],
+        'patients': USER.dump_many(patients.items),
         'total': patients.total,
         'pages': patients.pages,
         'current_page': page
@@ -385,12 +438,14 @@ def get_patient(patient_id):
         return jsonify({'error': 'Patient not found'}), 404
     
     # Get patient's appointments
-    appointments = patient.patient_appointments.order_by(
+    appointments = APPOINTMENT.query(Appointment.query).filter_by(
+        patient_id=patient.id
+    ).order_by(
         Appointment.appointment_date.desc()
     ).limit(10).all()
     
     patient_data = patient.to_dict()
-    patient_data['recent_appointments'] = [apt.to_dict() for apt in appointments]
+    patient_data['recent_appointments'] = APPOINTMENT.dump_many(appointments)
     
     return jsonify(patient_data), 200
 
@@ -423,7 +478,11 @@ def update_patient(patient_id):
     
     # Update password if provided
     if 'password' in data and data['password']:
-        patient.set_password(data['password'])
+        try:
+            patient.set_password(data['password'])
+        except HashingBusy:
+            db.session.rollback()
+            return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     # Update other fields
     if 'full_name' in data:
@@ -433,7 +492,11 @@ def update_patient(patient_id):
     if 'is_active' in data:
         patient.is_active = data['is_active']
     
-    db.session.commit()
+    try:
+        db.session.commit()
+    except RevocationUnavailable:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     return jsonify({
         'message': 'Patient updated successfully',
@@ -453,7 +516,11 @@ def delete_patient(patient_id):
     
     # Soft delete
     patient.is_active = False
-    db.session.commit()
+    try:
+        db.session.commit()
+    except RevocationUnavailable:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     
     return jsonify({'message': 'Patient deactivated successfully'}), 200
 
@@ -469,18 +536,25 @@ def get_all_appointments():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    query = Appointment.query
+    query = APPOINTMENT.query(Appointment.query)
     
     if status:
         query = query.filter_by(status=status)
     
+    if wants_cursor():
+        try:
+            listing = request_keyset_page(query, APPOINTMENTS)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(dict({'appointments': APPOINTMENT.dump_many(listing.items)}, **listing.meta())), 200
+    
     appointments = query.order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'appointments': [apt.to_dict() for apt in appointments.items],
+        'appointments': APPOINTMENT.dump_many(appointments.items),
         'total': appointments.total,
         'pages': appointments.pages,
         'current_page': page
@@ -502,33 +576,54 @@ def search():
     
     results = {}
     
+    # Best full-text matches first; every word matches as a prefix
     if search_type in ['all', 'doctor']:
-        doctors = User.query.filter(
-            User.role == 'doctor',
-            or_(
-                User.full_name.ilike(f'%{query}%'),
-                User.username.ilike(f'%{query}%'),
-                User.email.ilike(f'%{query}%')
-            )
-        ).limit(10).all()
-        results['doctors'] = [doc.to_dict() for doc in doctors]
+        doctors, rank = user_search.apply(
+            USER.query(User.query).filter(User.role == 'doctor'), query, ('full_name', 'username', 'email')
+        )
+        results['doctors'] = USER.dump_many(doctors.order_by(rank, User.id).limit(10).all())
     
     if search_type in ['all', 'patient']:
-        patients = User.query.filter(
-            User.role == 'patient',
-            or_(
-                User.full_name.ilike(f'%{query}%'),
-                User.username.ilike(f'%{query}%'),
-                User.email.ilike(f'%{query}%'),
-                User.phone.ilike(f'%{query}%')
-            )
-        ).limit(10).all()
-        results['patients'] = [pat.to_dict() for pat in patients]
+        patients, rank = user_search.apply(USER.query(User.query).filter(User.role == 'patient'), query)
+        results['patients'] = USER.dump_many(patients.order_by(rank, User.id).limit(10).all())
     
     return jsonify(results), 200
 
 # ==================== APPOINTMENT MANAGEMENT ====================
 
+@bp.route('/appointments/batch', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def book_appointments_batch():
+    """Front desk can book many appointments at once; each item succeeds or fails on its own"""
+    data = request.get_json() or {}
+    items = data.get('appointments')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Appointments must be a non-empty list'}), 400
+    
+    limit = current_app.config['BOOKING_BATCH_LIMIT']
+    if len(items) > limit:
+        return jsonify({'error': f'At most {limit} appointments per request'}), 400
+    
+    try:
+        results, appointment_ids = book_batch(items)
+    except BookingBusy:
+        return jsonify({'error': 'Booking service is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    
+    if appointment_ids:
+        try:
+            send_bulk_booking_notifications.delay(appointment_ids)
+        except Exception as e:
+            logger.error(f"Failed to queue batch booking notifications: {str(e)}")
+        cache.delete('admin_dashboard')
+    
+    return jsonify({
+        'results': results,
+        'summary': summarize_booking_results(results)
+    }), 200
+
+
 @bp.route('/appointments/<int:appointment_id>', methods=['PUT'])
 @jwt_required()
 @role_required('admin')
@@ -540,10 +635,15 @@ def update_appointment(appointment_id):
     if not appointment:
         return jsonify({'error': 'Appointment not found'}), 404
     
+    old_date = appointment.appointment_date
+    old_time = appointment.appointment_time
+    old_status = appointment.status
+    changes = {}
+    
     # Update fields
     if 'appointment_date' in data:
         try:
-            appointment.appointment_date = datetime.strptime(
+            changes['appointment_date'] = datetime.strptime(
                 data['appointment_date'], '%Y-%m-%d'
             ).date()
         except ValueError:
@@ -554,24 +654,63 @@ def update_appointment(appointment_id):
             time_str = str(data['appointment_time'])
             # Handle both HH:MM and HH:MM:SS formats
             if len(time_str) <= 5:  # HH:MM
-                appointment.appointment_time = datetime.strptime(time_str, '%H:%M').time()
+                changes['appointment_time'] = datetime.strptime(time_str, '%H:%M').time()
             else:  # HH:MM:SS
-                appointment.appointment_time = datetime.strptime(time_str, '%H:%M:%S').time()
+                changes['appointment_time'] = datetime.strptime(time_str, '%H:%M:%S').time()
         except ValueError:
             return jsonify({'error': 'Invalid time format'}), 400
+        if changes['appointment_time'].minute % SLOT_MINUTES or changes['appointment_time'].second:
+            return jsonify({'error': 'Appointment time must be on a 10-minute boundary'}), 400
     
     if 'status' in data:
         if data['status'] not in ['booked', 'completed', 'cancelled']:
             return jsonify({'error': 'Invalid status'}), 400
-        appointment.status = data['status']
+        changes['status'] = data['status']
     
     if 'reason' in data:
-        appointment.reason = data['reason']
+        changes['reason'] = data['reason']
     
     # Update timestamp
-    appointment.updated_at = datetime.utcnow()
+    changes['updated_at'] = datetime.utcnow()
+    
+    # A slot the appointment newly occupies gets the same checks as a booking
+    new_date = changes.get('appointment_date', old_date)
+    new_time = changes.get('appointment_time', old_time)
+    claimed = False
+    if changes.get('status', old_status) == 'booked' and (
+        old_status != 'booked' or (new_date, new_time) != (old_date, old_time)
+    ):
+        current = (appointment.doctor_id, old_date, old_time) if old_status == 'booked' else None
+        try:
+            claimed = claim_slot(appointment.doctor_id, new_date, new_time, current=current)
+        except SlotRejected as e:
+            return jsonify({'error': e.message}), e.status
     
-    db.session.commit()
+    def apply_changes():
+        for field, value in changes.items():
+            setattr(appointment, field, value)
+    
+    # The booked-slot unique index rejects moves onto an occupied slot
+    try:
+        commit_slot_change(apply_changes)
+    except SlotConflict:
+        return jsonify({'error': 'This time slot is already booked'}), 409
+    except BookingBusy:
+        release_claim(appointment.doctor_id, new_date, new_time, claimed)
+        return jsonify({'error': 'Booking service is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    except Exception:
+        release_claim(appointment.doctor_id, new_date, new_time, claimed)
+        raise
+    
+    slot_engine.invalidate(appointment.doctor_id, old_date)
+    slot_engine.invalidate(appointment.doctor_id, appointment.appointment_date)
+    
+    # A booked slot that was cancelled or moved away goes to the waitlist
+    if old_status == 'booked' and (
+        appointment.status == 'cancelled' or
+        (appointment.appointment_date, appointment.appointment_time) != (old_date, old_time)
+    ):
+        free_slot(appointment.doctor_id, old_date, old_time)
     
     # Clear cache
     cache.delete('admin_dashboard')
@@ -595,11 +734,9 @@ def get_doctor_availability_admin(doctor_id):
     today = date.today()
     week_later = today + timedelta(days=7)
     
-    availability = DoctorAvailability.query.filter(
-        DoctorAvailability.doctor_id == doctor_id,
-        DoctorAvailability.date >= today,
-        DoctorAvailability.date <= week_later
-    ).order_by(DoctorAvailability.date.asc()).all()
+    availability = effective_availability_range(
+        [doctor_id], today, week_later, available_only=False
+    ).values()
     
     return jsonify({
         'doctor': doctor.to_dict(),
@@ -607,62 +744,75 @@ def get_doctor_availability_admin(doctor_id):
     }), 200
 
 
+@bp.route('/calendar', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_doctors_calendar_admin():
+    """Admin can view availability and bookings for many doctors over a date range"""
+    try:
+        doctor_ids, start_date, end_date = parse_calendar_args(request.args, max_doctors=200)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    doctor_ids = [row[0] for row in db.session.query(User.id).filter(
+        User.id.in_(doctor_ids),
+        User.role == 'doctor'
+    ).all()]
+    
+    return jsonify({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'slot_minutes': SLOT_MINUTES,
+        'doctors': doctor_calendar(doctor_ids, start_date, end_date)
+    }), 200
+
+
 @bp.route('/doctors/<int:doctor_id>/availability', methods=['POST'])
 @jwt_required()
 @role_required('admin')
 def set_doctor_availability_admin(doctor_id):
-    """Admin can set/update doctor's availability"""
+    """Admin can set/update doctor's availability; the day's lunch break is kept unless given"""
     doctor = User.query.filter_by(id=doctor_id, role='doctor').first()
     if not doctor:
         return jsonify({'error': 'Doctor not found'}), 404
     
-    data = request.get_json()
-    
-    if not data.get('date'):
-        return jsonify({'error': 'Date is required'}), 400
-    
-    if not validate_date(data['date']):
-        return jsonify({'error': 'Invalid date format (use YYYY-MM-DD)'}), 400
+    data = request.get_json() or {}
     
-    if not data.get('start_time') or not data.get('end_time'):
-        return jsonify({'error': 'Start time and end time are required'}), 400
-    
-    if not validate_time(data['start_time']) or not validate_time(data['end_time']):
-        return jsonify({'error': 'Invalid time format (use HH:MM)'}), 400
-    
-    avail_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-    start_time = datetime.strptime(data['start_time'], '%H:%M').time()
-    end_time = datetime.strptime(data['end_time'], '%H:%M').time()
-    
-    # Check if availability already exists
-    existing = DoctorAvailability.query.filter_by(
-        doctor_id=doctor_id,
-        date=avail_date
-    ).first()
+    result = bulk_set_availability([data], doctor_id=doctor_id)[0]
+    if result['status'] == 'error':
+        return jsonify({'error': result['error']}), 400
     
-    if existing:
-        # Update existing
-        existing.start_time = start_time
-        existing.end_time = end_time
-        existing.is_available = data.get('is_available', True)
+    if result['status'] == 'updated':
         message = 'Availability updated successfully'
     else:
-        # Create new
-        availability = DoctorAvailability(
-            doctor_id=doctor_id,
-            date=avail_date,
-            start_time=start_time,
-            end_time=end_time,
-            is_available=data.get('is_available', True)
-        )
-        db.session.add(availability)
         message = 'Availability set successfully'
     
-    db.session.commit()
-    
     return jsonify({'message': message}), 201
 
 
+@bp.route('/availability/batch', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def set_availability_batch_admin():
+    """Admin can create or update availability for many doctors and dates at once"""
+    data = request.get_json() or {}
+    entries = data.get('entries')
+    
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'Entries must be a non-empty list'}), 400
+    
+    limit = current_app.config['AVAILABILITY_BATCH_LIMIT']
+    if len(entries) > limit:
+        return jsonify({'error': f'At most {limit} entries per request'}), 400
+    
+    results = bulk_set_availability(entries)
+    
+    return jsonify({
+        'results': results,
+        'summary': summarize_results(results)
+    }), 200
+
+
 @bp.route('/doctors/<int:doctor_id>/availability/<int:avail_id>', methods=['DELETE'])
 @jwt_required()
 @role_required('admin')
@@ -678,11 +828,50 @@ def delete_doctor_availability_admin(doctor_id, avail_id):
     
     db.session.delete(availability)
     db.session.commit()
+    slot_engine.invalidate(doctor_id, availability.date)
     
     return jsonify({'message': 'Availability deleted successfully'}), 200
 
 # ==================== PERMANENT DELETE WITH CASCADE ====================
 
+def _permanent_delete(kind, target_id, message):
+    """
+    Cascade delete now, in one transaction, or hand a large history to the
+    chunked background job (202 with a task to poll)
+    """
+    cascade = CascadeDelete(kind, target_id)
+    
+    if cascade.appointment_count() > current_app.config['CASCADE_DELETE_SYNC_LIMIT']:
+        cascade.deactivate()
+        try:
+            db.session.commit()
+        except RevocationUnavailable:
+            db.session.rollback()
+            return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
+        try:
+            task = permanent_delete.delay(kind, target_id)
+            return jsonify({
+                'message': 'Deletion started',
+                'task_id': task.id,
+                'status_url': f'/api/admin/delete-status/{task.id}'
+            }), 202
+        except Exception as e:
+            logger.error(f"Failed to queue permanent delete of {kind} {target_id}, deleting now: {str(e)}")
+    
+    try:
+        cascade.run()
+        db.session.commit()
+    except RevocationUnavailable:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to delete: {str(e)}'}), 500
+    
+    cascade.after_commit()
+    return jsonify({'message': message}), 200
+
+
 @bp.route('/doctors/<int:doctor_id>/permanent', methods=['DELETE'])
 @jwt_required()
 @role_required('admin')
@@ -693,23 +882,7 @@ def permanent_delete_doctor(doctor_id):
     if not doctor:
         return jsonify({'error': 'Doctor not found'}), 404
     
-    try:
-        # Delete all appointments for this doctor (CASCADE will handle treatments)
-        Appointment.query.filter_by(doctor_id=doctor_id).delete()
-        
-        # Delete doctor availability
-        DoctorAvailability.query.filter_by(doctor_id=doctor_id).delete()
-        
-        # Delete the doctor
-        db.session.delete(doctor)
-        db.session.commit()
-        
-        cache.delete('admin_dashboard')
-        
-        return jsonify({'message': 'Doctor and all related data permanently deleted'}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Failed to delete: {str(e)}'}), 500
+    return _permanent_delete('doctor', doctor_id, 'Doctor and all related data permanently deleted')
 
 
 @bp.route('/patients/<int:patient_id>/permanent', methods=['DELETE'])
@@ -722,20 +895,7 @@ def permanent_delete_patient(patient_id):
     if not patient:
         return jsonify({'error': 'Patient not found'}), 404
     
-    try:
-        # Delete all appointments for this patient (CASCADE will handle treatments)
-        Appointment.query.filter_by(patient_id=patient_id).delete()
-        
-        # Delete the patient
-        db.session.delete(patient)
-        db.session.commit()
-        
-        cache.delete('admin_dashboard')
-        
-        return jsonify({'message': 'Patient and all related data permanently deleted'}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Failed to delete: {str(e)}'}), 500
+    return _permanent_delete('patient', patient_id, 'Patient and all related data permanently deleted')
 
 
 @bp.route('/departments/<int:dept_id>/permanent', methods=['DELETE'])
@@ -748,27 +908,41 @@ def permanent_delete_department(dept_id):
     if not department:
         return jsonify({'error': 'Department not found'}), 404
     
+    return _permanent_delete('department', dept_id, 'Department and all related data permanently deleted')
+
+
+@bp.route('/delete-status/<task_id>', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_delete_status(task_id):
+    """Progress of a background permanent delete"""
+    from celery.result import AsyncResult
+    from app.celery_config import make_celery
+    
     try:
-        # Get all doctors in this department
-        doctors = User.query.filter_by(role='doctor', specialization_id=dept_id).all()
+        celery = make_celery(current_app._get_current_object())
+        task = AsyncResult(task_id, app=celery)
         
-        # Delete all related data for each doctor
-        for doctor in doctors:
-            # Delete appointments (CASCADE will handle treatments)
-            Appointment.query.filter_by(doctor_id=doctor.id).delete()
-            # Delete availability
-            DoctorAvailability.query.filter_by(doctor_id=doctor.id).delete()
-            # Delete doctor
-            db.session.delete(doctor)
-        
-        # Delete the department
-        db.session.delete(department)
-        db.session.commit()
+        if task.ready():
+            result = task.result if task.successful() else None
+            if result and result.get('status') == 'success':
+                return jsonify({'status': 'completed', 'result': result}), 200
+            return jsonify({
+                'status': 'failed',
+                'error': result.get('error') if result else str(task.info)
+            }), 200
         
-        cache.delete('admin_dashboard')
-        cache.delete('all_departments')
+        info = task.info if isinstance(task.info, dict) else {}
+        return jsonify({
+            'status': 'processing',
+            'progress': info.get('progress', 0),
+            'deleted_appointments': info.get('deleted_appointments', 0),
+            'total_appointments': info.get('total_appointments')
+        }), 200
         
-        return jsonify({'message': 'Department and all related data permanently deleted'}), 200
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Failed to delete: {str(e)}'}), 500
\ No newline at end of file
+        logger.error(f"Error checking delete status: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'error': str(e)
+        }), 500
\ No newline at end of file
@@ -1,12 +1,15 @@
 from flask import Blueprint, request, jsonify, render_template
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from app import db, bcrypt  # ← ADD bcrypt HERE
+from app import db
 from app.models import User, Department
 from app.utils.validators import validate_email, validate_phone, validate_password
+from app.utils.decorators import get_current_identity, rate_limited
+from app.services.passwords import HashingBusy
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 @bp.route('/register', methods=['POST'])
+@rate_limited('register')
 def register():
     """
     Patient registration endpoint
@@ -29,12 +32,9 @@ def register():
             return jsonify({'error': 'Email already exists'}), 400
         
         # Create new patient user
-        password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
-        
         new_user = User(
             username=data['username'],
             email=data['email'],
-            password_hash=password_hash,
             full_name=data['full_name'],
             phone=data['phone'],
             role='patient',
@@ -42,6 +42,7 @@ def register():
             address=data.get('address'),
             is_active=True
         )
+        new_user.set_password(data['password'])
         
         db.session.add(new_user)
         db.session.commit()
@@ -56,6 +57,9 @@ def register():
             }
         }), 201
         
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         print(f"Registration error: {str(e)}")
@@ -63,6 +67,7 @@ def register():
 
 
 @bp.route('/login', methods=['POST'])
+@rate_limited('login')
 def login():
     """
     Login endpoint - CRITICAL for Vue frontend
@@ -91,11 +96,25 @@ def login():
             return jsonify({'error': 'Account is inactive'}), 401
         
         # Verify password
-        if not bcrypt.check_password_hash(user.password_hash, password):
+        if not user.check_password(password):
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        # Create access token
-        access_token = create_access_token(identity=user.id)
+        # Upgrade hashes made at an older work factor while we have the password
+        try:
+            if user.rehash_password_if_needed(password):
+                db.session.commit()
+        except HashingBusy:
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Password rehash error: {str(e)}")
+        
+        # Create access token; role and active state ride along as claims so
+        # protected endpoints don't query the user (see role_required)
+        access_token = create_access_token(
+            identity=user.id,
+            additional_claims={'role': user.role, 'active': user.is_active}
+        )
         
         # ✅ CRITICAL: Return format that Vue frontend expects
         return jsonify({
@@ -113,6 +132,8 @@ def login():
             }
         }), 200
         
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
@@ -125,27 +146,28 @@ def get_current_user():
     Get current authenticated user
     """
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        # Served from the identity cache (User.to_dict()) on a warm cache
+        user = get_current_identity()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        is_doctor = user['role'] == 'doctor'
         return jsonify({
-            'id': user.id,
-            'username': user.username,
-            'full_name': user.full_name,
-            'email': user.email,
-            'role': user.role,
-            'phone': user.phone,
-            'gender': user.gender,
-            'address': user.address,
-            'date_of_birth': user.date_of_birth.isoformat() if user.date_of_birth else None,
-            'is_active': user.is_active,
-            'specialization': user.specialization.name if user.role == 'doctor' and user.specialization else None,
-            'qualification': user.qualification if user.role == 'doctor' else None,
-            'experience_years': user.experience_years if user.role == 'doctor' else None,
-            'consultation_fee': user.consultation_fee if user.role == 'doctor' else None
+            'id': user['id'],
+            'username': user['username'],
+            'full_name': user['full_name'],
+            'email': user['email'],
+            'role': user['role'],
+            'phone': user['phone'],
+            'gender': user['gender'],
+            'address': user['address'],
+            'date_of_birth': user['date_of_birth'],
+            'is_active': user['is_active'],
+            'specialization': user['specialization'] if is_doctor else None,
+            'qualification': user['qualification'] if is_doctor else None,
+            'experience_years': user['experience_years'] if is_doctor else None,
+            'consultation_fee': user['consultation_fee'] if is_doctor else None
         }), 200
         
     except Exception as e:
@@ -167,13 +189,20 @@ def change_password():
     if not data.get('current_password') or not data.get('new_password'):
         return jsonify({'error': 'Current and new password are required'}), 400
     
-    if not user.check_password(data['current_password']):
+    try:
+        password_ok = user.check_password(data['current_password'])
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    if not password_ok:
         return jsonify({'error': 'Current password is incorrect'}), 401
     
     if not validate_password(data['new_password']):
         return jsonify({'error': 'New password must be at least 6 characters'}), 400
     
-    user.set_password(data['new_password'])
+    try:
+        user.set_password(data['new_password'])
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     db.session.commit()
     
     return jsonify({'message': 'Password changed successfully'}), 200
\ No newline at end of file
@@ -1,12 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from app import db
-from app.models import User, Appointment, Treatment, DoctorAvailability
+from app.models import User, Appointment, Treatment, DoctorAvailability, AvailabilityRule
 from app.models.availability import DoctorAvailability
-from app.utils.decorators import role_required, get_current_user
+from app.utils.decorators import role_required, get_current_identity, get_token_user
 from app.utils.validators import validate_date, validate_time
+from app.utils.schemas import USER, APPOINTMENT, APPOINTMENT_WITH_TREATMENT
+from app.utils.pagination import wants_cursor, request_keyset_page, InvalidCursor, APPOINTMENTS
 from datetime import datetime, date, time, timedelta
-from sqlalchemy import and_
+from calendar import day_name
+from sqlalchemy import and_, func
+from app.services.slots import slot_engine
+from app.services.availability import effective_availability_range, overlapping_rules, end_rules_before
+from app.services.waitlist import free_slot
+from app.services.dashboard_stats import appointment_stats
+from app.services.availability_bulk import upsert_availability, bulk_set_availability, summarize_results
 
 bp = Blueprint('doctor', __name__, url_prefix='/api/doctor')
 
@@ -17,14 +25,14 @@ bp = Blueprint('doctor', __name__, url_prefix='/api/doctor')
 @role_required('doctor')
 def dashboard():
     """Doctor's dashboard with upcoming appointments and statistics"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     # Get today's date
     today = date.today()
     week_later = today + timedelta(days=7)
     
     # Upcoming appointments (next 7 days)
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = APPOINTMENT.query(Appointment.query).filter(
         Appointment.doctor_id == doctor.id,
         Appointment.appointment_date >= today,
         Appointment.appointment_date <= week_later,
@@ -35,33 +43,25 @@ def dashboard():
     ).all()
     
     # Today's appointments
-    today_appointments = Appointment.query.filter(
+    today_appointments = APPOINTMENT.query(Appointment.query).filter(
         Appointment.doctor_id == doctor.id,
         Appointment.appointment_date == today,
         Appointment.status.in_(['booked', 'completed'])
     ).order_by(Appointment.appointment_time.asc()).all()
     
-    # Statistics
-    total_appointments = Appointment.query.filter_by(doctor_id=doctor.id).count()
-    completed = Appointment.query.filter_by(doctor_id=doctor.id, status='completed').count()
-    pending = Appointment.query.filter_by(doctor_id=doctor.id, status='booked').count()
-    
-    # Get all patients assigned to this doctor
-    patient_ids = db.session.query(Appointment.patient_id).filter(
-        Appointment.doctor_id == doctor.id
-    ).distinct().all()
-    total_patients = len(patient_ids)
+    # Statistics, including distinct patients, in one aggregate query
+    stats = appointment_stats(doctor_id=doctor.id, include_patients=True)
     
     return jsonify({
-        'doctor_info': doctor.to_dict(),
+        'doctor_info': get_current_identity(),
         'statistics': {
-            'total_appointments': total_appointments,
-            'completed_appointments': completed,
-            'pending_appointments': pending,
-            'total_patients': total_patients
+            'total_appointments': stats['total'],
+            'completed_appointments': stats['completed'],
+            'pending_appointments': stats['booked'],
+            'total_patients': stats['patients']
         },
-        'today_appointments': [apt.to_dict() for apt in today_appointments],
-        'upcoming_appointments': [apt.to_dict() for apt in upcoming_appointments]
+        'today_appointments': APPOINTMENT.dump_many(today_appointments),
+        'upcoming_appointments': APPOINTMENT.dump_many(upcoming_appointments)
     }), 200
 
 
@@ -70,44 +70,20 @@ def dashboard():
 @role_required('doctor')
 def get_performance_statistics():
     """Get doctor's performance statistics"""
-    doctor = get_current_user()
-    
-    # Get today's date
-    today = date.today()
-    week_start = today - timedelta(days=7)
-    
-    # This week statistics
-    week_completed = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.appointment_date >= week_start,
-        Appointment.status == 'completed'
-    ).count()
+    doctor = get_token_user()
     
-    week_cancelled = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.appointment_date >= week_start,
-        Appointment.status == 'cancelled'
-    ).count()
-    
-    # Lifetime statistics
-    lifetime_completed = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.status == 'completed'
-    ).count()
-    
-    lifetime_cancelled = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.status == 'cancelled'
-    ).count()
+    # This week and lifetime statistics in one aggregate query
+    week_start = date.today() - timedelta(days=7)
+    stats = appointment_stats(doctor_id=doctor.id, since=week_start)
     
     return jsonify({
         'this_week': {
-            'completed': week_completed,
-            'cancelled': week_cancelled
+            'completed': stats['since']['completed'],
+            'cancelled': stats['since']['cancelled']
         },
         'lifetime': {
-            'completed': lifetime_completed,
-            'cancelled': lifetime_cancelled
+            'completed': stats['completed'],
+            'cancelled': stats['cancelled']
         }
     }), 200
 
@@ -136,14 +112,14 @@ def get_doctor_availability():   # ======== Dead Code ========
 @role_required('doctor')
 def get_appointments():
     """Get all appointments for the doctor with filters"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     status = request.args.get('status')
     date_filter = request.args.get('date')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    query = Appointment.query.filter_by(doctor_id=doctor.id)
+    query = APPOINTMENT.query(Appointment.query).filter_by(doctor_id=doctor.id)
     
     if status:
         query = query.filter_by(status=status)
@@ -155,13 +131,20 @@ def get_appointments():
         except ValueError:
             return jsonify({'error': 'Invalid date format (use YYYY-MM-DD)'}), 400
     
+    if wants_cursor():
+        try:
+            listing = request_keyset_page(query, APPOINTMENTS)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(dict({'appointments': APPOINTMENT.dump_many(listing.items)}, **listing.meta())), 200
+    
     appointments = query.order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'appointments': [apt.to_dict() for apt in appointments.items],
+        'appointments': APPOINTMENT.dump_many(appointments.items),
         'total': appointments.total,
         'pages': appointments.pages,
         'current_page': page
@@ -173,7 +156,7 @@ def get_appointments():
 @role_required('doctor')
 def get_appointment(appointment_id):
     """Get specific appointment details"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -200,7 +183,7 @@ def get_appointment(appointment_id):
 @role_required('doctor')
 def complete_appointment(appointment_id):
     """Mark appointment as completed"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -216,9 +199,13 @@ def complete_appointment(appointment_id):
     if appointment.status == 'cancelled':
         return jsonify({'error': 'Cannot complete a cancelled appointment'}), 400
     
+    was_booked = appointment.status == 'booked'
     appointment.status = 'completed'
     db.session.commit()
     
+    if was_booked:
+        slot_engine.release(appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
+    
     return jsonify({
         'message': 'Appointment marked as completed',
         'appointment': appointment.to_dict()
@@ -230,7 +217,7 @@ def complete_appointment(appointment_id):
 @role_required('doctor')
 def cancel_appointment(appointment_id):
     """Cancel appointment"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -243,9 +230,13 @@ def cancel_appointment(appointment_id):
     if appointment.status == 'completed':
         return jsonify({'error': 'Cannot cancel a completed appointment'}), 400
     
+    was_booked = appointment.status == 'booked'
     appointment.status = 'cancelled'
     db.session.commit()
     
+    if was_booked:
+        free_slot(appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
+    
     return jsonify({
         'message': 'Appointment cancelled',
         'appointment': appointment.to_dict()
@@ -259,7 +250,7 @@ def cancel_appointment(appointment_id):
 @role_required('doctor')
 def add_treatment(appointment_id):
     """Add or update treatment for an appointment"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     data = request.get_json()
     
     appointment = Appointment.query.filter_by(
@@ -308,11 +299,15 @@ def add_treatment(appointment_id):
         db.session.add(treatment)
         message = 'Treatment added successfully'
     
+    was_booked = appointment.status == 'booked'
     if appointment.status != 'completed':
         appointment.status = 'completed'
     
     db.session.commit()
     
+    if was_booked:
+        slot_engine.release(appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
+    
     return jsonify({
         'message': message,
         'treatment': treatment.to_dict()
@@ -324,7 +319,7 @@ def add_treatment(appointment_id):
 @role_required('doctor')
 def get_treatment(appointment_id):
     """Get treatment for an appointment"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -347,25 +342,19 @@ def get_treatment(appointment_id):
 @role_required('doctor')
 def get_patients():
     """Get all patients assigned to this doctor"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
-    patient_ids = db.session.query(Appointment.patient_id).filter(
+    # Appointment count per patient in one grouped query
+    counts = dict(db.session.query(Appointment.patient_id, func.count(Appointment.id)).filter(
         Appointment.doctor_id == doctor.id
-    ).distinct().all()
+    ).group_by(Appointment.patient_id).all())
     
-    patient_ids = [pid[0] for pid in patient_ids]
-    patients = User.query.filter(User.id.in_(patient_ids)).all()
+    patients = USER.query(User.query).filter(User.id.in_(counts)).all()
     
     patients_data = []
     for patient in patients:
-        patient_info = patient.to_dict()
-        
-        apt_count = Appointment.query.filter_by(
-            patient_id=patient.id,
-            doctor_id=doctor.id
-        ).count()
-        
-        patient_info['appointment_count'] = apt_count
+        patient_info = USER.dump(patient)
+        patient_info['appointment_count'] = counts[patient.id]
         patients_data.append(patient_info)
     
     return jsonify({'patients': patients_data}), 200
@@ -376,28 +365,21 @@ def get_patients():
 @role_required('doctor')
 def get_patient_history(patient_id):
     """Get patient's treatment history with this doctor"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     patient = User.query.filter_by(id=patient_id, role='patient').first()
     if not patient:
         return jsonify({'error': 'Patient not found'}), 404
     
-    appointments = Appointment.query.filter_by(
+    appointments = APPOINTMENT_WITH_TREATMENT.query(Appointment.query).filter_by(
         patient_id=patient_id,
         doctor_id=doctor.id,
         status='completed'
     ).order_by(Appointment.appointment_date.desc()).all()
     
-    history = []
-    for apt in appointments:
-        apt_data = apt.to_dict()
-        if apt.treatment:
-            apt_data['treatment'] = apt.treatment.to_dict()
-        history.append(apt_data)
-    
     return jsonify({
         'patient': patient.to_dict(),
-        'history': history
+        'history': APPOINTMENT_WITH_TREATMENT.dump_many(appointments)
     }), 200
 
 
@@ -407,17 +389,15 @@ def get_patient_history(patient_id):
 @jwt_required()
 @role_required('doctor')
 def get_availability():
-    """Get doctor's availability for next 7 days"""
-    doctor = get_current_user()
+    """Get doctor's availability for next 7 days, including days from weekly rules"""
+    doctor = get_token_user()
     
     today = date.today()
     week_later = today + timedelta(days=7)
     
-    availability = DoctorAvailability.query.filter(
-        DoctorAvailability.doctor_id == doctor.id,
-        DoctorAvailability.date >= today,
-        DoctorAvailability.date <= week_later
-    ).order_by(DoctorAvailability.date.asc()).all()
+    availability = effective_availability_range(
+        [doctor.id], today, week_later, available_only=False
+    ).values()
     
     return jsonify({
         'availability': [avail.to_dict() for avail in availability]
@@ -429,7 +409,7 @@ def get_availability():
 @role_required('doctor')
 def set_availability():
     """Set availability for specific date (create or update) with lunch break support"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     data = request.get_json()
     
     if not data.get('date'):
@@ -442,7 +422,7 @@ def set_availability():
         return jsonify({'error': 'Start time and end time are required'}), 400
     
     if not validate_time(data['start_time']) or not validate_time(data['end_time']):
-        return jsonify({'error': 'Invalid time format (use HH:MM)'}), 400
+        return jsonify({'error': 'Invalid time (use HH:MM on a 10-minute boundary)'}), 400
     
     avail_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
     start_time = datetime.strptime(data['start_time'], '%H:%M').time()
@@ -462,32 +442,22 @@ def set_availability():
             if lunch_break_start >= lunch_break_end:
                 return jsonify({'error': 'Lunch break start must be before end time'}), 400
     
-    existing = DoctorAvailability.query.filter_by(
-        doctor_id=doctor.id,
-        date=avail_date
-    ).first()
+    existing = upsert_availability([{
+        'doctor_id': doctor.id,
+        'date': avail_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_available': data.get('is_available', True),
+        'lunch_break_start': lunch_break_start,
+        'lunch_break_end': lunch_break_end
+    }])
+    db.session.commit()
     
     if existing:
-        existing.start_time = start_time
-        existing.end_time = end_time
-        existing.is_available = data.get('is_available', True)
-        existing.lunch_break_start = lunch_break_start
-        existing.lunch_break_end = lunch_break_end
         message = 'Availability updated successfully'
     else:
-        availability = DoctorAvailability(
-            doctor_id=doctor.id,
-            date=avail_date,
-            start_time=start_time,
-            end_time=end_time,
-            is_available=data.get('is_available', True),
-            lunch_break_start=lunch_break_start,
-            lunch_break_end=lunch_break_end
-        )
-        db.session.add(availability)
         message = 'Availability set successfully'
-    
-    db.session.commit()
+    slot_engine.invalidate(doctor.id, avail_date)
     
     return jsonify({'message': message}), 201
 
@@ -497,48 +467,78 @@ def set_availability():
 @role_required('doctor')
 def set_bulk_availability():
     """Set availability for multiple dates (next 7 days)"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     data = request.get_json()
     
-    if not data.get('start_time') or not data.get('end_time'):
-        return jsonify({'error': 'Start time and end time are required'}), 400
-    
-    if not validate_time(data['start_time']) or not validate_time(data['end_time']):
-        return jsonify({'error': 'Invalid time format (use HH:MM)'}), 400
+    # Working hours and lunch break, checked like a weekly rule's
+    hours, error = _parse_rule_fields({key: data[key] for key in RULE_TIME_FIELDS if key in data})
+    if error:
+        return jsonify({'error': error}), 400
+    if bool(hours.get('lunch_break_start')) != bool(hours.get('lunch_break_end')):
+        return jsonify({'error': 'Lunch break needs both start and end time'}), 400
+    hours.setdefault('lunch_break_start', None)
+    hours.setdefault('lunch_break_end', None)
     
-    start_time = datetime.strptime(data['start_time'], '%H:%M').time()
-    end_time = datetime.strptime(data['end_time'], '%H:%M').time()
-    
-    # Set for next 7 days
     today = date.today()
-    created_count = 0
     
-    for i in range(7):
-        avail_date = today + timedelta(days=i)
+    # Recurring: one weekly rule per weekday instead of rows for each date,
+    # replacing the weekly hours in force from today on
+    if data.get('recurring'):
+        end_rules_before(doctor.id, range(7), today)
+        rules = [
+            AvailabilityRule(doctor_id=doctor.id, weekday=weekday, effective_from=today, **hours)
+            for weekday in range(7)
+        ]
+        db.session.add_all(rules)
+        db.session.commit()
+        slot_engine.invalidate_doctor(doctor.id)
         
-        existing = DoctorAvailability.query.filter_by(
-            doctor_id=doctor.id,
-            date=avail_date
-        ).first()
-        
-        if not existing:
-            availability = DoctorAvailability(
-                doctor_id=doctor.id,
-                date=avail_date,
-                start_time=start_time,
-                end_time=end_time,
-                is_available=True
-            )
-            db.session.add(availability)
-            created_count += 1
-    
+        return jsonify({
+            'message': 'Weekly availability set for every day of the week',
+            'rules': [rule.to_dict() for rule in rules]
+        }), 201
+    
+    # Set for next 7 days, leaving dates that already have availability alone
+    rows = [
+        dict(hours, doctor_id=doctor.id, date=today + timedelta(days=i), is_available=True)
+        for i in range(7)
+    ]
+    existing = upsert_availability(rows, overwrite=False)
     db.session.commit()
+    created_count = len(rows) - len(existing)
+    
+    for i in range(7):
+        slot_engine.invalidate(doctor.id, today + timedelta(days=i))
     
     return jsonify({
         'message': f'Availability set for {created_count} days'
     }), 201
 
 
+@bp.route('/availability/batch', methods=['POST'])
+@jwt_required()
+@role_required('doctor')
+def set_availability_batch():
+    """Create or update availability for many dates in one transaction"""
+    doctor = get_token_user()
+    data = request.get_json() or {}
+    entries = data.get('entries')
+    
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'Entries must be a non-empty list'}), 400
+    
+    limit = current_app.config['AVAILABILITY_BATCH_LIMIT']
+    if len(entries) > limit:
+        return jsonify({'error': f'At most {limit} entries per request'}), 400
+    
+    results = bulk_set_availability(entries, doctor_id=doctor.id)
+    
+    return jsonify({
+        'results': results,
+        'summary': summarize_results(results)
+    }), 200
+
+
 # ==================== Availability CRUD Operations ====================
 
 @bp.route('/availability/<int:avail_id>', methods=['DELETE'])
@@ -546,7 +546,7 @@ def set_bulk_availability():
 @role_required('doctor')
 def delete_availability(avail_id):
     """Delete specific availability slot"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     availability = DoctorAvailability.query.filter_by(
         id=avail_id,
@@ -558,6 +558,7 @@ def delete_availability(avail_id):
     
     db.session.delete(availability)
     db.session.commit()
+    slot_engine.invalidate(availability.doctor_id, availability.date)
     
     return jsonify({'message': 'Availability deleted successfully'}), 200
 
@@ -567,7 +568,7 @@ def delete_availability(avail_id):
 @role_required('doctor')
 def update_availability(avail_id):
     """Update specific availability slot"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     data = request.get_json()
     
     availability = DoctorAvailability.query.filter_by(
@@ -580,18 +581,19 @@ def update_availability(avail_id):
     
     if 'start_time' in data:
         if not validate_time(data['start_time']):
-            return jsonify({'error': 'Invalid start time format (use HH:MM)'}), 400
+            return jsonify({'error': 'Invalid start time (use HH:MM on a 10-minute boundary)'}), 400
         availability.start_time = datetime.strptime(data['start_time'], '%H:%M').time()
     
     if 'end_time' in data:
         if not validate_time(data['end_time']):
-            return jsonify({'error': 'Invalid end time format (use HH:MM)'}), 400
+            return jsonify({'error': 'Invalid end time (use HH:MM on a 10-minute boundary)'}), 400
         availability.end_time = datetime.strptime(data['end_time'], '%H:%M').time()
     
     if 'is_available' in data:
         availability.is_available = bool(data['is_available'])
     
     db.session.commit()
+    slot_engine.invalidate(availability.doctor_id, availability.date)
     
     return jsonify({
         'message': 'Availability updated successfully',
@@ -603,7 +605,7 @@ def update_availability(avail_id):
 @role_required('doctor')
 def get_availability_slot(avail_id):
     """Get specific availability slot details"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     
     availability = DoctorAvailability.query.filter_by(
         id=avail_id,
@@ -615,6 +617,179 @@ def get_availability_slot(avail_id):
     
     return jsonify(availability.to_dict()), 200
 
+# ==================== Recurring Availability Rules ====================
+
+RULE_TIME_FIELDS = ('start_time', 'end_time', 'lunch_break_start', 'lunch_break_end')
+
+
+def _rule_conflict(doctor_id, weekday, effective_from, effective_until, exclude_id=None):
+    """409 response when another rule already covers some of these dates on the weekday, else None"""
+    conflicts = overlapping_rules(doctor_id, weekday, effective_from, effective_until, exclude_id)
+    if not conflicts:
+        return None
+    return jsonify({
+        'error': f'A {day_name[weekday]} rule already covers some of these dates; update or delete it first',
+        'conflicting_rule_ids': [rule.id for rule in conflicts]
+    }), 409
+
+
+def _parse_rule_fields(data, rule=None):
+    """Validate rule fields from a request body; returns (fields, error)"""
+    fields = {}
+    
+    for key in RULE_TIME_FIELDS:
+        if key in data:
+            if data[key] and not validate_time(data[key]):
+                return None, 'Invalid time (use HH:MM on a 10-minute boundary)'
+            fields[key] = datetime.strptime(data[key], '%H:%M').time() if data[key] else None
+    
+    for key in ('effective_from', 'effective_until'):
+        if key in data:
+            if data[key] and not validate_date(data[key]):
+                return None, 'Invalid date format (use YYYY-MM-DD)'
+            fields[key] = datetime.strptime(data[key], '%Y-%m-%d').date() if data[key] else None
+    
+    if 'exception_dates' in data:
+        if not isinstance(data['exception_dates'], list):
+            return None, 'exception_dates must be a list of dates'
+        if any(not validate_date(value) for value in data['exception_dates']):
+            return None, 'Invalid exception date format (use YYYY-MM-DD)'
+        fields['exception_dates'] = ','.join(sorted(set(data['exception_dates'])))
+    
+    def current(key):
+        return fields[key] if key in fields else getattr(rule, key, None)
+    
+    if not current('start_time') or not current('end_time'):
+        return None, 'Start time and end time are required'
+    
+    if current('start_time') >= current('end_time'):
+        return None, 'Start time must be before end time'
+    
+    lunch_start, lunch_end = current('lunch_break_start'), current('lunch_break_end')
+    if lunch_start and lunch_end:
+        if lunch_start < current('start_time') or lunch_end > current('end_time'):
+            return None, 'Lunch break must be within working hours'
+        if lunch_start >= lunch_end:
+            return None, 'Lunch break start must be before end time'
+    
+    if current('effective_until') and current('effective_until') < (current('effective_from') or date.today()):
+        return None, 'effective_until must not be before effective_from'
+    
+    return fields, None
+
+
+@bp.route('/availability/rules', methods=['GET'])
+@jwt_required()
+@role_required('doctor')
+def get_availability_rules():
+    """Get doctor's recurring weekly availability rules"""
+    doctor = get_token_user()
+    
+    rules = AvailabilityRule.query.filter_by(doctor_id=doctor.id).order_by(
+        AvailabilityRule.weekday.asc(),
+        AvailabilityRule.effective_from.asc()
+    ).all()
+    
+    return jsonify({'rules': [rule.to_dict() for rule in rules]}), 200
+
+
+@bp.route('/availability/rules', methods=['POST'])
+@jwt_required()
+@role_required('doctor')
+def create_availability_rules():
+    """Create weekly availability rules, one per weekday (0 = Monday ... 6 = Sunday)"""
+    doctor = get_token_user()
+    data = request.get_json()
+    
+    weekdays = data.get('weekdays')
+    if weekdays is None and 'weekday' in data:
+        weekdays = [data['weekday']]
+    
+    if not weekdays or any(not isinstance(day, int) or not 0 <= day <= 6 for day in weekdays):
+        return jsonify({'error': 'weekdays must be a list of integers 0 (Monday) to 6 (Sunday)'}), 400
+    
+    fields, error = _parse_rule_fields(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    fields.setdefault('effective_from', date.today())
+    
+    for day in sorted(set(weekdays)):
+        conflict = _rule_conflict(doctor.id, day, fields['effective_from'], fields.get('effective_until'))
+        if conflict:
+            return conflict
+    
+    rules = [AvailabilityRule(doctor_id=doctor.id, weekday=day, **fields) for day in sorted(set(weekdays))]
+    db.session.add_all(rules)
+    db.session.commit()
+    slot_engine.invalidate_doctor(doctor.id)
+    
+    return jsonify({
+        'message': f'{len(rules)} availability rule(s) created',
+        'rules': [rule.to_dict() for rule in rules]
+    }), 201
+
+
+@bp.route('/availability/rules/<int:rule_id>', methods=['PUT'])
+@jwt_required()
+@role_required('doctor')
+def update_availability_rule(rule_id):
+    """Update a weekly availability rule, including its exception dates"""
+    doctor = get_token_user()
+    data = request.get_json()
+    
+    rule = AvailabilityRule.query.filter_by(id=rule_id, doctor_id=doctor.id).first()
+    if not rule:
+        return jsonify({'error': 'Availability rule not found'}), 404
+    
+    fields, error = _parse_rule_fields(data, rule)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if 'weekday' in data:
+        if not isinstance(data['weekday'], int) or not 0 <= data['weekday'] <= 6:
+            return jsonify({'error': 'weekday must be an integer 0 (Monday) to 6 (Sunday)'}), 400
+        fields['weekday'] = data['weekday']
+    
+    conflict = _rule_conflict(
+        doctor.id,
+        fields.get('weekday', rule.weekday),
+        fields.get('effective_from') or rule.effective_from,
+        fields['effective_until'] if 'effective_until' in fields else rule.effective_until,
+        exclude_id=rule.id
+    )
+    if conflict:
+        return conflict
+    
+    for key, value in fields.items():
+        setattr(rule, key, value)
+    
+    db.session.commit()
+    slot_engine.invalidate_doctor(doctor.id)
+    
+    return jsonify({
+        'message': 'Availability rule updated successfully',
+        'rule': rule.to_dict()
+    }), 200
+
+
+@bp.route('/availability/rules/<int:rule_id>', methods=['DELETE'])
+@jwt_required()
+@role_required('doctor')
+def delete_availability_rule(rule_id):
+    """Delete a weekly availability rule"""
+    doctor = get_token_user()
+    
+    rule = AvailabilityRule.query.filter_by(id=rule_id, doctor_id=doctor.id).first()
+    if not rule:
+        return jsonify({'error': 'Availability rule not found'}), 404
+    
+    db.session.delete(rule)
+    db.session.commit()
+    slot_engine.invalidate_doctor(doctor.id)
+    
+    return jsonify({'message': 'Availability rule deleted successfully'}), 200
+
 # ==================== Add Patient History Without Appointment ====================
 
 @bp.route('/patients/<int:patient_id>/history/add', methods=['POST'])
@@ -622,7 +797,7 @@ def get_availability_slot(avail_id):
 @role_required('doctor')
 def add_patient_history(patient_id):
     """Add treatment history entry without requiring an appointment"""
-    doctor = get_current_user()
+    doctor = get_token_user()
     data = request.get_json()
     
     # Verify patient exists
@@ -1,13 +1,26 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, Response, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app import cache
-from app.models import User, Department, Appointment, DoctorAvailability
-from app.utils.decorators import role_required, get_current_user
+from app.models import User, Appointment, WaitlistEntry
+from app.utils.decorators import role_required, rate_limited, get_current_user, get_current_identity, get_token_user
 from app.utils.validators import validate_date, validate_time
+from app.utils.schemas import USER, APPOINTMENT, APPOINTMENT_WITH_TREATMENT, APPOINTMENT_HISTORY, WAITLIST_ENTRY
+from app.utils.pagination import wants_cursor, request_keyset_page, InvalidCursor, APPOINTMENTS
 from datetime import datetime, date, time, timedelta
-from sqlalchemy import and_, or_
 from app.tasks.booking_notifications import send_booking_confirmation, send_pre_appointment_reminder
+from app.services.slots import slot_engine, taken_times, SLOT_MINUTES
+from app.services.booking import commit_slot_change, SlotConflict, BookingBusy
+from app.services.slot_validation import claim_slot, release_claim, SlotRejected
+from app.services.capacity import next_available_slots, parse_calendar_args, doctor_calendar, slots_remaining
+from app.services.availability import effective_availability_range
+from app.services.departments import department_listing
+from app.services.user_search import user_search
+from app.services.waitlist import free_slot, pass_on_hold, take_offer, OfferEnded
+from app.services.passwords import HashingBusy
+from app.services.slot_events import slot_events, create_stream_token
+from app.services.archive import treatment_history
+import json
+import time as clock
 import logging
 logger = logging.getLogger(__name__)
 
@@ -20,14 +33,11 @@ bp = Blueprint('patient', __name__, url_prefix='/api/patient')
 @role_required('patient')
 def dashboard():
     """Patient's dashboard with appointments and departments"""
-    patient = get_current_user()
-    
-    # Get all departments
-    departments = Department.query.all()
+    patient = get_token_user()
     
     # Get upcoming appointments
     today = date.today()
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = APPOINTMENT.query(Appointment.query).filter(
         Appointment.patient_id == patient.id,
         Appointment.appointment_date >= today,
         Appointment.status == 'booked'
@@ -37,16 +47,16 @@ def dashboard():
     ).limit(5).all()
     
     # Get recent completed appointments
-    recent_completed = Appointment.query.filter(
+    recent_completed = APPOINTMENT.query(Appointment.query).filter(
         Appointment.patient_id == patient.id,
         Appointment.status == 'completed'
     ).order_by(Appointment.appointment_date.desc()).limit(5).all()
     
     return jsonify({
-        'patient_info': patient.to_dict(),
-        'departments': [dept.to_dict() for dept in departments],
-        'upcoming_appointments': [apt.to_dict() for apt in upcoming_appointments],
-        'recent_completed': [apt.to_dict() for apt in recent_completed]
+        'patient_info': get_current_identity(),
+        'departments': department_listing(),
+        'upcoming_appointments': APPOINTMENT.dump_many(upcoming_appointments),
+        'recent_completed': APPOINTMENT.dump_many(recent_completed)
     }), 200
 
 
@@ -57,8 +67,7 @@ def dashboard():
 @role_required('patient')
 def get_profile():
     """Get patient profile"""
-    patient = get_current_user()
-    return jsonify(patient.to_dict()), 200
+    return jsonify(get_current_identity()), 200
 
 
 @bp.route('/profile', methods=['PUT'])
@@ -126,7 +135,11 @@ def change_password():
         return jsonify({'error': 'New password is required'}), 400
     
     # Verify current password
-    if not patient.check_password(data['current_password']):
+    try:
+        password_ok = patient.check_password(data['current_password'])
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    if not password_ok:
         return jsonify({'error': 'Current password is incorrect'}), 400
     
     # Validate new password
@@ -137,7 +150,10 @@ def change_password():
         return jsonify({'error': 'New password must be different from current password'}), 400
     
     # Update password
-    patient.set_password(data['new_password'])
+    try:
+        patient.set_password(data['new_password'])
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy. Please retry.'}), 503, {'Retry-After': '1'}
     db.session.commit()
     
     return jsonify({'message': 'Password changed successfully'}), 200
@@ -147,22 +163,9 @@ def change_password():
 @bp.route('/departments', methods=['GET'])
 @jwt_required()
 @role_required('patient')
-@cache.cached(timeout=300, key_prefix='all_departments')  # Cache for 5 minutes
 def get_departments():
-    """Get all departments/specializations"""
-    departments = Department.query.all()
-    
-    dept_data = []
-    for dept in departments:
-        dept_info = dept.to_dict()
-        dept_info['available_doctors'] = User.query.filter_by(
-            specialization_id=dept.id,
-            role='doctor',
-            is_active=True
-        ).count()
-        dept_data.append(dept_info)
-    
-    return jsonify({'departments': dept_data, 'cached': True}), 200
+    """Get all departments/specializations with doctor counts (cached)"""
+    return jsonify({'departments': department_listing(), 'cached': True}), 200
 
 
 # ==================== DOCTORS ====================
@@ -171,44 +174,61 @@ def get_departments():
 @jwt_required()
 @role_required('patient')
 def search_doctors():
-    """Search doctors by specialization or name"""
+    """
+    Search doctors by specialization or name, one page at a time. With
+    summary=1 each doctor carries slots_remaining and next_available_date
+    for the coming week instead of the raw availability rows.
+    """
     specialization_id = request.args.get('specialization_id', type=int)
     search = request.args.get('search', '')
+    summary = request.args.get('summary', '').lower() in ('1', 'true', 'yes')
+    page = request.args.get('page', 1, type=int)
+    per_page = min(
+        request.args.get('per_page', 20, type=int),
+        current_app.config.get('DOCTOR_SEARCH_MAX_PER_PAGE', 100)
+    )
     
-    query = User.query.filter_by(role='doctor', is_active=True)
+    query = USER.query(User.query).filter_by(role='doctor', is_active=True)
+    order = [User.full_name, User.id]
     
     if specialization_id:
         query = query.filter_by(specialization_id=specialization_id)
     
     if search:
-        query = query.filter(
-            or_(
-                User.full_name.ilike(f'%{search}%'),
-                User.username.ilike(f'%{search}%')
-            )
-        )
+        # Best name matches first
+        query, rank = user_search.apply(query, search, ('full_name', 'username'))
+        order.insert(0, rank)
     
-    doctors = query.all()
+    doctors = query.order_by(*order).paginate(page=page, per_page=per_page, error_out=False)
+    doctor_ids = [doctor.id for doctor in doctors.items]
     
-    # availability info
+    # availability info for the whole page at once
     today = date.today()
     week_later = today + timedelta(days=7)
     
+    if summary:
+        remaining = slots_remaining(doctor_ids, today, week_later)
+    else:
+        availability = {doctor_id: [] for doctor_id in doctor_ids}
+        days = effective_availability_range(doctor_ids, today, week_later) if doctor_ids else {}
+        for (doctor_id, day), avail in sorted(days.items(), key=lambda item: item[0][1]):
+            availability[doctor_id].append(avail.to_dict())
+    
     doctors_data = []
-    for doctor in doctors:
-        doctor_info = doctor.to_dict()
-        
-        availability = DoctorAvailability.query.filter(
-            DoctorAvailability.doctor_id == doctor.id,
-            DoctorAvailability.date >= today,
-            DoctorAvailability.date <= week_later,
-            DoctorAvailability.is_available == True
-        ).order_by(DoctorAvailability.date.asc()).all()
-        
-        doctor_info['availability'] = [avail.to_dict() for avail in availability]
+    for doctor in doctors.items:
+        doctor_info = USER.dump(doctor)
+        if summary:
+            doctor_info.update(remaining[doctor.id])
+        else:
+            doctor_info['availability'] = availability[doctor.id]
         doctors_data.append(doctor_info)
     
-    return jsonify({'doctors': doctors_data}), 200
+    return jsonify({
+        'doctors': doctors_data,
+        'total': doctors.total,
+        'pages': doctors.pages,
+        'current_page': page
+    }), 200
 
 
 @bp.route('/doctors/<int:doctor_id>', methods=['GET'])
@@ -226,12 +246,7 @@ def get_doctor_details(doctor_id):
     today = date.today()
     week_later = today + timedelta(days=7)
     
-    availability = DoctorAvailability.query.filter(
-        DoctorAvailability.doctor_id == doctor_id,
-        DoctorAvailability.date >= today,
-        DoctorAvailability.date <= week_later,
-        DoctorAvailability.is_available == True
-    ).order_by(DoctorAvailability.date.asc()).all()
+    availability = effective_availability_range([doctor_id], today, week_later).values()
     
     doctor_info['availability'] = [avail.to_dict() for avail in availability]
     
@@ -258,7 +273,7 @@ def get_doctor_details(doctor_id):
 @jwt_required()
 @role_required('patient')
 def get_booked_slots():
-    """Get booked time slots for a specific doctor and date"""
+    """Get taken time slots (booked, or held for a waitlisted patient) for a doctor and date"""
     doctor_id = request.args.get('doctor_id', type=int)
     date_str = request.args.get('date')
     
@@ -269,15 +284,8 @@ def get_booked_slots():
         from datetime import datetime
         appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        # Get all booked appointments for this doctor and date
-        booked_appointments = Appointment.query.filter_by(
-            doctor_id=doctor_id,
-            appointment_date=appointment_date,
-            status='booked'
-        ).all()
-        
-        # Extract just the time strings
-        booked_slots = [apt.appointment_time.strftime('%H:%M') for apt in booked_appointments]
+        # Booked appointments and active waitlist holds; a held slot can't be booked
+        booked_slots = [t.strftime('%H:%M') for t in taken_times(doctor_id, appointment_date)]
         
         return jsonify({
             'booked_slots': booked_slots,
@@ -286,6 +294,130 @@ def get_booked_slots():
         
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
+
+
+@bp.route('/slots/stream-token', methods=['POST'])
+@jwt_required()
+@role_required('patient')
+def create_slot_stream_token():
+    """Short-lived token for /slots/stream, the only endpoint that accepts it"""
+    return jsonify({
+        'stream_token': create_stream_token(),
+        'expires_in': current_app.config['SLOT_EVENTS_TOKEN_SECONDS']
+    }), 200
+
+
+@bp.route('/slots/stream', methods=['GET'])
+@jwt_required(locations=['query_string'])
+@role_required('patient', locations=['query_string'])
+def stream_slot_changes():
+    """
+    Server-sent events for one doctor and date: a snapshot of taken times,
+    then one event per booked, released or held slot. EventSource cannot
+    send headers, so this takes ?jwt=<token> with a stream token from
+    POST /slots/stream-token; session tokens stay header-only.
+    """
+    doctor_id = request.args.get('doctor_id', type=int)
+    date_str = request.args.get('date')
+    
+    if not doctor_id or not date_str:
+        return jsonify({'error': 'doctor_id and date are required'}), 400
+    
+    if not validate_date(date_str):
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    stream_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    
+    # Subscribe before the snapshot so no change falls in between
+    subscription = slot_events.subscribe(doctor_id, stream_date)
+    try:
+        taken = [t.strftime('%H:%M') for t in taken_times(doctor_id, stream_date)]
+    finally:
+        # The stream holds no database connection while it waits
+        db.session.close()
+    
+    heartbeat = current_app.config['SLOT_EVENTS_HEARTBEAT']
+    lifetime = current_app.config['SLOT_EVENTS_STREAM_SECONDS']
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            yield f"event: snapshot\ndata: {json.dumps({'taken_slots': taken})}\n\n"
+            
+            deadline = clock.monotonic() + lifetime
+            while clock.monotonic() < deadline:
+                message = subscription.get(timeout=heartbeat)
+                if subscription.closed:
+                    return
+                if subscription.overflowed:
+                    # Too far behind; the client reconnects and gets a new snapshot
+                    yield 'event: resync\ndata: {}\n\n'
+                    return
+                if message is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f'event: slot\ndata: {message}\n\n'
+        finally:
+            slot_events.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# Earliest free slots across a department, instead of polling each doctor
+@bp.route('/next-available', methods=['GET'])
+@jwt_required()
+@role_required('patient')
+def get_next_available():
+    """Get the earliest free slots across all active doctors in a department"""
+    specialization_id = request.args.get('specialization_id', type=int)
+    from_str = request.args.get('from')
+    limit = request.args.get('limit', 10, type=int)
+    
+    if not specialization_id:
+        return jsonify({'error': 'specialization_id is required'}), 400
+    
+    if from_str:
+        if not validate_date(from_str):
+            return jsonify({'error': 'Invalid date format (use YYYY-MM-DD)'}), 400
+        start_date = max(datetime.strptime(from_str, '%Y-%m-%d').date(), date.today())
+    else:
+        start_date = date.today()
+    
+    limit = max(1, min(limit, 50))
+    slots = next_available_slots(specialization_id, start_date, limit)
+    
+    return jsonify({
+        'slots': slots,
+        'count': len(slots)
+    }), 200
+
+
+@bp.route('/calendar', methods=['GET'])
+@jwt_required()
+@role_required('patient')
+def get_calendar():
+    """Get availability and booked slots for one or more doctors over a date range"""
+    try:
+        doctor_ids, start_date, end_date = parse_calendar_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Only active doctors are visible to patients
+    active_ids = [row[0] for row in db.session.query(User.id).filter(
+        User.id.in_(doctor_ids),
+        User.role == 'doctor',
+        User.is_active == True
+    ).all()]
+    
+    return jsonify({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'slot_minutes': SLOT_MINUTES,
+        'doctors': doctor_calendar(active_ids, start_date, end_date)
+    }), 200
     
 # ==================== APPOINTMENTS ====================
 
@@ -294,44 +426,72 @@ def get_booked_slots():
 @role_required('patient')
 def get_appointments():
     """Get all patient's appointments"""
-    patient = get_current_user()
+    patient = get_token_user()
     
     status = request.args.get('status')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    query = Appointment.query.filter_by(patient_id=patient.id)
+    query = APPOINTMENT_WITH_TREATMENT.query(Appointment.query).filter_by(patient_id=patient.id)
     
     if status:
         query = query.filter_by(status=status)
     
+    if wants_cursor():
+        try:
+            listing = request_keyset_page(query, APPOINTMENTS)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(dict({'appointments': APPOINTMENT_WITH_TREATMENT.dump_many(listing.items)}, **listing.meta())), 200
+    
     appointments = query.order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     # Include treatment details for completed appointments
-    appointments_data = []
-    for apt in appointments.items:
-        apt_data = apt.to_dict()
-        if apt.treatment:
-            apt_data['treatment'] = apt.treatment.to_dict()
-        appointments_data.append(apt_data)
-    
     return jsonify({
-        'appointments': appointments_data,
+        'appointments': APPOINTMENT_WITH_TREATMENT.dump_many(appointments.items),
         'total': appointments.total,
         'pages': appointments.pages,
         'current_page': page
     }), 200
 
 
+def _send_booking_notifications(appointment):
+    """Booking confirmation now and a reminder 30 minutes before; never fails the booking"""
+    # Send immediate booking confirmation
+    try:
+        send_booking_confirmation(appointment)
+        logger.info(f"Booking confirmation sent for appointment #{appointment.id}")
+    except Exception as e:
+        logger.error(f"Failed to send booking confirmation: {str(e)}")
+        # Don't fail the booking if notification fails
+    
+    # Schedule 30-minute reminder
+    try:
+        # Calculate reminder time (30 minutes before appointment)
+        appointment_datetime = datetime.combine(appointment.appointment_date, appointment.appointment_time)
+        reminder_time = appointment_datetime - timedelta(minutes=30)
+        
+        # Only schedule if appointment is in the future
+        if reminder_time > datetime.now():
+            send_pre_appointment_reminder.apply_async(
+                args=[appointment.id],
+                eta=reminder_time
+            )
+            logger.info(f"Scheduled reminder for appointment #{appointment.id} at {reminder_time}")
+    except Exception as e:
+        logger.error(f"Failed to schedule reminder: {str(e)}")
+
+
 # Book appointment with payment details
 @bp.route('/appointments', methods=['POST'])
 @jwt_required()
 @role_required('patient')
+@rate_limited('booking')
 def book_appointment():
-    patient = get_current_user()
+    patient = get_token_user()
     data = request.get_json()
     
     # required fields
@@ -349,7 +509,7 @@ def book_appointment():
         return jsonify({'error': 'Invalid date format (use YYYY-MM-DD)'}), 400
     
     if not validate_time(data['appointment_time']):
-        return jsonify({'error': 'Invalid time format (use HH:MM)'}), 400
+        return jsonify({'error': 'Invalid time (use HH:MM on a 10-minute boundary)'}), 400
     
     # Parse date and time
     apt_date = datetime.strptime(data['appointment_date'], '%Y-%m-%d').date()
@@ -369,67 +529,16 @@ def book_appointment():
     if not doctor:
         return jsonify({'error': 'Doctor not found or inactive'}), 404
     
-    # doctor is available on that date
-    availability = DoctorAvailability.query.filter_by(
-        doctor_id=data['doctor_id'],
-        date=apt_date,
-        is_available=True
-    ).first()
-    
-    if not availability:
-        return jsonify({'error': 'Doctor is not available on this date'}), 400
-    
-    # time is within doctor's availability
-    if apt_time < availability.start_time or apt_time >= availability.end_time:
-        return jsonify({
-            'error': f'Time must be between {availability.start_time.strftime("%H:%M")} and {availability.end_time.strftime("%H:%M")}'
-        }), 400
-    
-    # time is during lunch break
-    if availability.lunch_break_start and availability.lunch_break_end:
-        if apt_time >= availability.lunch_break_start and apt_time < availability.lunch_break_end:
-            return jsonify({
-                'error': f'This time is during lunch break ({availability.lunch_break_start.strftime("%H:%M")} - {availability.lunch_break_end.strftime("%H:%M")})'
-            }), 400
-    
-    # appointment conflicts (same doctor, date, time)
-    conflict = Appointment.query.filter_by(
-        doctor_id=data['doctor_id'],
-        appointment_date=apt_date,
-        appointment_time=apt_time,
-        status='booked'
-    ).first()
-    
-    if conflict:
-        return jsonify({
-            'error': 'This time slot is already booked. Please choose another time.'
-        }), 409
-    
-    # 10-minute slot limit 6 per hour
-    # Get the hour of the appointment
-    apt_hour = apt_time.hour
-    
-    # Count existing appointments in this hour
-    hour_start = datetime.combine(apt_date, datetime.min.time().replace(hour=apt_hour))
-    hour_end = datetime.combine(apt_date, datetime.min.time().replace(hour=apt_hour, minute=59, second=59))
-    
-    hour_appointments = Appointment.query.filter(
-        Appointment.doctor_id == data['doctor_id'],
-        Appointment.appointment_date == apt_date,
-        Appointment.appointment_time >= hour_start.time(),
-        Appointment.appointment_time <= hour_end.time(),
-        Appointment.status == 'booked'
-    ).count()
-    
-    if hour_appointments >= 6:
-        return jsonify({
-            'error': 'Maximum appointments per hour (6) reached. Please select a different time.'
-        }), 400
+    # availability, lunch break, conflict and 6-per-hour limit in one slot claim
+    try:
+        claim_slot(doctor.id, apt_date, apt_time)
+    except SlotRejected as e:
+        return jsonify({'error': e.message}), e.status
     
     # Create appointment with payment info
     appointment = Appointment(
         patient_id=patient.id,
-        doctor_id=data['doctor_id'],
+        doctor_id=doctor.id,
         appointment_date=apt_date,
         appointment_time=apt_time,
         reason=data.get('reason', ''),
@@ -440,32 +549,23 @@ def book_appointment():
         transaction_id=f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{patient.id}"
     )
     
-    db.session.add(appointment)
-    db.session.commit()
-    
-    # Send immediate booking confirmation
+    # The booked-slot unique index is the final arbiter between concurrent bookings
     try:
-        send_booking_confirmation(appointment)
-        logger.info(f"Booking confirmation sent for appointment #{appointment.id}")
-    except Exception as e:
-        logger.error(f"Failed to send booking confirmation: {str(e)}")
-        # Don't fail the booking if notification fails
+        commit_slot_change(lambda: db.session.add(appointment))
+    except SlotConflict:
+        return jsonify({
+            'error': 'This time slot is already booked. Please choose another time.'
+        }), 409
+    except BookingBusy:
+        release_claim(doctor.id, apt_date, apt_time, True)
+        return jsonify({
+            'error': 'Booking service is busy. Please retry.'
+        }), 503, {'Retry-After': '1'}
+    except Exception:
+        release_claim(doctor.id, apt_date, apt_time, True)
+        raise
     
-    # Schedule 30-minute reminder
-    try:
-        # Calculate reminder time (30 minutes before appointment)
-        appointment_datetime = datetime.combine(apt_date, apt_time)
-        reminder_time = appointment_datetime - timedelta(minutes=30)
-        
-        # Only schedule if appointment is in the future
-        if reminder_time > datetime.now():
-            send_pre_appointment_reminder.apply_async(
-                args=[appointment.id],
-                eta=reminder_time
-            )
-            logger.info(f"Scheduled reminder for appointment #{appointment.id} at {reminder_time}")
-    except Exception as e:
-        logger.error(f"Failed to schedule reminder: {str(e)}")
+    _send_booking_notifications(appointment)
     
     return jsonify({
         'message': 'Appointment booked successfully',
@@ -483,7 +583,7 @@ def book_appointment():
 @role_required('patient')
 def get_appointment(appointment_id):
     """Get specific appointment details"""
-    patient = get_current_user()
+    patient = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -507,7 +607,7 @@ def get_appointment(appointment_id):
 @role_required('patient')
 def cancel_appointment(appointment_id):
     """Cancel an appointment"""
-    patient = get_current_user()
+    patient = get_token_user()
     
     appointment = Appointment.query.filter_by(
         id=appointment_id,
@@ -525,6 +625,7 @@ def cancel_appointment(appointment_id):
     
     appointment.status = 'cancelled'
     db.session.commit()
+    free_slot(appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
     
     return jsonify({
         'message': 'Appointment cancelled successfully',
@@ -535,9 +636,10 @@ def cancel_appointment(appointment_id):
 @bp.route('/appointments/<int:appointment_id>/reschedule', methods=['PUT'])
 @jwt_required()
 @role_required('patient')
+@rate_limited('booking')
 def reschedule_appointment(appointment_id):
     """Reschedule an appointment"""
-    patient = get_current_user()
+    patient = get_token_user()
     data = request.get_json()
     
     appointment = Appointment.query.filter_by(
@@ -565,37 +667,217 @@ def reschedule_appointment(appointment_id):
     if new_date < date.today():
         return jsonify({'error': 'Cannot reschedule to a past date'}), 400
     
-    # Check availability
-    availability = DoctorAvailability.query.filter_by(
-        doctor_id=appointment.doctor_id,
-        date=new_date,
-        is_available=True
+    # Same checks as a new booking; the booked-slot unique index rejects conflicts
+    doctor_id = appointment.doctor_id
+    old_date, old_time = appointment.appointment_date, appointment.appointment_time
+    
+    try:
+        claimed = claim_slot(doctor_id, new_date, new_time, current=(doctor_id, old_date, old_time))
+    except SlotRejected as e:
+        return jsonify({'error': e.message}), e.status
+    
+    def move():
+        appointment.appointment_date = new_date
+        appointment.appointment_time = new_time
+    
+    try:
+        commit_slot_change(move)
+    except SlotConflict:
+        return jsonify({'error': 'This time slot is already booked'}), 409
+    except BookingBusy:
+        release_claim(doctor_id, new_date, new_time, claimed)
+        return jsonify({'error': 'Booking service is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    except Exception:
+        release_claim(doctor_id, new_date, new_time, claimed)
+        raise
+    
+    if claimed:
+        free_slot(doctor_id, old_date, old_time)
+    
+    return jsonify({
+        'message': 'Appointment rescheduled successfully',
+        'appointment': appointment.to_dict()
+    }), 200
+
+
+# ==================== WAITLIST ====================
+
+@bp.route('/waitlist', methods=['GET'])
+@jwt_required()
+@role_required('patient')
+def get_waitlist():
+    """Get patient's open waitlist entries and slot offers"""
+    patient = get_token_user()
+    
+    entries = WAITLIST_ENTRY.query(WaitlistEntry.query).filter(
+        WaitlistEntry.patient_id == patient.id,
+        WaitlistEntry.status.in_(['waiting', 'offered']),
+        WaitlistEntry.date >= date.today()
+    ).order_by(WaitlistEntry.date).all()
+    
+    return jsonify({
+        'waitlist': WAITLIST_ENTRY.dump_many(entries)
+    }), 200
+
+
+@bp.route('/waitlist', methods=['POST'])
+@jwt_required()
+@role_required('patient')
+def join_waitlist():
+    """Wait for a slot with a fully booked doctor; a freed slot is held and offered"""
+    patient = get_token_user()
+    data = request.get_json()
+    
+    if not data.get('doctor_id'):
+        return jsonify({'error': 'Doctor ID is required'}), 400
+    
+    if not data.get('date') or not validate_date(data['date']):
+        return jsonify({'error': 'Invalid date format (use YYYY-MM-DD)'}), 400
+    
+    wait_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    if wait_date < date.today():
+        return jsonify({'error': 'Cannot join the waitlist for a past date'}), 400
+    
+    doctor = User.query.filter_by(
+        id=data['doctor_id'],
+        role='doctor',
+        is_active=True
     ).first()
     
-    if not availability:
+    if not doctor:
+        return jsonify({'error': 'Doctor not found or inactive'}), 404
+    
+    day = slot_engine.get_day(doctor.id, wait_date)
+    if not day.is_available:
         return jsonify({'error': 'Doctor is not available on this date'}), 400
     
-    # Check for conflicts
-    conflict = Appointment.query.filter(
-        Appointment.id != appointment_id,
-        Appointment.doctor_id == appointment.doctor_id,
-        Appointment.appointment_date == new_date,
-        Appointment.appointment_time == new_time,
-        Appointment.status == 'booked'
+    now = datetime.now()
+    if any(datetime.combine(wait_date, t) > now for t in day.free_slots()):
+        return jsonify({'error': 'Slots are still available on this date. Please book directly.'}), 400
+    
+    existing = WaitlistEntry.query.filter(
+        WaitlistEntry.patient_id == patient.id,
+        WaitlistEntry.doctor_id == doctor.id,
+        WaitlistEntry.date == wait_date,
+        WaitlistEntry.status.in_(['waiting', 'offered'])
     ).first()
     
-    if conflict:
-        return jsonify({'error': 'This time slot is already booked'}), 409
+    if existing:
+        return jsonify({'error': 'You are already on the waitlist for this date'}), 409
     
-    # Update appointment
-    appointment.appointment_date = new_date
-    appointment.appointment_time = new_time
+    entry = WaitlistEntry(
+        patient_id=patient.id,
+        doctor_id=doctor.id,
+        date=wait_date,
+        status='waiting'
+    )
+    db.session.add(entry)
     db.session.commit()
     
+    position = WaitlistEntry.query.filter(
+        WaitlistEntry.doctor_id == doctor.id,
+        WaitlistEntry.date == wait_date,
+        WaitlistEntry.status == 'waiting',
+        WaitlistEntry.id <= entry.id
+    ).count()
+    
     return jsonify({
-        'message': 'Appointment rescheduled successfully',
+        'message': 'Added to the waitlist',
+        'entry': entry.to_dict(),
+        'position': position
+    }), 201
+
+
+@bp.route('/waitlist/<int:entry_id>/accept', methods=['POST'])
+@jwt_required()
+@role_required('patient')
+def accept_waitlist_offer(entry_id):
+    """Book the slot held for the patient"""
+    patient = get_token_user()
+    data = request.get_json(silent=True) or {}
+    
+    entry = WaitlistEntry.query.filter_by(
+        id=entry_id,
+        patient_id=patient.id
+    ).first()
+    
+    if not entry:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+    
+    if not entry.has_active_offer:
+        return jsonify({'error': 'This offer is no longer available'}), 410
+    
+    doctor = entry.doctor
+    if not doctor.is_active:
+        return jsonify({'error': 'Doctor not found or inactive'}), 404
+    
+    appointment = Appointment(
+        patient_id=patient.id,
+        doctor_id=doctor.id,
+        appointment_date=entry.date,
+        appointment_time=entry.offered_time,
+        reason=data.get('reason', ''),
+        status='booked',
+        consultation_fee=doctor.consultation_fee or 500,
+        payment_status=data.get('payment_status', 'paid'),
+        payment_method=data.get('payment_method', 'card'),
+        transaction_id=f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{patient.id}"
+    )
+    
+    # The slot engine already counts the hold as taken; the booking replaces it
+    def book():
+        take_offer(entry.id)
+        db.session.add(appointment)
+    
+    try:
+        commit_slot_change(book)
+    except OfferEnded:
+        db.session.rollback()
+        return jsonify({'error': 'This offer is no longer available'}), 409
+    except SlotConflict:
+        return jsonify({'error': 'This time slot is already booked'}), 409
+    except BookingBusy:
+        return jsonify({'error': 'Booking service is busy. Please retry.'}), 503, {'Retry-After': '1'}
+    
+    _send_booking_notifications(appointment)
+    
+    return jsonify({
+        'message': 'Appointment booked successfully',
         'appointment': appointment.to_dict()
-    }), 200
+    }), 201
+
+
+@bp.route('/waitlist/<int:entry_id>', methods=['DELETE'])
+@jwt_required()
+@role_required('patient')
+def leave_waitlist(entry_id):
+    """Leave the waitlist or decline an offer, passing the slot to the next patient"""
+    patient = get_token_user()
+    
+    entry = WaitlistEntry.query.filter(
+        WaitlistEntry.id == entry_id,
+        WaitlistEntry.patient_id == patient.id,
+        WaitlistEntry.status.in_(['waiting', 'offered'])
+    ).first()
+    
+    if not entry:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+    
+    # An offer past its expiry still holds the slot until someone passes it
+    # on; the conditional update leaves that to whichever of this and the
+    # expiry job ends the offer
+    was_offered = entry.status == 'offered'
+    left = WaitlistEntry.query.filter_by(id=entry.id, status=entry.status).update(
+        {'status': 'cancelled'}, synchronize_session=False
+    )
+    db.session.commit()
+    
+    if not left:
+        return jsonify({'error': 'Waitlist entry has changed. Please refresh.'}), 409
+    if was_offered:
+        pass_on_hold(entry)
+    
+    return jsonify({'message': 'Removed from the waitlist'}), 200
 
 
 # ==================== TREATMENT HISTORY ====================
@@ -605,26 +887,12 @@ def reschedule_appointment(appointment_id):
 @role_required('patient')
 def get_treatment_history():
     """Get patient's complete treatment history"""
-    patient = get_current_user()
+    patient = get_token_user()
     
-    # Get all completed appointments with treatments
-    appointments = Appointment.query.filter_by(
-        patient_id=patient.id,
-        status='completed'
-    ).order_by(Appointment.appointment_date.desc()).all()
-    
-    history = []
-    for apt in appointments:
-        apt_data = apt.to_dict()
-        apt_data['doctor_details'] = {
-            'name': apt.doctor.full_name,
-            'specialization': apt.doctor.specialization.name if apt.doctor.specialization else None
-        }
-        
-        if apt.treatment:
-            apt_data['treatment'] = apt.treatment.to_dict()
-        
-        history.append(apt_data)
+    # Get all completed appointments with treatments, including archived ones
+    appointments = treatment_history(patient.id)
+    
+    history = APPOINTMENT_HISTORY.dump_many(appointments)
     
     return jsonify({
         'total_visits': len(history),
@@ -641,11 +909,8 @@ def export_history_sync():
     patient = get_current_user()
     
     try:
-        # Get completed appointments with treatments
-        appointments = Appointment.query.filter_by(
-            patient_id=patient.id,
-            status='completed'
-        ).order_by(Appointment.appointment_date.desc()).all()
+        # Get completed appointments with treatments, including archived ones
+        appointments = treatment_history(patient.id)
         
         if not appointments:
             return jsonify({'error': 'No treatment history to export'}), 404
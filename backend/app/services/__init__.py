@@ -0,0 +1,17 @@
+from app.services.slots import slot_engine, SlotEngine, DayBitmap
+from app.services.booking import commit_slot_change, SlotConflict, BookingBusy
+from app.services.slot_validation import claim_slot, release_claim, validate_slots, SlotRejected
+from app.services.user_search import user_search
+from app.services.daily_stats import refresh_daily_stats, rebuild_daily_stats, check_daily_stats
+from app.services.archive import archive_appointments, treatment_history
+from app.services.cascade_delete import CascadeDelete
+from app.services.token_revocation import token_revocation
+from app.services.identity_cache import identity_cache
+from app.services.passwords import password_hasher, HashingBusy
+from app.services.rate_limit import rate_limiter
+
+__all__ = ['slot_engine', 'SlotEngine', 'DayBitmap', 'commit_slot_change', 'SlotConflict', 'BookingBusy',
+           'claim_slot', 'release_claim', 'validate_slots', 'SlotRejected', 'user_search',
+           'refresh_daily_stats', 'rebuild_daily_stats', 'check_daily_stats',
+           'archive_appointments', 'treatment_history', 'CascadeDelete', 'token_revocation',
+           'identity_cache', 'password_hasher', 'HashingBusy', 'rate_limiter']
@@ -0,0 +1,106 @@
+from app import db
+from app.models import Appointment, Treatment, ArchivedAppointment, ArchivedTreatment
+from app.utils.schemas import APPOINTMENT_HISTORY, ARCHIVED_HISTORY
+from flask import current_app
+from sqlalchemy import select, insert, delete, literal, or_
+from datetime import date, datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Only finished appointments move; booked ones still hold slots
+ARCHIVABLE = ('completed', 'cancelled')
+
+_APPOINTMENT_COLUMNS = [column.name for column in Appointment.__table__.columns]
+_TREATMENT_COLUMNS = [column.name for column in Treatment.__table__.columns]
+
+
+def archive_cutoff(today=None):
+    """Appointments dated before this are old enough to archive"""
+    return (today or date.today()) - timedelta(days=current_app.config.get('ARCHIVE_AFTER_DAYS', 365))
+
+
+# ===== MOVING ROWS =====
+
+def _archivable_ids(cutoff, limit):
+    return db.session.execute(
+        select(Appointment.id).where(
+            Appointment.appointment_date < cutoff,
+            Appointment.status.in_(ARCHIVABLE),
+            # Refunds still waiting on an admin stay live
+            or_(Appointment.refund_status.is_(None), Appointment.refund_status != 'requested')
+        ).order_by(Appointment.id).limit(limit)
+    ).scalars().all()
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to batch_size archivable appointments dated before cutoff, and
+    their treatments, in one transaction. Core statements bypass the daily
+    rollup hook, which is right: the rollup counts archived appointments
+    too, so its rows don't change. Returns the number moved.
+    """
+    ids = _archivable_ids(cutoff, batch_size)
+    if not ids:
+        return 0
+
+    try:
+        now = datetime.utcnow()
+        live = Appointment.__table__
+        db.session.execute(insert(ArchivedAppointment).from_select(
+            _APPOINTMENT_COLUMNS + ['archived_at'],
+            select(*[live.c[name] for name in _APPOINTMENT_COLUMNS],
+                   literal(now, ArchivedAppointment.archived_at.type)).where(live.c.id.in_(ids))
+        ))
+        treatments = Treatment.__table__
+        db.session.execute(insert(ArchivedTreatment).from_select(
+            _TREATMENT_COLUMNS,
+            select(*[treatments.c[name] for name in _TREATMENT_COLUMNS]).where(treatments.c.appointment_id.in_(ids))
+        ))
+        db.session.execute(delete(Treatment).where(Treatment.appointment_id.in_(ids)))
+        db.session.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(ids)
+
+
+def archive_appointments(cutoff=None, batch_size=None, max_batches=None):
+    """
+    Archive appointments dated before cutoff (archive_cutoff() by default)
+    in batches of ARCHIVE_BATCH_SIZE, each its own short transaction so
+    bookings aren't held up. Stops after max_batches (ARCHIVE_MAX_BATCHES;
+    the next run continues). Returns {'archived', 'batches', 'done'}.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+    max_batches = max_batches or current_app.config.get('ARCHIVE_MAX_BATCHES', 200)
+
+    archived = batches = 0
+    while batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return {'archived': archived, 'batches': batches, 'done': True}
+        archived += moved
+        batches += 1
+        logger.info(f"Archived batch {batches}: {moved} appointments before {cutoff}")
+    return {'archived': archived, 'batches': batches, 'done': False}
+
+
+# ===== READING HISTORY =====
+
+def treatment_history(patient_id):
+    """
+    A patient's completed appointments, live and archived, newest first;
+    both serialize through the same history schema
+    """
+    live = APPOINTMENT_HISTORY.query(Appointment.query).filter_by(
+        patient_id=patient_id,
+        status='completed'
+    ).all()
+    archived = ARCHIVED_HISTORY.query(ArchivedAppointment.query).filter_by(
+        patient_id=patient_id,
+        status='completed'
+    ).all()
+    return sorted(live + archived, key=lambda apt: apt.appointment_date, reverse=True)
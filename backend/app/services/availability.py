@@ -0,0 +1,117 @@
+from app import db
+from app.models import DoctorAvailability, AvailabilityRule
+from datetime import timedelta
+from sqlalchemy import or_
+
+
+def _rules_query(doctor_ids, start_date, end_date):
+    return AvailabilityRule.query.filter(
+        AvailabilityRule.doctor_id.in_(doctor_ids),
+        AvailabilityRule.effective_from <= end_date,
+        or_(
+            AvailabilityRule.effective_until == None,
+            AvailabilityRule.effective_until >= start_date
+        )
+    ).order_by(AvailabilityRule.effective_from.desc())
+
+
+def effective_availability(doctor_id, day):
+    """
+    Availability of a doctor on one date: a concrete DoctorAvailability row
+    (override) wins, otherwise the newest weekly rule that applies, else None.
+    """
+    override = DoctorAvailability.query.filter_by(doctor_id=doctor_id, date=day).first()
+    if override:
+        return override
+
+    rules = _rules_query([doctor_id], day, day).filter(
+        AvailabilityRule.weekday == day.weekday()
+    ).all()
+    for rule in rules:
+        if rule.applies_on(day):
+            return rule.expand(day)
+    return None
+
+
+def effective_availability_range(doctor_ids, start_date, end_date, available_only=True):
+    """
+    Availability for many doctors over a date range in two queries, as a dict
+    keyed by (doctor_id, date) in date order. Rules are expanded in memory.
+    """
+    doctor_ids = list(doctor_ids)
+    if not doctor_ids:
+        return {}
+
+    overrides = {
+        (avail.doctor_id, avail.date): avail
+        for avail in DoctorAvailability.query.filter(
+            DoctorAvailability.doctor_id.in_(doctor_ids),
+            DoctorAvailability.date >= start_date,
+            DoctorAvailability.date <= end_date
+        ).all()
+    }
+
+    rules = {}
+    for rule in _rules_query(doctor_ids, start_date, end_date).all():
+        rules.setdefault((rule.doctor_id, rule.weekday), []).append(rule)
+
+    result = {}
+    day = start_date
+    while day <= end_date:
+        for doctor_id in doctor_ids:
+            avail = overrides.get((doctor_id, day))
+            if avail is None:
+                avail = next(
+                    (rule.expand(day) for rule in rules.get((doctor_id, day.weekday()), ())
+                     if rule.applies_on(day)),
+                    None
+                )
+            if avail is None or (available_only and not avail.is_available):
+                continue
+            result[(doctor_id, day)] = avail
+        day += timedelta(days=1)
+
+    return result
+
+
+def overlapping_rules(doctor_id, weekday, effective_from, effective_until=None, exclude_id=None):
+    """
+    Rules of a doctor on the same weekday whose dates meet [effective_from,
+    effective_until]. Only one rule can apply to a day, so these would shadow
+    each other (the newest effective_from wins).
+    """
+    query = AvailabilityRule.query.filter(
+        AvailabilityRule.doctor_id == doctor_id,
+        AvailabilityRule.weekday == weekday,
+        or_(
+            AvailabilityRule.effective_until == None,
+            AvailabilityRule.effective_until >= effective_from
+        )
+    )
+    if effective_until is not None:
+        query = query.filter(AvailabilityRule.effective_from <= effective_until)
+    if exclude_id is not None:
+        query = query.filter(AvailabilityRule.id != exclude_id)
+    return query.order_by(AvailabilityRule.effective_from).all()
+
+
+def end_rules_before(doctor_id, weekdays, day):
+    """
+    Make way for new open-ended rules starting on day: rules that would start
+    on or after it are deleted, and rules still running end the day before.
+    Runs in the caller's transaction.
+    """
+    rules = AvailabilityRule.query.filter(
+        AvailabilityRule.doctor_id == doctor_id,
+        AvailabilityRule.weekday.in_(list(weekdays)),
+        or_(
+            AvailabilityRule.effective_until == None,
+            AvailabilityRule.effective_until >= day
+        )
+    ).all()
+    for rule in rules:
+        if rule.effective_from >= day:
+            db.session.delete(rule)
+        else:
+            rule.effective_until = day - timedelta(days=1)
+
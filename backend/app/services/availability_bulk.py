@@ -0,0 +1,238 @@
+from app import db
+from app.models import User, DoctorAvailability
+from app.services.slots import slot_engine, DayBitmap
+from app.services.availability import effective_availability_range
+from app.utils.validators import validate_date, validate_time
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Rows per INSERT statement; keeps bound parameters well under SQLite's limit
+UPSERT_CHUNK_SIZE = 500
+
+UPSERT_FIELDS = ('start_time', 'end_time', 'is_available',
+                 'lunch_break_start', 'lunch_break_end', 'slot_capacity')
+
+
+def parse_availability_entry(entry, doctor_id=None):
+    """
+    Validate one {doctor_id, date, start_time, end_time, lunch_break_start,
+    lunch_break_end, is_available} entry. Returns (values, error). The lunch
+    break is only part of values when the entry names it, so saving hours
+    alone keeps the day's lunch break (upsert_availability).
+    """
+    if not isinstance(entry, dict):
+        return None, 'Entry must be an object'
+
+    doctor_id = doctor_id if doctor_id is not None else entry.get('doctor_id')
+    if not isinstance(doctor_id, int) or isinstance(doctor_id, bool):
+        return None, 'Doctor ID is required'
+
+    if not entry.get('date'):
+        return None, 'Date is required'
+    if not validate_date(entry['date']):
+        return None, 'Invalid date format (use YYYY-MM-DD)'
+
+    if not entry.get('start_time') or not entry.get('end_time'):
+        return None, 'Start time and end time are required'
+    if not validate_time(entry['start_time']) or not validate_time(entry['end_time']):
+        return None, 'Invalid time (use HH:MM on a 10-minute boundary)'
+
+    start_time = datetime.strptime(entry['start_time'], '%H:%M').time()
+    end_time = datetime.strptime(entry['end_time'], '%H:%M').time()
+    if start_time >= end_time:
+        return None, 'Start time must be before end time'
+
+    lunch_break_start = None
+    lunch_break_end = None
+    if entry.get('lunch_break_start') or entry.get('lunch_break_end'):
+        if not entry.get('lunch_break_start') or not entry.get('lunch_break_end'):
+            return None, 'Lunch break needs both start and end time'
+        if not validate_time(entry['lunch_break_start']) or not validate_time(entry['lunch_break_end']):
+            return None, 'Invalid lunch break time (use HH:MM on a 10-minute boundary)'
+        lunch_break_start = datetime.strptime(entry['lunch_break_start'], '%H:%M').time()
+        lunch_break_end = datetime.strptime(entry['lunch_break_end'], '%H:%M').time()
+        if lunch_break_start < start_time or lunch_break_end > end_time:
+            return None, 'Lunch break must be within working hours'
+        if lunch_break_start >= lunch_break_end:
+            return None, 'Lunch break start must be before end time'
+
+    values = {
+        'doctor_id': doctor_id,
+        'date': datetime.strptime(entry['date'], '%Y-%m-%d').date(),
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_available': bool(entry.get('is_available', True)),
+    }
+    if 'lunch_break_start' in entry or 'lunch_break_end' in entry:
+        values['lunch_break_start'] = lunch_break_start
+        values['lunch_break_end'] = lunch_break_end
+    return values, None
+
+
+def _insert_for_dialect():
+    """Dialect insert() with ON CONFLICT support, or None where there is none"""
+    name = db.engine.dialect.name
+    if name == 'postgresql':
+        return postgresql.insert
+    if name == 'sqlite':
+        return sqlite.insert
+    return None
+
+
+def _current_days(keys):
+    """Stored rows for (doctor_id, date) keys, as {key: (id, lunch_break_start, lunch_break_end)}"""
+    doctor_ids = {doctor_id for doctor_id, _ in keys}
+    dates = [day for _, day in keys]
+    rows = db.session.query(
+        DoctorAvailability.doctor_id, DoctorAvailability.date, DoctorAvailability.id,
+        DoctorAvailability.lunch_break_start, DoctorAvailability.lunch_break_end
+    ).filter(
+        DoctorAvailability.doctor_id.in_(doctor_ids),
+        DoctorAvailability.date >= min(dates),
+        DoctorAvailability.date <= max(dates)
+    )
+    return {(row.doctor_id, row.date): row for row in rows if (row.doctor_id, row.date) in keys}
+
+
+def _keep_lunch_breaks(rows, existing):
+    """
+    Fill in the lunch break of rows that don't set one: the stored row's,
+    else the weekly rule's the date was expanded from, else none
+    """
+    missing = [row for row in rows if 'lunch_break_start' not in row]
+    from_rules = [row for row in missing if (row['doctor_id'], row['date']) not in existing]
+    expanded = {}
+    if from_rules:
+        dates = [row['date'] for row in from_rules]
+        expanded = effective_availability_range(
+            {row['doctor_id'] for row in from_rules}, min(dates), max(dates), available_only=False
+        )
+    for row in missing:
+        key = (row['doctor_id'], row['date'])
+        current = existing.get(key) or expanded.get(key)
+        row['lunch_break_start'] = current.lunch_break_start if current else None
+        row['lunch_break_end'] = current.lunch_break_end if current else None
+
+
+def _write_portable(rows, existing, overwrite):
+    """
+    Select-then-write for databases without INSERT ... ON CONFLICT: one
+    multi-row INSERT for new dates and one bulk UPDATE by id for stored ones.
+    A date another transaction inserts meanwhile fails the unique constraint.
+    """
+    new_rows = [row for row in rows if (row['doctor_id'], row['date']) not in existing]
+    for offset in range(0, len(new_rows), UPSERT_CHUNK_SIZE):
+        db.session.execute(insert(DoctorAvailability.__table__), new_rows[offset:offset + UPSERT_CHUNK_SIZE])
+
+    if overwrite:
+        changes = [
+            dict({field: row[field] for field in UPSERT_FIELDS}, id=existing[(row['doctor_id'], row['date'])].id)
+            for row in rows if (row['doctor_id'], row['date']) in existing
+        ]
+        if changes:
+            db.session.execute(update(DoctorAvailability), changes)
+
+
+def upsert_availability(rows, overwrite=True):
+    """
+    Write many DoctorAvailability rows with multi-row INSERT ... ON CONFLICT
+    (doctor_id, date), or select-then-write on databases without it. With
+    overwrite=False existing dates are left untouched. Rows without lunch
+    break keys keep the day's current lunch break. Returns the set of
+    (doctor_id, date) keys that already existed. Does not commit; the
+    caller owns the transaction.
+    """
+    if not rows:
+        return set()
+
+    existing = _current_days({(row['doctor_id'], row['date']) for row in rows})
+    _keep_lunch_breaks(rows, existing)
+
+    now = datetime.utcnow()
+    for row in rows:
+        # Core inserts skip the ORM listener that fills slot_capacity
+        row['slot_capacity'] = DayBitmap.from_availability(SimpleNamespace(**row)).capacity
+        row.setdefault('created_at', now)
+
+    on_conflict_insert = _insert_for_dialect()
+    if on_conflict_insert is None:
+        _write_portable(rows, existing, overwrite)
+        return set(existing)
+
+    table = DoctorAvailability.__table__
+    for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = on_conflict_insert(table).values(rows[offset:offset + UPSERT_CHUNK_SIZE])
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['doctor_id', 'date'],
+                set_={field: stmt.excluded[field] for field in UPSERT_FIELDS}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['doctor_id', 'date'])
+        db.session.execute(stmt)
+
+    return set(existing)
+
+
+def bulk_set_availability(entries, doctor_id=None):
+    """
+    Validate and upsert a batch of availability entries in one transaction.
+    When doctor_id is given every entry is applied to that doctor. Returns a
+    result per entry, in request order, with status created, updated,
+    superseded (a later entry in the batch set the same date) or error.
+    """
+    results = [None] * len(entries)
+    parsed = {}
+
+    for index, entry in enumerate(entries):
+        values, error = parse_availability_entry(entry, doctor_id)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+            continue
+        key = (values['doctor_id'], values['date'])
+        if key in parsed:
+            earlier = parsed[key][0]
+            results[earlier] = {'index': earlier, 'status': 'superseded'}
+        parsed[key] = (index, values)
+
+    requested_doctors = {key[0] for key in parsed}
+    known_doctors = {
+        row.id for row in User.query.with_entities(User.id).filter(
+            User.id.in_(requested_doctors),
+            User.role == 'doctor'
+        )
+    } if requested_doctors else set()
+
+    rows = []
+    for key, (index, values) in list(parsed.items()):
+        if key[0] not in known_doctors:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Doctor not found'}
+            del parsed[key]
+            continue
+        rows.append(values)
+
+    existing = upsert_availability(rows)
+    db.session.commit()
+
+    for doctor, day in parsed:
+        slot_engine.invalidate(doctor, day)
+
+    for (doctor, day), (index, values) in parsed.items():
+        results[index] = {
+            'index': index,
+            'status': 'updated' if (doctor, day) in existing else 'created',
+            'doctor_id': doctor,
+            'date': day.isoformat(),
+            'slot_capacity': values['slot_capacity']
+        }
+
+    return results
+
+
+def summarize_results(results):
+    summary = {'created': 0, 'updated': 0, 'superseded': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
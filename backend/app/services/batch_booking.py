@@ -0,0 +1,193 @@
+from app import db
+from app.models import User, Appointment
+from app.services.slots import slot_engine, OK, TAKEN, decision_message
+from app.services.slot_validation import validate_slots
+from app.services.booking import commit_slot_change, SlotConflict, BookingBusy
+from app.services.slot_events import slot_events, BOOKED
+from app.services.daily_stats import refresh_daily_stats
+from app.utils.validators import validate_date, validate_time
+from sqlalchemy import insert
+from datetime import datetime, date
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Re-plans after a concurrent booking takes a slot between validation and commit
+BATCH_ATTEMPTS = 3
+
+
+def parse_booking_item(item):
+    """
+    Validate one {patient_id, doctor_id, appointment_date, appointment_time,
+    reason, payment_status, payment_method} item. Returns (values, error).
+    """
+    if not isinstance(item, dict):
+        return None, 'Item must be an object'
+
+    for field in ('patient_id', 'doctor_id'):
+        if not isinstance(item.get(field), int) or isinstance(item.get(field), bool):
+            return None, f'{field} is required'
+
+    if not item.get('appointment_date') or not item.get('appointment_time'):
+        return None, 'Appointment date and time are required'
+
+    if not validate_date(item['appointment_date']):
+        return None, 'Invalid date format (use YYYY-MM-DD)'
+
+    if not validate_time(item['appointment_time']):
+        return None, 'Invalid time (use HH:MM on a 10-minute boundary)'
+
+    apt_date = datetime.strptime(item['appointment_date'], '%Y-%m-%d').date()
+    if apt_date < date.today():
+        return None, 'Cannot book appointment in the past'
+
+    return {
+        'patient_id': item['patient_id'],
+        'doctor_id': item['doctor_id'],
+        'appointment_date': apt_date,
+        'appointment_time': datetime.strptime(item['appointment_time'], '%H:%M').time(),
+        'reason': item.get('reason', ''),
+        # Same default as a single booking, so the rollup counts the revenue
+        'payment_status': item.get('payment_status', 'paid'),
+        'payment_method': item.get('payment_method')
+    }, None
+
+
+def _plan(parsed, results):
+    """
+    Decide every parsed item against one snapshot of patients, doctors,
+    availability and taken slots (six queries regardless of batch size).
+    Fills results for rejected items and returns [(index, row)] to insert.
+    """
+    patient_ids = {values['patient_id'] for _, values in parsed}
+    doctor_ids = {values['doctor_id'] for _, values in parsed}
+
+    patients = {
+        row.id for row in User.query.with_entities(User.id).filter(
+            User.id.in_(patient_ids), User.role == 'patient', User.is_active == True
+        )
+    }
+    doctors = {
+        row.id: row.consultation_fee for row in User.query.with_entities(
+            User.id, User.consultation_fee
+        ).filter(
+            User.id.in_(doctor_ids), User.role == 'doctor', User.is_active == True
+        )
+    }
+
+    candidates = []
+    for index, values in parsed:
+        if values['patient_id'] not in patients:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Patient not found or inactive'}
+        elif values['doctor_id'] not in doctors:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Doctor not found or inactive'}
+        else:
+            candidates.append((index, values))
+
+    # Later items in the same batch see slots taken by earlier ones
+    decisions = validate_slots([
+        (values['doctor_id'], values['appointment_date'], values['appointment_time'])
+        for _, values in candidates
+    ])
+
+    planned = []
+    for (index, values), (decision, bitmap) in zip(candidates, decisions):
+        if decision != OK:
+            results[index] = {
+                'index': index,
+                'status': 'conflict' if decision == TAKEN else 'error',
+                'error': decision_message(decision, bitmap)
+            }
+            continue
+
+        fee = doctors[values['doctor_id']]
+        planned.append((index, dict(
+            values,
+            status='booked',
+            consultation_fee=fee or 500,
+            transaction_id=f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{values['patient_id']}"
+        )))
+
+    return planned
+
+
+def book_batch(items):
+    """
+    Validate and book many appointments in one transaction. Returns
+    (results, appointment_ids): a result per item in request order with
+    status booked, conflict or error, and the ids of the new appointments.
+    Raises BookingBusy if concurrent bookings keep invalidating the plan.
+    """
+    parsed = []
+    base_results = [None] * len(items)
+    for index, item in enumerate(items):
+        values, error = parse_booking_item(item)
+        if error:
+            base_results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            parsed.append((index, values))
+
+    if not parsed:
+        return base_results, []
+
+    for attempt in range(BATCH_ATTEMPTS):
+        results = list(base_results)
+        planned = _plan(parsed, results)
+        rows = [row for _, row in planned]
+
+        if not rows:
+            return results, []
+
+        # Multi-row INSERT ... RETURNING; rows come back in no guaranteed
+        # order, so ids are matched on the slot, which is unique in the batch
+        inserted = {}
+
+        def insert_rows():
+            inserted.clear()
+            returned = db.session.execute(
+                insert(Appointment).returning(
+                    Appointment.id, Appointment.doctor_id,
+                    Appointment.appointment_date, Appointment.appointment_time
+                ),
+                rows
+            )
+            for appointment_id, doctor_id, day, t in returned:
+                inserted[(doctor_id, day, t)] = appointment_id
+            # Same transaction as the insert, which skips the ORM flush hook
+            refresh_daily_stats({(doctor_id, day) for doctor_id, day, _ in inserted})
+
+        try:
+            commit_slot_change(insert_rows)
+        except SlotConflict:
+            # A single booking won a slot after the snapshot; plan again
+            logger.warning(f"Batch booking lost a slot race (attempt {attempt + 1}), re-planning")
+            continue
+
+        for doctor_id, day in {(row['doctor_id'], row['appointment_date']) for row in rows}:
+            slot_engine.invalidate(doctor_id, day)
+
+        appointment_ids = []
+        for index, row in planned:
+            appointment_id = inserted[(row['doctor_id'], row['appointment_date'], row['appointment_time'])]
+            appointment_ids.append(appointment_id)
+            # Bulk inserts bypass the ORM flush hook that publishes slot events
+            slot_events.publish(row['doctor_id'], row['appointment_date'], row['appointment_time'], BOOKED)
+            results[index] = {
+                'index': index,
+                'status': 'booked',
+                'appointment_id': appointment_id,
+                'patient_id': row['patient_id'],
+                'doctor_id': row['doctor_id'],
+                'appointment_date': row['appointment_date'].isoformat(),
+                'appointment_time': row['appointment_time'].strftime('%H:%M')
+            }
+        return results, appointment_ids
+
+    raise BookingBusy()
+
+
+def summarize_booking_results(results):
+    summary = {'booked': 0, 'conflict': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
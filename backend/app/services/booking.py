@@ -0,0 +1,59 @@
+from app import db
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, OperationalError
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SLOT_INDEX_NAME = 'uq_appointments_booked_slot'
+
+
+class SlotConflict(Exception):
+    """The slot was taken by a concurrent booking (HTTP 409)"""
+
+
+class BookingBusy(Exception):
+    """The database stayed locked through every retry (HTTP 503, retry later)"""
+
+
+def _is_slot_violation(error):
+    message = str(error.orig)
+    return SLOT_INDEX_NAME in message or 'appointments.appointment_time' in message
+
+
+def _is_contention(error):
+    message = str(error.orig).lower()
+    return 'locked' in message or 'deadlock' in message or 'could not serialize' in message
+
+
+def commit_slot_change(apply_change):
+    """
+    Apply a booking change and commit it, relying on the booked-slot unique
+    index instead of a check-then-insert. apply_change() is re-run after each
+    rollback, so it must (re)stage the whole change on the session.
+    """
+    retries = current_app.config.get('BOOKING_COMMIT_RETRIES', 3)
+    backoff = current_app.config.get('BOOKING_RETRY_BACKOFF', 0.05)
+
+    for attempt in range(retries + 1):
+        try:
+            # Core statements (batch booking's INSERT) fail here, ORM changes on commit
+            apply_change()
+            db.session.commit()
+            return
+        except IntegrityError as e:
+            db.session.rollback()
+            if _is_slot_violation(e):
+                raise SlotConflict() from e
+            raise
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_contention(e):
+                raise
+            logger.warning(f"Booking commit contended (attempt {attempt + 1}): {str(e.orig)}")
+            if attempt < retries:
+                time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+    raise BookingBusy()
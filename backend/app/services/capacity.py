@@ -0,0 +1,198 @@
+from app import db
+from app.models import User, Appointment, WaitlistEntry
+from app.services.availability import effective_availability_range
+from app.services.slots import slot_engine, DayBitmap, SLOTS_PER_DAY, slot_index, taken_times_range
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy import func, select, union_all
+
+# How far ahead a "next available" search looks before giving up
+SEARCH_HORIZON_DAYS = 90
+
+# Longest range the calendar endpoints accept (one quarter)
+MAX_CALENDAR_DAYS = 92
+
+
+def _taken_counts(doctor_ids, start_date, end_date):
+    """{(doctor_id, date): booked appointments plus active waitlist holds} in one grouped query"""
+    taken = union_all(
+        select(Appointment.doctor_id.label('doctor_id'), Appointment.appointment_date.label('day')).where(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.status == 'booked',
+            Appointment.appointment_date >= start_date,
+            Appointment.appointment_date <= end_date
+        ),
+        select(WaitlistEntry.doctor_id, WaitlistEntry.date).where(
+            WaitlistEntry.doctor_id.in_(doctor_ids),
+            WaitlistEntry.status == 'offered',
+            WaitlistEntry.offer_expires_at > datetime.utcnow(),
+            WaitlistEntry.date >= start_date,
+            WaitlistEntry.date <= end_date
+        )
+    ).subquery()
+
+    return dict(((doctor_id, day), count) for doctor_id, day, count in db.session.query(
+        taken.c.doctor_id,
+        taken.c.day,
+        func.count()
+    ).group_by(
+        taken.c.doctor_id,
+        taken.c.day
+    ).all())
+
+
+def open_doctor_days(start_date, end_date, specialization_id=None, doctor_ids=None, window_days=7):
+    """
+    Yield (doctor_id, date, doctor_name, bitmap) for doctor-days with a free
+    slot, in date order. Days whose slot_capacity (from an override row or a
+    weekly rule) is used up by bookings and waitlist holds are dropped on
+    grouped counts alone; only the rest get bitmaps, built from their taken
+    times or taken from the slot engine for days it already holds. The range
+    is walked in windows of a few set-based queries and one slot engine
+    round trip each, so an early stop costs little.
+    """
+    query = db.session.query(User.id, User.full_name).filter(
+        User.role == 'doctor',
+        User.is_active == True
+    )
+    if specialization_id:
+        query = query.filter(User.specialization_id == specialization_id)
+    if doctor_ids is not None:
+        query = query.filter(User.id.in_(doctor_ids))
+    names = dict(query.order_by(User.id).all())
+    if not names:
+        return
+
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+
+        counts = _taken_counts(names, window_start, window_end)
+        days = {
+            key: avail for key, avail in effective_availability_range(names, window_start, window_end).items()
+            if avail.slot_capacity > counts.get(key, 0)
+        }
+        taken = taken_times_range({doctor_id for doctor_id, _ in days}, window_start, window_end) if days else {}
+        loaded = {}
+        for key, avail in sorted(days.items(), key=lambda item: (item[0][1], item[1].start_time)):
+            bitmap = DayBitmap.from_availability(avail, taken.get(key, ()))
+            if bitmap.free_mask:
+                loaded[key] = bitmap
+
+        for (doctor_id, day), bitmap in slot_engine.get_days(loaded).items():
+            if bitmap.free_mask:
+                yield doctor_id, day, names[doctor_id], bitmap
+
+        window_start = window_end + timedelta(days=1)
+
+
+def next_available_slots(specialization_id, start_date, limit):
+    """Earliest free slots across all active doctors of a department"""
+    now = datetime.now()
+    end_date = start_date + timedelta(days=SEARCH_HORIZON_DAYS)
+    candidates = open_doctor_days(start_date, end_date, specialization_id=specialization_id)
+
+    slots = []
+    for day, rows in groupby(candidates, key=lambda row: row[1]):
+        day_slots = []
+        for doctor_id, _, doctor_name, bitmap in rows:
+            for t in bitmap.free_slots():
+                if day == now.date() and t <= now.time():
+                    continue
+                day_slots.append((t, doctor_id, doctor_name))
+
+        day_slots.sort(key=lambda item: (item[0], item[1]))
+        slots.extend({
+            'doctor_id': doctor_id,
+            'doctor_name': doctor_name,
+            'date': day.isoformat(),
+            'time': t.strftime('%H:%M')
+        } for t, doctor_id, doctor_name in day_slots)
+
+        # Later days can only hold later slots
+        if len(slots) >= limit:
+            break
+
+    return slots[:limit]
+
+
+def slots_remaining(doctor_ids, start_date, end_date):
+    """
+    {doctor_id: {'slots_remaining', 'next_available_date'}} over a date range:
+    each day's slot_capacity minus its booked appointments and waitlist holds,
+    from the availability and count queries alone (no per-slot bitmaps).
+    """
+    summary = {doctor_id: {'slots_remaining': 0, 'next_available_date': None} for doctor_id in doctor_ids}
+    if not doctor_ids:
+        return summary
+
+    taken = _taken_counts(doctor_ids, start_date, end_date)
+    days = effective_availability_range(doctor_ids, start_date, end_date)
+    for (doctor_id, day), avail in sorted(days.items(), key=lambda item: item[0][1]):
+        remaining = max(avail.slot_capacity - taken.get((doctor_id, day), 0), 0)
+        if remaining:
+            entry = summary[doctor_id]
+            entry['slots_remaining'] += remaining
+            if entry['next_available_date'] is None:
+                entry['next_available_date'] = day.isoformat()
+
+    return summary
+
+
+def parse_calendar_args(args, max_doctors=50):
+    """Read doctor_ids/start/end query args, raising ValueError with a user-facing message"""
+    try:
+        doctor_ids = [int(value) for value in args.get('doctor_ids', '').split(',') if value.strip()]
+    except ValueError:
+        raise ValueError('doctor_ids must be a comma-separated list of ids')
+
+    if not doctor_ids:
+        raise ValueError('doctor_ids is required')
+
+    if len(doctor_ids) > max_doctors:
+        raise ValueError(f'At most {max_doctors} doctors per request')
+
+    try:
+        start_date = datetime.strptime(args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('start and end are required (use YYYY-MM-DD)')
+
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+
+    if (end_date - start_date).days >= MAX_CALENDAR_DAYS:
+        raise ValueError(f'Date range cannot exceed {MAX_CALENDAR_DAYS} days')
+
+    return doctor_ids, start_date, end_date
+
+
+def doctor_calendar(doctor_ids, start_date, end_date):
+    """
+    Per-day working hours, lunch break, booked slot offsets and remaining
+    capacity for many doctors over a date range, in four queries regardless of
+    the number of doctors or days. Booked offsets count 10-minute slots from
+    the day's start time; slots held for the waitlist count as booked.
+    """
+    availability = effective_availability_range(doctor_ids, start_date, end_date).values()
+    booked = taken_times_range(doctor_ids, start_date, end_date)
+
+    calendar = {doctor_id: [] for doctor_id in doctor_ids}
+    for avail in availability:
+        bitmap = DayBitmap.from_availability(avail, booked.get((avail.doctor_id, avail.date), ()))
+        first_slot = slot_index(avail.start_time)
+        booked_slots = bitmap.booked_mask & bitmap.open_mask
+        calendar[avail.doctor_id].append({
+            'date': avail.date.isoformat(),
+            'start_time': avail.start_time.strftime('%H:%M'),
+            'end_time': avail.end_time.strftime('%H:%M'),
+            'lunch_break': [
+                avail.lunch_break_start.strftime('%H:%M'),
+                avail.lunch_break_end.strftime('%H:%M')
+            ] if avail.lunch_break_start and avail.lunch_break_end else None,
+            'booked': [i - first_slot for i in range(first_slot, SLOTS_PER_DAY) if booked_slots >> i & 1],
+            'capacity': bitmap.capacity,
+            'remaining': bin(bitmap.free_mask).count('1')
+        })
+
+    return calendar
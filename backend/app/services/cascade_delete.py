@@ -0,0 +1,160 @@
+from app import db, cache
+from app.models import (User, Department, Appointment, Treatment, ArchivedAppointment, ArchivedTreatment,
+                        DoctorAvailability, AvailabilityRule, WaitlistEntry, DailyDoctorStats)
+from app.services.daily_stats import refresh_daily_stats
+from app.services.departments import invalidate_department_listing
+from app.services.slots import slot_engine
+from app.services.token_revocation import revoke_after_commit
+from app.services.identity_cache import invalidate_after_commit
+from sqlalchemy import select, delete, update, func
+from datetime import date
+import logging
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('department', 'doctor', 'patient')
+
+# (appointment model, its treatment model), live then archived
+_APPOINTMENT_TABLES = ((Appointment, Treatment), (ArchivedAppointment, ArchivedTreatment))
+
+
+class CascadeDelete:
+    """
+    Permanent delete of a department (with its doctors), a doctor or a
+    patient, and every row that depends on them: treatments, appointments
+    (live and archived), availability, weekly rules, waitlist entries and
+    the daily rollup. Each table is cleared by one DELETE ... WHERE ... IN
+    (subquery of the users being removed), so the statement count doesn't
+    grow with the number of doctors or appointments.
+
+    run() does it all in the caller's transaction. Very large histories go
+    through delete_appointment_chunk() first, one committed chunk at a time
+    (app.tasks.cascade_delete), with the users deactivated so nothing new
+    is booked meanwhile. Call after_commit() once the delete is committed.
+    """
+
+    def __init__(self, kind, target_id):
+        if kind not in KINDS:
+            raise ValueError(f'Unknown cascade delete kind: {kind}')
+        self.kind = kind
+        self.target_id = target_id
+        if kind == 'department':
+            self.users = (User.role == 'doctor', User.specialization_id == target_id)
+        else:
+            self.users = (User.id == target_id, User.role == kind)
+        self.user_ids = select(User.id).where(*self.users)
+        self.removes_doctors = kind != 'patient'
+        # Column linking appointments and waitlist entries to the removed users
+        self.column = 'doctor_id' if self.removes_doctors else 'patient_id'
+        self._slot_days = set()
+        self._doctor_ids = []
+        self._remembered = False
+
+    def _owned(self, model):
+        return getattr(model, self.column).in_(self.user_ids)
+
+    def _forget_users(self, user_ids):
+        """Core statements skip the session hooks: revoke tokens and drop cached identities on commit"""
+        revoke_after_commit(db.session, user_ids)
+        invalidate_after_commit(db.session, user_ids)
+
+    def _execute(self, statement):
+        return db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+
+    # ===== SIZE / PROGRESS =====
+
+    def appointment_count(self):
+        """Live and archived appointments the delete removes"""
+        return sum(
+            db.session.query(func.count(model.id)).filter(self._owned(model)).scalar()
+            for model, _ in _APPOINTMENT_TABLES
+        )
+
+    def deactivate(self):
+        """Keep the users from logging in or being booked while a chunked delete runs"""
+        self._forget_users(db.session.execute(self.user_ids).scalars().all())
+        self._execute(update(User).where(*self.users).values(is_active=False))
+
+    # ===== DELETING =====
+
+    def _remember_caches(self):
+        """Slot engine days to drop once the delete commits; read before the first delete"""
+        if self._remembered:
+            return
+        self._remembered = True
+        if self.removes_doctors:
+            self._doctor_ids = db.session.execute(self.user_ids).scalars().all()
+            return
+        # A removed patient's future bookings and waitlist holds free slots
+        self._slot_days |= set(db.session.execute(
+            select(Appointment.doctor_id, Appointment.appointment_date).where(
+                self._owned(Appointment), Appointment.status == 'booked', Appointment.appointment_date >= date.today()
+            ).distinct()
+        ).all())
+        self._slot_days |= set(db.session.execute(
+            select(WaitlistEntry.doctor_id, WaitlistEntry.date).where(
+                self._owned(WaitlistEntry), WaitlistEntry.status == 'offered'
+            ).distinct()
+        ).all())
+
+    def _stats_days(self, model, condition):
+        """Other doctors' rollup days a patient's appointments count towards"""
+        if self.removes_doctors:
+            return set()
+        return set(db.session.execute(
+            select(model.doctor_id, model.appointment_date).where(condition).distinct()
+        ).all())
+
+    def _delete_appointments(self, model, treatment_model, condition):
+        days = self._stats_days(model, condition)
+        self._execute(delete(treatment_model).where(
+            treatment_model.appointment_id.in_(select(model.id).where(condition))
+        ))
+        deleted = self._execute(delete(model).where(condition))
+        if days:
+            refresh_daily_stats(days)
+        return deleted
+
+    def delete_appointment_chunk(self, chunk_size):
+        """
+        Delete up to chunk_size of the appointments (live first, then
+        archived) with their treatments, in the caller's transaction.
+        Returns how many went; 0 once none are left.
+        """
+        self._remember_caches()
+        for model, treatment_model in _APPOINTMENT_TABLES:
+            ids = db.session.execute(
+                select(model.id).where(self._owned(model)).order_by(model.id).limit(chunk_size)
+            ).scalars().all()
+            if ids:
+                return self._delete_appointments(model, treatment_model, model.id.in_(ids))
+        return 0
+
+    def run(self):
+        """Delete the users and everything depending on them, in the caller's transaction"""
+        self._remember_caches()
+        deleted = {}
+        for model, treatment_model in _APPOINTMENT_TABLES:
+            deleted[model.__tablename__] = self._delete_appointments(model, treatment_model, self._owned(model))
+
+        deleted['waitlist_entries'] = self._execute(delete(WaitlistEntry).where(self._owned(WaitlistEntry)))
+        if self.removes_doctors:
+            for model in (DailyDoctorStats, DoctorAvailability, AvailabilityRule):
+                deleted[model.__tablename__] = self._execute(delete(model).where(model.doctor_id.in_(self.user_ids)))
+
+        self._forget_users(self._doctor_ids if self.removes_doctors else [self.target_id])
+        deleted['users'] = self._execute(delete(User).where(*self.users))
+        if self.kind == 'department':
+            deleted['departments'] = self._execute(delete(Department).where(Department.id == self.target_id))
+        logger.info(f"Cascade delete of {self.kind} {self.target_id}: {deleted}")
+        return deleted
+
+    def after_commit(self):
+        """Drop cached state that referred to the deleted rows"""
+        for doctor_id in self._doctor_ids:
+            slot_engine.invalidate_doctor(doctor_id)
+        for doctor_id, day in self._slot_days:
+            slot_engine.invalidate(doctor_id, day)
+        cache.delete('admin_dashboard')
+        if self.removes_doctors:
+            invalidate_department_listing()
@@ -0,0 +1,273 @@
+from app import db
+from app.models import Appointment, ArchivedAppointment, DailyDoctorStats
+from sqlalchemy import event, select, insert, delete, union_all, tuple_, and_, true
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('booked', 'completed', 'cancelled')
+REFUND_STATUSES = ('approved', 'completed')
+FIELDS = ('total', 'booked', 'completed', 'cancelled', 'refunded', 'paid_revenue', 'patients', 'hour_counts')
+
+# (doctor_id, day) keys per IN (...) statement
+KEY_BATCH = 500
+
+# Rows written per INSERT during a rebuild
+REBUILD_CHUNK = 5000
+
+_SOURCE = ('doctor_id', 'appointment_date', 'appointment_time', 'status', 'payment_status',
+           'refund_status', 'consultation_fee', 'patient_id')
+
+# Archived appointments (app.services.archive) still count, so archiving
+# leaves the rollup unchanged
+_SOURCE_TABLES = (Appointment.__table__, ArchivedAppointment.__table__)
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+# Appointment attributes the rollup reads; edits to anything else (reason,
+# payment method) don't refresh it
+TRACKED = ('doctor_id', 'appointment_date', 'appointment_time', 'status', 'payment_status',
+           'refund_status', 'consultation_fee', 'patient_id')
+
+
+# ===== AGGREGATION =====
+
+def _aggregate(doctor_id, day, rows):
+    """Rollup values for one doctor-day from its appointment rows"""
+    stats = dict(doctor_id=doctor_id, day=day, total=0, booked=0, completed=0, cancelled=0,
+                 refunded=0, paid_revenue=Decimal('0.00'), hour_counts=[0] * 24)
+    patients = set()
+    for _, _, t, status, payment_status, refund_status, fee, patient_id in rows:
+        stats['total'] += 1
+        if status in STATUSES:
+            stats[status] += 1
+        if refund_status in REFUND_STATUSES or payment_status == 'refunded':
+            stats['refunded'] += 1
+        if payment_status == 'paid' and fee:
+            stats['paid_revenue'] += Decimal(fee)
+        stats['hour_counts'][t.hour] += 1
+        patients.add(patient_id)
+    stats['patients'] = len(patients)
+    return stats
+
+
+def _aggregate_ordered(rows):
+    """Rollup values per doctor-day from rows ordered by doctor_id, appointment_date"""
+    for (doctor_id, day), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        yield _aggregate(doctor_id, day, group)
+
+
+def _source(condition):
+    """
+    Live and archived appointment rows in doctor-day order; condition(table)
+    gives the WHERE clause for each table
+    """
+    rows = union_all(*[
+        select(*[table.c[name] for name in _SOURCE]).where(condition(table)) for table in _SOURCE_TABLES
+    ]).subquery()
+    return select(rows).order_by(rows.c.doctor_id, rows.c.appointment_date)
+
+
+def _scope(doctor_id=None, start=None, end=None):
+    """(appointment condition(table), rollup condition) for an optional doctor and date range"""
+    rollup = []
+    if doctor_id is not None:
+        rollup.append(DailyDoctorStats.doctor_id == doctor_id)
+    if start is not None:
+        rollup.append(DailyDoctorStats.day >= start)
+    if end is not None:
+        rollup.append(DailyDoctorStats.day <= end)
+
+    def source(table):
+        conditions = []
+        if doctor_id is not None:
+            conditions.append(table.c.doctor_id == doctor_id)
+        if start is not None:
+            conditions.append(table.c.appointment_date >= start)
+        if end is not None:
+            conditions.append(table.c.appointment_date <= end)
+        return and_(true(), *conditions)
+
+    return source, and_(true(), *rollup)
+
+
+def _source_rows(connection, condition):
+    """Appointment rows for the rollup, streamed in doctor-day order"""
+    return connection.execution_options(yield_per=REBUILD_CHUNK).execute(_source(condition))
+
+
+# ===== INCREMENTAL REFRESH =====
+
+def _lock_days(connection, keys):
+    """
+    Make sure a rollup row exists for each key and lock them, so concurrent
+    refreshes of a doctor-day run one after the other and each aggregates
+    the other's committed appointments. SQLite's single writer already
+    serializes them.
+    """
+    upsert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if upsert is None:
+        return
+    connection.execute(
+        upsert(DailyDoctorStats).on_conflict_do_nothing(index_elements=['doctor_id', 'day']),
+        [dict(doctor_id=doctor_id, day=day, total=0, booked=0, completed=0, cancelled=0, refunded=0,
+              paid_revenue=0, patients=0, hour_counts=[0] * 24, updated_at=datetime.utcnow())
+         for doctor_id, day in keys]
+    )
+    connection.execute(
+        select(DailyDoctorStats.id).where(
+            tuple_(DailyDoctorStats.doctor_id, DailyDoctorStats.day).in_(keys)
+        ).with_for_update()
+    ).all()
+
+
+def refresh_daily_stats(days, connection=None):
+    """
+    Recompute the rollup rows for (doctor_id, day) keys from live and
+    archived appointments, in the caller's transaction. Days left without appointments lose their
+    row. Statements that bypass the ORM flush hook call this themselves.
+    """
+    keys = sorted({key for key in days if None not in key})
+    connection = connection or db.session.connection()
+
+    for offset in range(0, len(keys), KEY_BATCH):
+        batch = keys[offset:offset + KEY_BATCH]
+        _lock_days(connection, batch)
+
+        rows = connection.execute(_source(
+            lambda table: tuple_(table.c.doctor_id, table.c.appointment_date).in_(batch)
+        ))
+        fresh = {(stats['doctor_id'], stats['day']): stats for stats in _aggregate_ordered(rows)}
+
+        empty = [key for key in batch if key not in fresh]
+        if empty:
+            connection.execute(delete(DailyDoctorStats).where(
+                tuple_(DailyDoctorStats.doctor_id, DailyDoctorStats.day).in_(empty)
+            ))
+        if not fresh:
+            continue
+
+        now = datetime.utcnow()
+        values = [dict(stats, updated_at=now) for stats in fresh.values()]
+        upsert = _UPSERT_DIALECTS.get(connection.dialect.name)
+        if upsert is not None:
+            statement = upsert(DailyDoctorStats)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=['doctor_id', 'day'],
+                set_={field: statement.excluded[field] for field in FIELDS + ('updated_at',)}
+            ), values)
+        else:
+            connection.execute(delete(DailyDoctorStats).where(
+                tuple_(DailyDoctorStats.doctor_id, DailyDoctorStats.day).in_(list(fresh))
+            ))
+            connection.execute(insert(DailyDoctorStats), values)
+
+
+# ===== REBUILD / CONSISTENCY =====
+
+def rebuild_daily_stats(doctor_id=None, start=None, end=None):
+    """
+    Replace the rollup rows in scope (one doctor and/or a date range, or
+    everything) with a fresh aggregation of appointments. The caller
+    commits. Returns the number of rollup rows written.
+    """
+    source, rollup = _scope(doctor_id, start, end)
+    connection = db.session.connection()
+    connection.execute(delete(DailyDoctorStats).where(rollup))
+
+    now = datetime.utcnow()
+    written = 0
+    chunk = []
+    for stats in _aggregate_ordered(_source_rows(connection, source)):
+        chunk.append(dict(stats, updated_at=now))
+        if len(chunk) == REBUILD_CHUNK:
+            connection.execute(insert(DailyDoctorStats), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(DailyDoctorStats), chunk)
+        written += len(chunk)
+    return written
+
+
+def _normalize(stats):
+    return {field: (Decimal(stats[field]).quantize(Decimal('0.01')) if field == 'paid_revenue'
+                    else list(stats[field]) if field == 'hour_counts' else stats[field])
+            for field in FIELDS}
+
+
+def check_daily_stats(doctor_id=None, start=None, end=None):
+    """
+    Compare the rollup in scope against a fresh aggregation of appointments.
+    Returns [{'doctor_id', 'day', 'field', 'rollup', 'actual'}]; field is
+    'row' when a doctor-day is missing from (or extra in) the rollup.
+    """
+    source, rollup = _scope(doctor_id, start, end)
+    connection = db.session.connection()
+
+    stored = {
+        (row.doctor_id, row.day): _normalize(row._mapping)
+        for row in connection.execute(
+            select(DailyDoctorStats.doctor_id, DailyDoctorStats.day,
+                   *[getattr(DailyDoctorStats, field) for field in FIELDS]).where(rollup)
+        )
+    }
+
+    mismatches = []
+    for stats in _aggregate_ordered(_source_rows(connection, source)):
+        key = (stats['doctor_id'], stats['day'])
+        actual = _normalize(stats)
+        existing = stored.pop(key, None)
+        if existing is None:
+            mismatches.append(dict(doctor_id=key[0], day=key[1], field='row', rollup=None, actual='present'))
+            continue
+        for field in FIELDS:
+            if existing[field] != actual[field]:
+                mismatches.append(dict(doctor_id=key[0], day=key[1], field=field,
+                                       rollup=existing[field], actual=actual[field]))
+
+    for doctor, day in stored:
+        mismatches.append(dict(doctor_id=doctor, day=day, field='row', rollup='present', actual=None))
+    return mismatches
+
+
+# ===== APPOINTMENT CHANGE CAPTURE =====
+
+def _values(obj, key):
+    """Current and pre-change values of an attribute, without loading it"""
+    history = get_history(obj, key)
+    return set(history.added or ()) | set(history.unchanged or ()) | set(history.deleted or ())
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_stats_days(session, flush_context, instances):
+    pending = session.info.setdefault('daily_stats_days', set())
+    changed = [obj for obj in session.new if isinstance(obj, Appointment)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, Appointment) and any(get_history(obj, key).has_changes() for key in TRACKED)
+    ]
+    changed += [obj for obj in session.deleted if isinstance(obj, Appointment)]
+    for obj in changed:
+        # A reschedule or reassignment touches both the old and the new day
+        for doctor_id in _values(obj, 'doctor_id'):
+            for day in _values(obj, 'appointment_date'):
+                pending.add((doctor_id, day))
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_stats_days(session, flush_context):
+    pending = session.info.pop('daily_stats_days', None)
+    if pending:
+        refresh_daily_stats(pending, session.connection())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stats_days(session):
+    session.info.pop('daily_stats_days', None)
@@ -0,0 +1,63 @@
+from app import db
+from app.models import User, Appointment, ArchivedAppointment, DailyDoctorStats
+from sqlalchemy import select, union, func, case
+
+STATUSES = ('booked', 'completed', 'cancelled')
+
+
+def _sum(column, condition=None):
+    value = column if condition is None else case((condition, column), else_=0)
+    return func.coalesce(func.sum(value), 0)
+
+
+def appointment_stats(doctor_id=None, since=None, include_patients=False, include_users=False):
+    """
+    Appointment counts for the hospital, or one doctor when doctor_id is
+    given, summed from the daily_doctor_stats rollup in one query:
+
+        {'total', 'booked', 'completed', 'cancelled',
+         'patients',                                        # if include_patients
+         'since': {'booked', 'completed', 'cancelled'},     # if since is given
+         'active_doctors', 'active_patients'}               # if include_users
+
+    'since' restricts the status counts to days >= since. Distinct patients
+    can't be summed from per-day rows, so 'patients' is a subquery over
+    live and archived appointments and opt-in; the user counts are scalar subqueries too, so
+    everything shares the round trip.
+    """
+    columns = [_sum(DailyDoctorStats.total)] + [_sum(getattr(DailyDoctorStats, status)) for status in STATUSES]
+    if include_patients:
+        # UNION drops duplicates, so its row count is the distinct patients
+        patient_ids = []
+        for model in (Appointment, ArchivedAppointment):
+            ids = select(model.patient_id)
+            if doctor_id is not None:
+                ids = ids.where(model.doctor_id == doctor_id)
+            patient_ids.append(ids)
+        columns.append(select(func.count()).select_from(union(*patient_ids).subquery()).scalar_subquery())
+    if since is not None:
+        columns += [_sum(getattr(DailyDoctorStats, status), DailyDoctorStats.day >= since) for status in STATUSES]
+    if include_users:
+        columns += [
+            db.session.query(func.count(User.id)).filter(
+                User.role == role, User.is_active == True
+            ).scalar_subquery()
+            for role in ('doctor', 'patient')
+        ]
+
+    query = db.session.query(*columns).select_from(DailyDoctorStats)
+    if doctor_id is not None:
+        query = query.filter(DailyDoctorStats.doctor_id == doctor_id)
+    row = list(query.one())
+
+    stats = {'total': row.pop(0)}
+    for status in STATUSES:
+        stats[status] = row.pop(0)
+    if include_patients:
+        stats['patients'] = row.pop(0)
+    if since is not None:
+        stats['since'] = {status: row.pop(0) for status in STATUSES}
+    if include_users:
+        stats['active_doctors'] = row.pop(0)
+        stats['active_patients'] = row.pop(0)
+    return stats
@@ -0,0 +1,59 @@
+from app import db, cache
+from app.models import User, Department
+from flask import current_app
+from sqlalchemy import func, case, and_
+import logging
+
+logger = logging.getLogger(__name__)
+
+LISTING_CACHE_KEY = 'department_listing'
+
+
+def _load_listing():
+    """Every department with its total and active doctor counts, in one query"""
+    rows = db.session.query(
+        Department,
+        func.count(User.id),
+        func.count(case((User.is_active == True, User.id)))
+    ).outerjoin(
+        User, and_(User.specialization_id == Department.id, User.role == 'doctor')
+    ).group_by(Department.id).order_by(Department.id).all()
+
+    return [
+        {
+            'id': department.id,
+            'name': department.name,
+            'description': department.description,
+            'doctors_count': total,
+            'available_doctors': active
+        }
+        for department, total, active in rows
+    ]
+
+
+def department_listing():
+    """
+    Cached department listing. Callers that add, deactivate or move a
+    doctor, or change a department, call invalidate_department_listing().
+    """
+    try:
+        listing = cache.get(LISTING_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Department listing cache unavailable: {str(e)}")
+        return _load_listing()
+
+    if listing is None:
+        listing = _load_listing()
+        try:
+            cache.set(LISTING_CACHE_KEY, listing,
+                      timeout=current_app.config.get('DEPARTMENT_LISTING_TIMEOUT', 300))
+        except Exception as e:
+            logger.warning(f"Failed to cache department listing: {str(e)}")
+    return listing
+
+
+def invalidate_department_listing():
+    try:
+        cache.delete(LISTING_CACHE_KEY)
+    except Exception as e:
+        logger.error(f"Failed to invalidate department listing: {str(e)}")
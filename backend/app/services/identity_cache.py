@@ -0,0 +1,167 @@
+from app import redis_client
+from app.models import User, Department
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from collections import OrderedDict
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityCache:
+    """
+    Serialized users (User.to_dict(), which includes the specialization name)
+    shared across workers in Redis under identity:<id>, with a small
+    per-process L1 in front. Authentication, role checks for tokens without
+    claims, profile reads and /api/auth/me are served from here, so a warm
+    cache needs no database read.
+
+    Entries are dropped after every committed change to a user or a
+    department name (session hook below, plus explicit calls for Core
+    statements). Other processes' L1 copies can lag by IDENTITY_CACHE_L1_TTL
+    seconds; deactivation doesn't depend on this cache, it revokes tokens
+    (app.services.token_revocation).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.backend = 'redis'
+        self.ttl = 300
+        self.l1_ttl = 5
+        self.l1_size = 10000
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_retry_at = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('IDENTITY_CACHE_ENABLED', True)
+        self.backend = app.config.get('IDENTITY_CACHE_BACKEND', 'redis')
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 300)
+        self.l1_ttl = app.config.get('IDENTITY_CACHE_L1_TTL', 5)
+        self.l1_size = app.config.get('IDENTITY_CACHE_L1_SIZE', 10000)
+        with self._lock:
+            self._l1.clear()
+
+    # ===== L1 =====
+
+    def _l1_get(self, user_id):
+        with self._lock:
+            entry = self._l1.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._l1[user_id]
+                return None
+            self._l1.move_to_end(user_id)
+            return entry[1]
+
+    def _l1_put(self, user_id, identity):
+        with self._lock:
+            self._l1[user_id] = (time.monotonic() + self.l1_ttl, identity)
+            self._l1.move_to_end(user_id)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    # ===== REDIS =====
+
+    def _redis_available(self):
+        return self.backend == 'redis' and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, e):
+        logger.warning(f"Identity cache falling back to process memory: {str(e)}")
+        self._redis_retry_at = time.monotonic() + 30
+
+    # ===== API =====
+
+    def get(self, user_id):
+        """User.to_dict() for a user, or None if there is no such user"""
+        if not self.enabled:
+            return self._load(user_id)
+
+        identity = self._l1_get(user_id)
+        if identity is not None:
+            return dict(identity)
+
+        if self._redis_available():
+            try:
+                cached = redis_client.get(f'identity:{user_id}')
+                if cached is not None:
+                    identity = json.loads(cached)
+                    self._l1_put(user_id, identity)
+                    return dict(identity)
+            except RedisError as e:
+                self._redis_failed(e)
+
+        identity = self._load(user_id)
+        if identity is None:
+            return None
+        if self._redis_available():
+            try:
+                redis_client.set(f'identity:{user_id}', json.dumps(identity), ex=self.ttl)
+            except RedisError as e:
+                self._redis_failed(e)
+        self._l1_put(user_id, identity)
+        return dict(identity)
+
+    def _load(self, user_id):
+        from app.utils.decorators import load_user
+
+        user = load_user(user_id)
+        return user.to_dict() if user is not None else None
+
+    def invalidate(self, user_ids):
+        """Drop users' cached identities"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._l1.pop(user_id, None)
+        if self._redis_available():
+            try:
+                redis_client.delete(*[f'identity:{user_id}' for user_id in user_ids])
+            except RedisError as e:
+                self._redis_failed(e)
+
+
+identity_cache = IdentityCache()
+
+
+# ===== USER CHANGE CAPTURE =====
+
+def invalidate_after_commit(session, user_ids):
+    """Drop identities once session commits; for Core statements that skip the ORM hook"""
+    session.info.setdefault('identity_changes', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_identity_changes(session, flush_context, instances):
+    pending = session.info.setdefault('identity_changes', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            pending.add(obj.id)
+        elif isinstance(obj, Department) and session.is_modified(obj):
+            # Doctors' identities carry the department name
+            with session.no_autoflush:
+                pending.update(session.execute(
+                    select(User.id).where(User.specialization_id == obj.id)
+                ).scalars())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_identities(session):
+    pending = session.info.pop('identity_changes', None)
+    if pending:
+        identity_cache.invalidate(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_identity_changes(session):
+    session.info.pop('identity_changes', None)
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt as _bcrypt
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued; the caller should retry"""
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification at BCRYPT_LOG_ROUNDS, run on a small
+    per-process thread pool (PASSWORD_HASH_WORKERS) rather than the request
+    thread. bcrypt releases the GIL, so the pool size caps how many cores a
+    login burst can take, and other requests keep being served. At most
+    PASSWORD_HASH_QUEUE hashes wait for a worker; beyond that, or after
+    PASSWORD_HASH_TIMEOUT seconds, HashingBusy is raised (503 + Retry-After).
+    PASSWORD_HASH_WORKERS = 0 hashes inline on the calling thread.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.timeout = 10
+        self._shape = (0, 0)
+        self._pool = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        shape = (app.config.get('PASSWORD_HASH_WORKERS', 2), app.config.get('PASSWORD_HASH_QUEUE', 32))
+        # create_app runs again in every Celery task; keep a pool of the same shape
+        if shape == self._shape:
+            return
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        workers, queue = self._shape = shape
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers else None
+
+    def _run(self, fn, *args):
+        if self._pool is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            logger.warning("Password hash timed out waiting for a worker")
+            raise HashingBusy()
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost"""
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        """True if password matches; malformed stored hashes never match"""
+        return self._run(_verify, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made at a different cost than configured"""
+        return cost(password_hash) != self.rounds
+
+
+def _hash(password, rounds):
+    return _bcrypt.hashpw(password.encode('utf-8'), _bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(password, password_hash):
+    try:
+        return _bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+def cost(password_hash):
+    """Work factor of a stored bcrypt hash ($2b$12$...), or None if it isn't one"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,199 @@
+from app import redis_client
+from redis.exceptions import RedisError
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'rate_limit:stats'
+
+# KEYS: stats hash, then one bucket hash per limit. ARGV: policy name, then
+# (limit name, capacity, refill per second) for each bucket.
+# Takes one token from every bucket, or from none if any is empty. Returns
+# {0, 0} when allowed, else {milliseconds until a token is free, bucket number}.
+TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local wait, blocker = 0, 0
+for i = 2, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 3])
+    local rate = tonumber(ARGV[3 * i - 2])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    levels[i] = tokens
+    if tokens < 1 and (1 - tokens) / rate > wait then
+        wait, blocker = (1 - tokens) / rate, i - 1
+    end
+end
+if blocker > 0 then
+    redis.call('HINCRBY', KEYS[1], ARGV[1] .. ':throttled:' .. ARGV[3 * blocker - 1], 1)
+    return {math.ceil(wait * 1000), blocker}
+end
+for i = 2, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 3])
+    local rate = tonumber(ARGV[3 * i - 2])
+    redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1] .. ':allowed', 1)
+return {0, 0}
+"""
+
+
+class Limit:
+    """One token bucket a request draws from: `capacity` tokens refilled at `rate` per second"""
+
+    def __init__(self, name, key, capacity, seconds):
+        self.name = name
+        self.key = key
+        self.capacity = capacity
+        self.rate = capacity / seconds
+
+
+class MemoryBuckets:
+    """Process-local buckets and counters, used when Redis is disabled or unreachable"""
+
+    def __init__(self, max_buckets):
+        self.max_buckets = max_buckets
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def take(self, policy, limits):
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait, blocker = 0, None
+            for limit in limits:
+                tokens, ts, _ = self._buckets.get(limit.key, (limit.capacity, now, now))
+                tokens = min(limit.capacity, tokens + (now - ts) * limit.rate)
+                levels.append(tokens)
+                if tokens < 1 and (1 - tokens) / limit.rate > wait:
+                    wait, blocker = (1 - tokens) / limit.rate, limit
+            if blocker is not None:
+                self._count(f'{policy}:throttled:{blocker.name}')
+                return math.ceil(wait * 1000), blocker.name
+            for limit, tokens in zip(limits, levels):
+                # Third item: when the bucket is full again, the same as no bucket
+                self._buckets[limit.key] = (tokens - 1, now, now + (limit.capacity - tokens + 1) / limit.rate)
+            self._count(f'{policy}:allowed')
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+        return 0, None
+
+    def _count(self, field):
+        self._stats[field] = self._stats.get(field, 0) + 1
+
+    def _prune(self, now):
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                del self._buckets[key]
+        # Still too many: drop the least recently inserted
+        for key in list(self._buckets)[:len(self._buckets) - self.max_buckets]:
+            del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limits for expensive endpoints that are cheap to spam
+    (login, registration, booking). Each route names a policy in
+    RATE_LIMITS, which gives a bucket per client key (ip, username or
+    user) as (burst, seconds): up to `burst` requests at once, refilling
+    at burst / seconds per second. A request takes a token from each of its
+    buckets atomically in one Lua script, so the limits hold across all
+    workers; when a bucket is empty the request is refused with the time
+    until it refills (429 + Retry-After).
+
+    If Redis is unreachable, buckets are kept in process memory, so each
+    worker enforces the limits on its own until Redis is back. Allowed and
+    throttled requests are counted per policy (and per limit that throttled
+    them) in Redis under rate_limit:stats, see counters().
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.backend = 'redis'
+        self.policies = {}
+        self.memory = MemoryBuckets(10000)
+        self._take = None
+        self._redis_retry_at = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self.backend = app.config.get('RATE_LIMIT_BACKEND', 'redis')
+        self.policies = app.config.get('RATE_LIMITS', {})
+        self.memory = MemoryBuckets(app.config.get('RATE_LIMIT_MEMORY_SIZE', 10000))
+        self._take = redis_client.register_script(TAKE_SCRIPT) if self.backend == 'redis' else None
+
+    def _limits(self, policy, keys):
+        limits = []
+        for name, (capacity, seconds) in sorted(self.policies.get(policy, {}).items()):
+            value = keys.get(name)
+            if value is not None and value != '':
+                limits.append(Limit(name, f'rate_limit:{policy}:{name}:{value}', capacity, seconds))
+        return limits
+
+    def hit(self, policy, **keys):
+        """
+        Count a request against a policy's buckets, keyed by the given client
+        keys (ip=, username=, user=; missing ones are skipped). Returns 0
+        when allowed, else the seconds to wait before retrying.
+        """
+        if not self.enabled:
+            return 0
+        limits = self._limits(policy, keys)
+        if not limits:
+            return 0
+
+        now = time.monotonic()
+        wait_ms = None
+        if self._take is not None and now >= self._redis_retry_at:
+            args = [policy]
+            for limit in limits:
+                args += [limit.name, limit.capacity, limit.rate]
+            try:
+                wait_ms, _ = self._take(keys=[STATS_KEY] + [limit.key for limit in limits], args=args)
+            except RedisError as e:
+                logger.warning(f"Rate limiter falling back to process memory: {str(e)}")
+                self._redis_retry_at = now + 30
+        if wait_ms is None:
+            wait_ms, _ = self.memory.take(policy, limits)
+        return math.ceil(wait_ms / 1000) if wait_ms else 0
+
+    def counters(self):
+        """
+        Allowed and throttled requests per policy, from Redis (all workers)
+        plus any this process counted in memory while Redis was down
+        """
+        fields = self.memory.stats()
+        if self._take is not None and time.monotonic() >= self._redis_retry_at:
+            try:
+                for field, count in redis_client.hgetall(STATS_KEY).items():
+                    field = field.decode()
+                    fields[field] = fields.get(field, 0) + int(count)
+            except RedisError as e:
+                logger.warning(f"Rate limit counters unavailable from Redis: {str(e)}")
+
+        counters = {
+            policy: {'allowed': 0, 'throttled': 0, 'throttled_by': {}}
+            for policy in self.policies
+        }
+        for field, count in fields.items():
+            policy, outcome, *limit = field.split(':')
+            entry = counters.setdefault(policy, {'allowed': 0, 'throttled': 0, 'throttled_by': {}})
+            entry[outcome] += count
+            if limit:
+                entry['throttled_by'][limit[0]] = entry['throttled_by'].get(limit[0], 0) + count
+        return counters
+
+
+rate_limiter = RateLimiter()
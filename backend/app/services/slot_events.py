@@ -0,0 +1,241 @@
+from app import redis_client, jwt
+from app.models.appointment import Appointment
+from flask import current_app, request, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from redis.exceptions import RedisError
+import json
+import queue
+import threading
+import time
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'slot-events'
+STREAM_ENDPOINT = 'patient.stream_slot_changes'
+
+BOOKED = 'booked'
+RELEASED = 'released'
+HELD = 'held'
+
+
+def channel_name(doctor_id, day):
+    return f'{CHANNEL_PREFIX}:{doctor_id}:{day.isoformat()}'
+
+
+class Subscription:
+    """Events for one doctor-day, buffered for a single stream"""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+        # Set when the stream fell behind and dropped events; it must resync
+        self.overflowed = False
+        self.closed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def close(self):
+        """Ask the stream to end; wakes it if it is waiting"""
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        """Next JSON message, or None after timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SlotEventBus:
+    """
+    Fans out slot changes to server-sent event streams.
+
+    Events are published on a Redis channel per doctor-day. Each process
+    holds one pattern subscription and hands messages to its local streams,
+    so a subscriber costs a queue rather than a Redis connection. Without
+    Redis, events are delivered to the streams of the publishing process only.
+    """
+
+    def __init__(self):
+        self.backend = 'redis'
+        self.queue_size = 100
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._redis_retry_at = 0
+
+    def init_app(self, app):
+        self.backend = app.config.get('SLOT_EVENTS_BACKEND', 'redis')
+        self.queue_size = app.config.get('SLOT_EVENTS_QUEUE_SIZE', 100)
+
+    def publish(self, doctor_id, day, t, status):
+        channel = channel_name(doctor_id, day)
+        message = json.dumps({
+            'doctor_id': doctor_id,
+            'date': day.isoformat(),
+            'time': t.strftime('%H:%M'),
+            'status': status
+        })
+
+        now = time.monotonic()
+        if self.backend == 'redis' and now >= self._redis_retry_at:
+            try:
+                redis_client.publish(channel, message)
+                return
+            except RedisError as e:
+                logger.warning(f"Slot events falling back to local delivery: {str(e)}")
+                self._redis_retry_at = now + 30
+        self._dispatch(channel, message)
+
+    def subscribe(self, doctor_id, day):
+        subscription = Subscription(channel_name(doctor_id, day), self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.channel, set()).add(subscription)
+            if self.backend == 'redis' and self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='slot-events-listener', daemon=True
+                )
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def close_all(self):
+        """End every open stream in this process, e.g. before shutdown; clients reconnect"""
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscriptions.values() for s in subscribers]
+        for subscription in subscriptions:
+            subscription.close()
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+    def _dispatch(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.push(message)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{CHANNEL_PREFIX}:*')
+                for message in pubsub.listen():
+                    self._dispatch(message['channel'].decode(), message['data'].decode())
+            except RedisError as e:
+                logger.warning(f"Slot events listener disconnected: {str(e)}")
+                time.sleep(5)
+
+
+slot_events = SlotEventBus()
+
+
+# ==================== Appointment change capture ====================
+
+def _old_value(obj, key):
+    history = get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _slot_changes(obj, deleted=False):
+    """(doctor_id, date, time, status) events implied by a pending Appointment change"""
+    old = None
+    if inspect(obj).has_identity and _old_value(obj, 'status') == 'booked':
+        old = (_old_value(obj, 'doctor_id'), _old_value(obj, 'appointment_date'),
+               _old_value(obj, 'appointment_time'))
+
+    new = None
+    # status is still None on a new row until the column default applies
+    if not deleted and obj.status in (None, 'booked'):
+        new = (obj.doctor_id, obj.appointment_date, obj.appointment_time)
+
+    if old == new:
+        return []
+    changes = []
+    if old and None not in old:
+        changes.append(old + (RELEASED,))
+    if new and None not in new:
+        changes.append(new + (BOOKED,))
+    return changes
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_slot_events(session, flush_context, instances):
+    pending = session.info.setdefault('slot_events', [])
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            pending.extend(_slot_changes(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj):
+            pending.extend(_slot_changes(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            pending.extend(_slot_changes(obj, deleted=True))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_slot_events(session):
+    pending = session.info.pop('slot_events', None)
+    for doctor_id, day, t, status in pending or ():
+        try:
+            slot_events.publish(doctor_id, day, t, status)
+        except Exception as e:
+            logger.error(f"Failed to publish slot event: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_slot_events(session):
+    session.info.pop('slot_events', None)
+
+
+# ===== STREAM TOKENS =====
+
+def create_stream_token():
+    """
+    Token for the current user that opens slot change streams and nothing
+    else. EventSource can't send headers, so it goes in the URL, where
+    access logs and browser history keep it; it lives only
+    SLOT_EVENTS_TOKEN_SECONDS and is checked when a stream connects.
+    """
+    claims = get_jwt()
+    return create_access_token(
+        identity=get_jwt_identity(),
+        expires_delta=timedelta(seconds=current_app.config['SLOT_EVENTS_TOKEN_SECONDS']),
+        additional_claims=dict({key: claims[key] for key in ('role', 'active') if key in claims}, stream=True)
+    )
+
+
+@jwt.token_verification_loader
+def _stream_token_scope(jwt_header, jwt_payload):
+    # Stream tokens open streams only, and streams take only stream tokens
+    return bool(jwt_payload.get('stream')) == (request.endpoint == STREAM_ENDPOINT)
+
+
+@jwt.token_verification_failed_loader
+def _stream_token_rejected(jwt_header, jwt_payload):
+    return jsonify({'error': 'Token not valid for this endpoint'}), 401
@@ -0,0 +1,79 @@
+from app.services.availability import effective_availability_range
+from app.services.slots import (slot_engine, taken_times_range, slot_index, DayBitmap,
+                                OK, decision_message, decision_status)
+
+
+class SlotRejected(Exception):
+    """A booking decision other than OK, with its user-facing message and HTTP status"""
+
+    def __init__(self, decision, bitmap):
+        super().__init__(decision)
+        self.decision = decision
+        self.message = decision_message(decision, bitmap)
+        self.status = decision_status(decision)
+
+
+def claim_slot(doctor_id, day, t, current=None):
+    """
+    The single check every booking path makes before committing: doctor
+    availability, working hours, lunch break and the slot itself (10-minute
+    slots, so at most 6 bookings an hour). The slot is reserved in the slot
+    engine; the caller releases it if the commit fails.
+
+    current is the (doctor_id, date, time) an appointment already holds when
+    it is being moved; staying within the same slot is always allowed.
+    Returns True if a slot was claimed, False for a no-op move. Raises
+    SlotRejected otherwise.
+    """
+    if current is not None:
+        current_doctor, current_day, current_time = current
+        if (current_doctor, current_day) == (doctor_id, day) and slot_index(current_time) == slot_index(t):
+            return False
+
+    decision, bitmap = slot_engine.claim(doctor_id, day, t)
+    if decision != OK:
+        raise SlotRejected(decision, bitmap)
+    return True
+
+
+def release_claim(doctor_id, day, t, claimed):
+    """Undo claim_slot after a failed commit"""
+    if claimed:
+        slot_engine.release(doctor_id, day, t)
+
+
+def validate_slots(candidates):
+    """
+    Batched form of claim_slot for many (doctor_id, date, time) candidates
+    without reserving anything (batch booking plans with it). Availability
+    and taken slots for all of them are read in a fixed number of queries.
+    Candidates are decided in order, so a later candidate for a slot an
+    earlier one got is TAKEN.
+
+    Returns [(decision, bitmap)] in candidate order.
+    """
+    if not candidates:
+        return []
+
+    doctor_ids = {doctor_id for doctor_id, _, _ in candidates}
+    start_date = min(day for _, day, _ in candidates)
+    end_date = max(day for _, day, _ in candidates)
+
+    availability = effective_availability_range(doctor_ids, start_date, end_date, available_only=False)
+    taken = taken_times_range(doctor_ids, start_date, end_date)
+
+    days = {}
+    decisions = []
+    for doctor_id, day, t in candidates:
+        key = (doctor_id, day)
+        if key not in days:
+            days[key] = DayBitmap.from_availability(availability.get(key), taken.get(key, ()))
+        bitmap = days[key]
+
+        decision = bitmap.reason(t)
+        if decision == OK:
+            bitmap.booked_mask |= 1 << slot_index(t)
+        decisions.append((decision, bitmap))
+
+    return decisions
+
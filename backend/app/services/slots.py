@@ -0,0 +1,511 @@
+from app import db, redis_client
+from app.models.appointment import Appointment
+from app.models.availability import DoctorAvailability
+from app.models.availability_rule import AvailabilityRule
+from app.models.waitlist import WaitlistEntry
+from app.services.availability import effective_availability
+from app.utils.validators import SLOT_MINUTES
+from datetime import datetime, time
+from redis.exceptions import RedisError
+from sqlalchemy import event
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A doctor-day is a grid of 10-minute slots (144 per day). Bit i of a mask is
+# the slot starting at i * 10 minutes past midnight. Because an hour holds
+# exactly six slots, the "6 appointments per hour" rule is enforced by the grid.
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Booking decisions returned by SlotEngine.check / SlotEngine.claim
+OK = 'ok'
+UNAVAILABLE = 'unavailable'
+OUTSIDE_HOURS = 'outside_hours'
+LUNCH_BREAK = 'lunch_break'
+TAKEN = 'taken'
+
+
+def slot_index(t):
+    """Slot number for a time of day"""
+    return (t.hour * 60 + t.minute) // SLOT_MINUTES
+
+
+def slot_time(index):
+    """Start time of a slot number"""
+    minutes = index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def range_mask(start, end):
+    """Bitmask of the slots covering [start, end)"""
+    first = slot_index(start)
+    last = slot_index(end)
+    if end.minute % SLOT_MINUTES or end.second:
+        last += 1
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def _fmt(t):
+    return t.strftime('%H:%M') if t else None
+
+
+def _parse(value):
+    return datetime.strptime(value, '%H:%M').time() if value else None
+
+
+class DayBitmap:
+    """Working slots and booked slots of one doctor on one date"""
+
+    def __init__(self, open_mask=0, booked_mask=0, start_time=None, end_time=None,
+                 lunch_break_start=None, lunch_break_end=None):
+        self.open_mask = open_mask
+        self.booked_mask = booked_mask
+        self.start_time = start_time
+        self.end_time = end_time
+        self.lunch_break_start = lunch_break_start
+        self.lunch_break_end = lunch_break_end
+
+    @classmethod
+    def from_availability(cls, availability, booked_times=()):
+        """Build from a DoctorAvailability row (or None) and booked appointment times"""
+        booked_mask = 0
+        for t in booked_times:
+            booked_mask |= 1 << slot_index(t)
+
+        # is_available is still None on a pending row, where the column default applies
+        if availability is None or availability.is_available is False:
+            return cls(booked_mask=booked_mask)
+
+        open_mask = range_mask(availability.start_time, availability.end_time)
+        if availability.lunch_break_start and availability.lunch_break_end:
+            open_mask &= ~range_mask(availability.lunch_break_start, availability.lunch_break_end)
+
+        return cls(
+            open_mask=open_mask,
+            booked_mask=booked_mask,
+            start_time=availability.start_time,
+            end_time=availability.end_time,
+            lunch_break_start=availability.lunch_break_start,
+            lunch_break_end=availability.lunch_break_end
+        )
+
+    @property
+    def is_available(self):
+        return self.start_time is not None
+
+    @property
+    def free_mask(self):
+        return self.open_mask & ~self.booked_mask
+
+    @property
+    def capacity(self):
+        return bin(self.open_mask).count('1')
+
+    def free_slots(self):
+        """Bookable start times of all free slots, in order"""
+        free = self.free_mask
+        return [max(slot_time(i), self.start_time) for i in range(SLOTS_PER_DAY) if free >> i & 1]
+
+    def reason(self, t):
+        """Why a booking at time t would be rejected, or OK"""
+        if not self.is_available:
+            return UNAVAILABLE
+        if t < self.start_time or t >= self.end_time:
+            return OUTSIDE_HOURS
+        if self.lunch_break_start and self.lunch_break_end:
+            if self.lunch_break_start <= t < self.lunch_break_end:
+                return LUNCH_BREAK
+        bit = 1 << slot_index(t)
+        if not self.open_mask & bit:
+            return OUTSIDE_HOURS
+        if self.booked_mask & bit:
+            return TAKEN
+        return OK
+
+    def to_meta(self):
+        return {
+            'start_time': _fmt(self.start_time) or '',
+            'end_time': _fmt(self.end_time) or '',
+            'lunch_break_start': _fmt(self.lunch_break_start) or '',
+            'lunch_break_end': _fmt(self.lunch_break_end) or ''
+        }
+
+    @classmethod
+    def from_meta(cls, meta, open_mask, booked_mask):
+        return cls(
+            open_mask=open_mask,
+            booked_mask=booked_mask,
+            start_time=_parse(meta.get('start_time')),
+            end_time=_parse(meta.get('end_time')),
+            lunch_break_start=_parse(meta.get('lunch_break_start')),
+            lunch_break_end=_parse(meta.get('lunch_break_end'))
+        )
+
+
+def _mask_to_bytes(mask):
+    """Encode a mask in Redis bit order (offset 0 is the high bit of byte 0)"""
+    data = bytearray(SLOTS_PER_DAY // 8)
+    for i in range(SLOTS_PER_DAY):
+        if mask >> i & 1:
+            data[i // 8] |= 0x80 >> (i % 8)
+    return bytes(data)
+
+
+def _bytes_to_mask(data):
+    mask = 0
+    for i in range(min(len(data) * 8, SLOTS_PER_DAY)):
+        if data[i // 8] & (0x80 >> (i % 8)):
+            mask |= 1 << i
+    return mask
+
+
+class MemorySlotStore:
+    """Process-local bitmap store, used when Redis is disabled or unreachable"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def get(self, doctor_id, day):
+        with self._lock:
+            entry = self._days.get((doctor_id, day))
+            if entry is None:
+                return None
+            expires_at, bitmap = entry
+            if expires_at < datetime.utcnow().timestamp():
+                del self._days[(doctor_id, day)]
+                return None
+            return bitmap
+
+    def put(self, doctor_id, day, bitmap):
+        with self._lock:
+            self._days[(doctor_id, day)] = (datetime.utcnow().timestamp() + self.ttl, bitmap)
+
+    def get_many(self, keys):
+        return [self.get(doctor_id, day) for doctor_id, day in keys]
+
+    def put_many(self, bitmaps):
+        for (doctor_id, day), bitmap in bitmaps.items():
+            self.put(doctor_id, day, bitmap)
+
+    def claim(self, doctor_id, day, index):
+        with self._lock:
+            entry = self._days.get((doctor_id, day))
+            if entry is None:
+                return None
+            bitmap = entry[1]
+            bit = 1 << index
+            if not bitmap.open_mask & bit:
+                return False
+            if bitmap.booked_mask & bit:
+                return False
+            bitmap.booked_mask |= bit
+            return True
+
+    def release(self, doctor_id, day, index):
+        with self._lock:
+            entry = self._days.get((doctor_id, day))
+            if entry is not None:
+                entry[1].booked_mask &= ~(1 << index)
+
+    def delete(self, doctor_id, day):
+        with self._lock:
+            self._days.pop((doctor_id, day), None)
+
+    def delete_doctor(self, doctor_id):
+        with self._lock:
+            for key in [key for key in self._days if key[0] == doctor_id]:
+                del self._days[key]
+
+
+# KEYS: meta hash, open bits, booked bits. ARGV: slot index.
+# Returns -1 when the day is not loaded, 0 when the slot is closed or taken, 1 when claimed.
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+if redis.call('GETBIT', KEYS[2], ARGV[1]) == 0 then return 0 end
+if redis.call('GETBIT', KEYS[3], ARGV[1]) == 1 then return 0 end
+redis.call('SETBIT', KEYS[3], ARGV[1], 1)
+return 1
+"""
+
+# Same keys. Clears a booked bit only while the day is loaded.
+RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('SETBIT', KEYS[3], ARGV[1], 0)
+return 1
+"""
+
+
+class RedisSlotStore:
+    """Bitmap store shared by every web worker, using SETBIT/GETBIT on Redis strings"""
+
+    def __init__(self, client, ttl, prefix='slots'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def _keys(self, doctor_id, day):
+        base = f'{self.prefix}:{doctor_id}:{day.isoformat()}'
+        return [f'{base}:meta', f'{base}:open', f'{base}:booked']
+
+    def get(self, doctor_id, day):
+        return self.get_many([(doctor_id, day)])[0]
+
+    def put(self, doctor_id, day, bitmap):
+        self.put_many({(doctor_id, day): bitmap})
+
+    def get_many(self, keys):
+        """Bitmaps (or None) for many doctor-days in one round trip"""
+        pipe = self.client.pipeline(transaction=False)
+        for doctor_id, day in keys:
+            meta_key, open_key, booked_key = self._keys(doctor_id, day)
+            pipe.hgetall(meta_key)
+            pipe.get(open_key)
+            pipe.get(booked_key)
+        results = pipe.execute()
+
+        bitmaps = []
+        for i in range(0, len(results), 3):
+            meta, open_bits, booked_bits = results[i:i + 3]
+            if not meta:
+                bitmaps.append(None)
+                continue
+            meta = {k.decode(): v.decode() for k, v in meta.items()}
+            bitmaps.append(DayBitmap.from_meta(meta, _bytes_to_mask(open_bits or b''),
+                                               _bytes_to_mask(booked_bits or b'')))
+        return bitmaps
+
+    def put_many(self, bitmaps):
+        pipe = self.client.pipeline(transaction=True)
+        for (doctor_id, day), bitmap in bitmaps.items():
+            meta_key, open_key, booked_key = self._keys(doctor_id, day)
+            pipe.delete(meta_key)
+            pipe.hset(meta_key, mapping=bitmap.to_meta())
+            pipe.set(open_key, _mask_to_bytes(bitmap.open_mask), ex=self.ttl)
+            pipe.set(booked_key, _mask_to_bytes(bitmap.booked_mask), ex=self.ttl)
+            pipe.expire(meta_key, self.ttl)
+        pipe.execute()
+
+    def claim(self, doctor_id, day, index):
+        result = self._claim(keys=self._keys(doctor_id, day), args=[index])
+        if result == -1:
+            return None
+        return result == 1
+
+    def release(self, doctor_id, day, index):
+        self._release(keys=self._keys(doctor_id, day), args=[index])
+
+    def delete(self, doctor_id, day):
+        self.client.delete(*self._keys(doctor_id, day))
+
+    def delete_doctor(self, doctor_id):
+        keys = list(self.client.scan_iter(match=f'{self.prefix}:{doctor_id}:*', count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+def taken_times_range(doctor_ids, start_date, end_date):
+    """
+    Times of booked appointments and active waitlist holds for many doctors
+    over a date range in two queries, as sorted lists keyed by (doctor_id, date).
+    """
+    booked_times = db.session.query(
+        Appointment.doctor_id, Appointment.appointment_date, Appointment.appointment_time
+    ).filter(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.appointment_date >= start_date,
+        Appointment.appointment_date <= end_date,
+        Appointment.status == 'booked'
+    ).all()
+
+    # Slots held for a waitlisted patient are taken until the offer ends
+    held_times = db.session.query(
+        WaitlistEntry.doctor_id, WaitlistEntry.date, WaitlistEntry.offered_time
+    ).filter(
+        WaitlistEntry.doctor_id.in_(doctor_ids),
+        WaitlistEntry.date >= start_date,
+        WaitlistEntry.date <= end_date,
+        WaitlistEntry.status == 'offered',
+        WaitlistEntry.offer_expires_at > datetime.utcnow()
+    ).all()
+
+    taken = {}
+    for doctor_id, day, t in sorted(booked_times + held_times):
+        taken.setdefault((doctor_id, day), []).append(t)
+    return taken
+
+
+def taken_times(doctor_id, day):
+    """Sorted times of booked appointments and active waitlist holds on a doctor-day"""
+    return taken_times_range([doctor_id], day, day).get((doctor_id, day), [])
+
+
+def slot_taken(doctor_id, day, t):
+    """
+    Whether a booking or hold still sits in the slot of t. Appointments made
+    before times had to be on the grid can share a slot (10:00 and 10:05),
+    so giving one of them up doesn't always free the slot.
+    """
+    index = slot_index(t)
+    return any(slot_index(other) == index for other in taken_times(doctor_id, day))
+
+
+class SlotEngine:
+    """
+    Slot occupancy engine for booking decisions.
+
+    Each doctor-day is loaded once from DoctorAvailability, booked Appointment
+    rows and waitlist holds, then kept current through claim/release on book,
+    cancel and reschedule. A booking decision on a warm day is a single atomic
+    bit operation.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = 3600
+        self.memory = MemorySlotStore(self.ttl)
+        self.redis = None
+        self._redis_retry_at = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SLOT_ENGINE_ENABLED', True)
+        self.ttl = app.config.get('SLOT_ENGINE_TTL', 3600)
+        self.memory = MemorySlotStore(app.config.get('SLOT_ENGINE_MEMORY_TTL', 60))
+        if app.config.get('SLOT_ENGINE_BACKEND', 'redis') == 'redis':
+            self.redis = RedisSlotStore(redis_client, self.ttl)
+        else:
+            self.redis = None
+
+    def _call(self, method, *args):
+        """Run a store operation on Redis, falling back to process memory if it is down"""
+        now = datetime.utcnow().timestamp()
+        if self.redis is not None and now >= self._redis_retry_at:
+            try:
+                return getattr(self.redis, method)(*args)
+            except RedisError as e:
+                logger.warning(f"Slot engine falling back to memory store: {str(e)}")
+                self._redis_retry_at = now + 30
+        return getattr(self.memory, method)(*args)
+
+    def _load(self, doctor_id, day):
+        availability = effective_availability(doctor_id, day)
+        return DayBitmap.from_availability(availability, taken_times(doctor_id, day))
+
+    def build(self, doctor_id, day):
+        """Load a doctor-day from the database into the store"""
+        bitmap = self._load(doctor_id, day)
+        self._call('put', doctor_id, day, bitmap)
+        return bitmap
+
+    def get_day(self, doctor_id, day):
+        """Bitmap for a doctor-day, loading it on a cache miss"""
+        if not self.enabled:
+            return self._load(doctor_id, day)
+        bitmap = self._call('get', doctor_id, day)
+        if bitmap is None:
+            bitmap = self.build(doctor_id, day)
+        return bitmap
+
+    def get_days(self, loaded):
+        """
+        Bitmaps for many doctor-days in one store round trip. loaded maps
+        (doctor_id, date) to a DayBitmap just built from the database (see
+        taken_times_range); it stands in for, and is stored as, any day the
+        store doesn't hold yet.
+        """
+        if not self.enabled or not loaded:
+            return loaded
+        keys = list(loaded)
+        stored = self._call('get_many', keys)
+        missing = {key: loaded[key] for key, bitmap in zip(keys, stored) if bitmap is None}
+        if missing:
+            self._call('put_many', missing)
+        return {key: loaded[key] if bitmap is None else bitmap for key, bitmap in zip(keys, stored)}
+
+    def check(self, doctor_id, day, t):
+        """Booking decision for a slot without claiming it"""
+        return self.get_day(doctor_id, day).reason(t)
+
+    def claim(self, doctor_id, day, t):
+        """
+        Atomically reserve a slot. Returns (decision, bitmap); bitmap is only
+        loaded when the claim fails so the caller can build an error message.
+        """
+        if not self.enabled:
+            bitmap = self._load(doctor_id, day)
+            return bitmap.reason(t), bitmap
+
+        claimed = self._call('claim', doctor_id, day, slot_index(t))
+        if claimed is None:
+            self.build(doctor_id, day)
+            claimed = self._call('claim', doctor_id, day, slot_index(t))
+
+        if claimed:
+            return OK, None
+
+        bitmap = self.get_day(doctor_id, day)
+        decision = bitmap.reason(t)
+        return (decision if decision != OK else TAKEN), bitmap
+
+    def release(self, doctor_id, day, t):
+        """Free a slot after a cancel, reschedule or failed insert, unless another booking still holds it"""
+        if self.enabled and not slot_taken(doctor_id, day, t):
+            self._call('release', doctor_id, day, slot_index(t))
+
+    def invalidate(self, doctor_id, day):
+        """Drop a doctor-day so it is rebuilt from the database on next use"""
+        if self.enabled:
+            self._call('delete', doctor_id, day)
+            if self.redis is not None:
+                self.memory.delete(doctor_id, day)
+
+    def invalidate_doctor(self, doctor_id):
+        """Drop every loaded day of a doctor, e.g. after a weekly rule changes"""
+        if self.enabled:
+            self._call('delete_doctor', doctor_id)
+            if self.redis is not None:
+                self.memory.delete_doctor(doctor_id)
+
+    def invalidate_appointments(self, appointments):
+        """Drop every doctor-day touched by the given appointments"""
+        for doctor_id, day in {(apt.doctor_id, apt.appointment_date) for apt in appointments}:
+            self.invalidate(doctor_id, day)
+
+
+@event.listens_for(DoctorAvailability, 'before_insert')
+@event.listens_for(DoctorAvailability, 'before_update')
+def _sync_slot_capacity(mapper, connection, target):
+    """Keep DoctorAvailability.slot_capacity in step with hours and lunch break"""
+    target.slot_capacity = DayBitmap.from_availability(target).capacity
+
+
+@event.listens_for(AvailabilityRule, 'before_insert')
+@event.listens_for(AvailabilityRule, 'before_update')
+def _sync_rule_slot_capacity(mapper, connection, target):
+    """Same as above for weekly rules, which have identical hours on every date"""
+    target.slot_capacity = DayBitmap.from_availability(target.expand(target.effective_from)).capacity
+
+
+def decision_message(decision, bitmap):
+    """User-facing error for a rejected booking decision"""
+    if decision == UNAVAILABLE:
+        return 'Doctor is not available on this date'
+    if decision == OUTSIDE_HOURS:
+        return f'Time must be between {_fmt(bitmap.start_time)} and {_fmt(bitmap.end_time)}'
+    if decision == LUNCH_BREAK:
+        return f'This time is during lunch break ({_fmt(bitmap.lunch_break_start)} - {_fmt(bitmap.lunch_break_end)})'
+    return 'This time slot is already booked. Please choose another time.'
+
+
+def decision_status(decision):
+    """HTTP status for a rejected booking decision"""
+    return 409 if decision == TAKEN else 400
+
+
+slot_engine = SlotEngine()
@@ -0,0 +1,163 @@
+from app import redis_client, jwt
+from app.models import User
+from flask import jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from redis.exceptions import RedisError
+from collections import OrderedDict
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationUnavailable(Exception):
+    """The shared revocation store can't be reached (503 + Retry-After)"""
+
+
+class TokenRevocation:
+    """
+    Access tokens carry role and active state as claims, so a deactivated or
+    deleted user's tokens must be cut off explicitly. Revoking a user stores
+    the revocation time under revoked_user:<id> in Redis for as long as a
+    token can live; a token issued at or before it is rejected. Checking
+    costs one Redis GET per request instead of a user query. Times are
+    sub-second: tokens carry an issued_at claim next to the whole-second
+    iat, so a login right after a reactivation isn't caught by it.
+
+    A deactivation is stored in Redis before it commits, and the commit
+    fails with RevocationUnavailable if it can't be: other workers only see
+    revocations in Redis, so one kept in this process alone would let them
+    accept the user's tokens once Redis is back. It is stored again after
+    the commit to cover tokens issued while it was in flight. If Redis is
+    unreachable when checking, tokens are checked against the user's active
+    flag instead (app.services.identity_cache), so a deactivation is never
+    missed. The memory backend keeps revocations in this process only, for
+    single-process use, and only for as long as a token can live.
+    """
+
+    def __init__(self):
+        self.backend = 'redis'
+        self.ttl = 24 * 3600
+        self.memory_size = 10000
+        self.memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_retry_at = 0
+
+    def init_app(self, app):
+        self.backend = app.config.get('TOKEN_REVOCATION_BACKEND', 'redis')
+        self.memory_size = app.config.get('TOKEN_REVOCATION_MEMORY_SIZE', 10000)
+        expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+        if expires:
+            self.ttl = int(expires.total_seconds())
+        with self._lock:
+            self.memory.clear()
+
+    def _remember(self, user_id, at):
+        with self._lock:
+            self.memory[user_id] = max(at, self.memory.pop(user_id, 0))
+            # Oldest first; a revocation older than a token's lifetime matches no live token
+            cutoff = time.time() - self.ttl
+            while self.memory and (len(self.memory) > self.memory_size
+                                   or next(iter(self.memory.values())) < cutoff):
+                self.memory.popitem(last=False)
+
+    def revoke_user(self, user_id, at=None):
+        """Reject every token the user was issued up to now; raises RevocationUnavailable"""
+        at = at or time.time()
+        self._remember(user_id, at)
+        if self.backend == 'redis':
+            try:
+                redis_client.set(f'revoked_user:{user_id}', at, ex=self.ttl)
+            except RedisError as e:
+                logger.error(f"Failed to store token revocation for user {user_id}: {str(e)}")
+                raise RevocationUnavailable()
+
+    def revoked_at(self, user_id):
+        """Latest revocation time for a user, or None; raises RevocationUnavailable"""
+        local = self.memory.get(user_id)
+        if self.backend != 'redis':
+            return local
+
+        now = time.monotonic()
+        if now < self._redis_retry_at:
+            raise RevocationUnavailable()
+        try:
+            shared = redis_client.get(f'revoked_user:{user_id}')
+        except RedisError as e:
+            logger.warning(f"Token revocation falling back to user lookups: {str(e)}")
+            self._redis_retry_at = now + 30
+            raise RevocationUnavailable()
+        return max(float(shared or 0), local or 0) or None
+
+    def is_revoked(self, jwt_payload):
+        from app.services.identity_cache import identity_cache
+
+        user_id = jwt_payload['sub']
+        try:
+            revoked = self.revoked_at(user_id)
+        except RevocationUnavailable:
+            identity = identity_cache.get(user_id)
+            return identity is None or not identity['is_active']
+        return revoked is not None and jwt_payload.get('issued_at', jwt_payload['iat']) <= revoked
+
+
+token_revocation = TokenRevocation()
+
+
+@jwt.additional_claims_loader
+def _issued_at_claim(identity):
+    return {'issued_at': time.time()}
+
+
+@jwt.token_in_blocklist_loader
+def _token_revoked(jwt_header, jwt_payload):
+    return token_revocation.is_revoked(jwt_payload)
+
+
+@jwt.revoked_token_loader
+def _revoked_token_response(jwt_header, jwt_payload):
+    return jsonify({'error': 'Session has ended. Please log in again.'}), 401
+
+
+# ===== DEACTIVATION CAPTURE =====
+
+def revoke_after_commit(session, user_ids):
+    """Revoke users' tokens as session commits; for Core statements that skip the ORM hook"""
+    session.info.setdefault('revoked_users', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_revoked_users(session, flush_context, instances):
+    pending = session.info.setdefault('revoked_users', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and False in (get_history(obj, 'is_active').added or ()):
+            pending.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending.add(obj.id)
+
+
+@event.listens_for(Session, 'before_commit')
+def _store_revocations(session):
+    # Flush first so before_flush sees the deactivations still pending
+    session.flush()
+    for user_id in session.info.get('revoked_users') or ():
+        token_revocation.revoke_user(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _revoke_users(session):
+    for user_id in session.info.pop('revoked_users', None) or ():
+        try:
+            token_revocation.revoke_user(user_id)
+        except RevocationUnavailable:
+            # Stored before the commit; only tokens issued during it are left
+            pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revoked_users(session):
+    session.info.pop('revoked_users', None)
@@ -0,0 +1,141 @@
+from app import db
+from app.models import User
+from flask import current_app
+from sqlalchemy import DDL, event, select, text, literal_column, and_, or_, false, func
+import re
+
+# Columns the search index covers; callers pick a subset per endpoint
+FIELDS = ('full_name', 'username', 'email', 'phone')
+
+# Longer entries are truncated rather than building huge match expressions
+MAX_TERMS = 8
+
+_WORD = re.compile(r'\w+')
+
+
+def search_terms(entry):
+    """Lower-cased words of a search box entry; punctuation separates words"""
+    return [word.lower() for word in _WORD.findall(entry or '')][:MAX_TERMS]
+
+
+# ===== SQLITE FTS5 =====
+
+# External-content FTS5 index over users, so the text is stored once. The
+# triggers keep it in step with every insert, update and delete, including
+# bulk Core statements that skip ORM events. Alembic batch migrations that
+# rebuild the users table drop these triggers; re-run FTS5_DDL afterwards.
+FTS5_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "full_name, username, email, phone, content='users', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, full_name, username, email, phone) "
+    "VALUES (new.id, new.full_name, new.username, new.email, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name, username, email, phone) "
+    "VALUES ('delete', old.id, old.full_name, old.username, old.email, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, username, email, phone "
+    "ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name, username, email, phone) "
+    "VALUES ('delete', old.id, old.full_name, old.username, old.email, old.phone); "
+    "INSERT INTO users_fts(rowid, full_name, username, email, phone) "
+    "VALUES (new.id, new.full_name, new.username, new.email, new.phone); END",
+]
+
+
+class Fts5Search:
+    """Prefix match on every word, ranked by FTS5's bm25 (lower is better)"""
+
+    name = 'fts5'
+
+    def apply(self, query, terms, fields):
+        columns = ' '.join(fields)
+        words = ' AND '.join(f'"{term}"*' for term in terms)
+        matches = select(
+            literal_column('rowid').label('user_id'),
+            literal_column('rank').label('rank')
+        ).select_from(text('users_fts')).where(
+            text('users_fts MATCH :user_search').bindparams(user_search=f'{{{columns}}} : ({words})')
+        ).subquery('user_matches')
+        return query.join(matches, User.id == matches.c.user_id), matches.c.rank
+
+
+# ===== LIKE / POSTGRES TRIGRAM =====
+
+POSTGRES_DDL = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS ix_users_{field}_trgm ON users USING gin ({field} gin_trgm_ops)'
+    for field in FIELDS
+]
+
+
+def _contains(column, term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return column.ilike(f'%{escaped}%', escape='\\')
+
+
+class LikeSearch:
+    """Every word must appear in one of the fields; no ranking"""
+
+    name = 'like'
+
+    def apply(self, query, terms, fields):
+        columns = [getattr(User, field) for field in fields]
+        query = query.filter(and_(*[
+            or_(*[_contains(column, term) for column in columns]) for term in terms
+        ]))
+        return query, self.rank(columns, terms)
+
+    def rank(self, columns, terms):
+        return User.id
+
+
+class PostgresTrigramSearch(LikeSearch):
+    """
+    ILIKE served by pg_trgm GIN indexes (POSTGRES_DDL), ranked by the best
+    trigram similarity of the entry to any searched field
+    """
+
+    name = 'postgres'
+
+    def rank(self, columns, terms):
+        entry = ' '.join(terms)
+        return -func.greatest(*[func.similarity(func.coalesce(column, ''), entry) for column in columns])
+
+
+# ===== SEARCH =====
+
+class UserSearch:
+    """
+    Full-text search over users. The backend follows the database dialect
+    (USER_SEARCH_BACKEND = 'auto'), or is forced to fts5, postgres or like.
+    """
+
+    backends = {backend.name: backend for backend in (Fts5Search(), PostgresTrigramSearch(), LikeSearch())}
+    dialects = {'sqlite': 'fts5', 'postgresql': 'postgres'}
+
+    def backend(self):
+        name = current_app.config.get('USER_SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = self.dialects.get(db.engine.dialect.name, 'like')
+        return self.backends[name]
+
+    def apply(self, query, entry, fields=FIELDS):
+        """
+        Restrict a User query to rows matching every word of entry (as a
+        prefix) in any of fields. Returns (query, rank); order by rank
+        ascending for best matches first. An entry with no words matches
+        nothing.
+        """
+        terms = search_terms(entry)
+        if not terms:
+            return query.filter(false()), User.id
+        return self.backend().apply(query, terms, fields)
+
+
+user_search = UserSearch()
+
+
+for _statement in FTS5_DDL:
+    event.listen(User.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_DDL:
+    event.listen(User.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+event.listen(User.__table__, 'after_drop', DDL('DROP TABLE IF EXISTS users_fts').execute_if(dialect='sqlite'))
@@ -0,0 +1,105 @@
+from app import db
+from app.models.waitlist import WaitlistEntry
+from app.services.slots import slot_engine, slot_taken
+from app.services.slot_events import slot_events, HELD, RELEASED
+from datetime import datetime, timedelta
+from flask import current_app
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Attempts at claiming a waiting entry before giving up on a contended day
+OFFER_ATTEMPTS = 5
+
+
+class OfferEnded(Exception):
+    """The hold expired or was answered before it could be booked (HTTP 409)"""
+
+
+def _enqueue_offer(entry):
+    """Queue the offer notification and the job that ends the hold"""
+    from app.tasks.waitlist import send_waitlist_offer, expire_waitlist_offer
+    
+    try:
+        send_waitlist_offer.delay(entry.id)
+        expire_waitlist_offer.apply_async(
+            args=[entry.id],
+            countdown=current_app.config['WAITLIST_HOLD_MINUTES'] * 60
+        )
+    except Exception as e:
+        logger.error(f"Failed to queue waitlist offer #{entry.id}: {str(e)}")
+
+
+def offer_freed_slot(doctor_id, day, t):
+    """
+    Hold a freed slot for the longest-waiting patient on that doctor-day.
+    Returns the offered entry, or None when nobody is waiting or the slot
+    has already passed.
+    """
+    if datetime.combine(day, t) <= datetime.now():
+        return None
+    
+    expires_at = datetime.utcnow() + timedelta(minutes=current_app.config['WAITLIST_HOLD_MINUTES'])
+    
+    for _ in range(OFFER_ATTEMPTS):
+        entry_id = db.session.query(WaitlistEntry.id).filter_by(
+            doctor_id=doctor_id,
+            date=day,
+            status='waiting'
+        ).order_by(WaitlistEntry.created_at, WaitlistEntry.id).limit(1).scalar()
+        
+        if entry_id is None:
+            return None
+        
+        # Conditional update so two concurrent frees never offer to the same entry
+        claimed = WaitlistEntry.query.filter_by(id=entry_id, status='waiting').update({
+            'status': 'offered',
+            'offered_time': t,
+            'offer_expires_at': expires_at
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        if claimed:
+            entry = db.session.get(WaitlistEntry, entry_id)
+            slot_engine.invalidate(doctor_id, day)
+            slot_events.publish(doctor_id, day, t, HELD)
+            _enqueue_offer(entry)
+            return entry
+    
+    return None
+
+
+def take_offer(entry_id):
+    """
+    Mark an active offer booked in the caller's transaction. Conditional, so
+    it can't race expire_waitlist_offer passing the hold to the next patient;
+    raises OfferEnded when the hold is gone.
+    """
+    taken = WaitlistEntry.query.filter(
+        WaitlistEntry.id == entry_id,
+        WaitlistEntry.status == 'offered',
+        WaitlistEntry.offer_expires_at > datetime.utcnow()
+    ).update({'status': 'booked'}, synchronize_session=False)
+    if not taken:
+        raise OfferEnded()
+
+
+def free_slot(doctor_id, day, t):
+    """
+    Called after a booked slot is given up. The slot goes to the waitlist
+    first and only becomes bookable by everyone when nobody is waiting.
+    """
+    if slot_taken(doctor_id, day, t):
+        return None
+    entry = offer_freed_slot(doctor_id, day, t)
+    if entry is None:
+        slot_engine.release(doctor_id, day, t)
+    return entry
+
+
+def pass_on_hold(entry):
+    """Give an ended hold to the next patient in line, or back to general booking"""
+    next_entry = free_slot(entry.doctor_id, entry.date, entry.offered_time)
+    if next_entry is None:
+        slot_events.publish(entry.doctor_id, entry.date, entry.offered_time, RELEASED)
+    return next_entry
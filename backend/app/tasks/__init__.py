@@ -3,6 +3,9 @@ from app.tasks.reports import send_monthly_reports
 from app.tasks.exports import export_patient_treatments
 from app.tasks.auto_cancel import cancel_missed_appointments
 from app.tasks.cleanup import cleanup_old_availability
+from app.tasks.waitlist import send_waitlist_offer, expire_waitlist_offer
+from app.tasks.archive import archive_old_appointments
+from app.tasks.cascade_delete import permanent_delete
 
 
-__all__ = ['send_daily_reminders', 'send_monthly_reports', 'export_patient_treatments', 'cancel_missed_appointments', 'cleanup_old_availability']
\ No newline at end of file
+__all__ = ['send_daily_reminders', 'send_monthly_reports', 'export_patient_treatments', 'cancel_missed_appointments', 'cleanup_old_availability', 'send_waitlist_offer', 'expire_waitlist_offer', 'archive_old_appointments', 'permanent_delete']
\ No newline at end of file
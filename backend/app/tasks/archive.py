@@ -0,0 +1,31 @@
+from celery import shared_task
+from app import db
+from app.services.archive import archive_appointments, archive_cutoff
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='app.tasks.archive.archive_old_appointments')
+def archive_old_appointments():
+    """Move completed and cancelled appointments past ARCHIVE_AFTER_DAYS into the archive tables"""
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        cutoff = archive_cutoff()
+        try:
+            result = archive_appointments(cutoff)
+            
+            logger.info(f"Archived {result['archived']} appointments dated before {cutoff} "
+                        f"in {result['batches']} batches")
+            return dict(result, status='success', cutoff_date=cutoff.isoformat())
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error during appointment archival: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'cutoff_date': cutoff.isoformat()
+            }
@@ -1,6 +1,8 @@
 from celery import shared_task
 from app import db
 from app.models.appointment import Appointment
+from app.services.slots import slot_engine
+from app.services.waitlist import free_slot
 from datetime import date, timedelta
 import logging
 
@@ -62,6 +64,7 @@ def cancel_missed_appointments():
             
             # Commit all changes
             db.session.commit()
+            slot_engine.invalidate_appointments(missed_appointments)
             
             logger.info(f"Auto-cancelled {cancelled_count} missed appointments from {yesterday}")
             
@@ -207,6 +210,7 @@ def cancel_specific_appointment(appointment_id, reason="Auto-cancelled"):
                     'error': 'Appointment already cancelled'
                 }
             
+            was_booked = appointment.status == 'booked'
             appointment.status = 'cancelled'
             appointment.reason = reason
             
@@ -216,6 +220,10 @@ def cancel_specific_appointment(appointment_id, reason="Auto-cancelled"):
                 appointment.refund_date = date.today()
             
             db.session.commit()
+            slot_engine.invalidate_appointments([appointment])
+            
+            if was_booked:
+                free_slot(appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
             
             return {
                 'status': 'success',
@@ -6,6 +6,8 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from flask import current_app
+from sqlalchemy.orm import joinedload
+from itertools import groupby
 import requests
 import logging
 
@@ -53,6 +55,69 @@ def send_booking_confirmation(appointment):
             return False
 
 
+@shared_task(name='app.tasks.booking_notifications.send_bulk_booking_notifications')
+def send_bulk_booking_notifications(appointment_ids):
+    """
+    Confirmations for a batch of bookings, loaded in one query, and one
+    reminder job per distinct start time instead of one per booking
+    """
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        appointments = Appointment.query.options(
+            joinedload(Appointment.patient),
+            joinedload(Appointment.doctor).joinedload(User.specialization)
+        ).filter(
+            Appointment.id.in_(appointment_ids),
+            Appointment.status == 'booked'
+        ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+        
+        sent = 0
+        for appointment in appointments:
+            patient = appointment.patient
+            doctor = appointment.doctor
+            if not patient.email:
+                continue
+            try:
+                send_confirmation_email(
+                    patient_email=patient.email,
+                    patient_name=patient.full_name,
+                    doctor_name=doctor.full_name,
+                    doctor_specialization=doctor.specialization.name if doctor.specialization else 'General',
+                    appointment_date=appointment.appointment_date.strftime('%B %d, %Y'),
+                    appointment_time=appointment.appointment_time.strftime('%H:%M'),
+                    consultation_fee=float(appointment.consultation_fee) if appointment.consultation_fee else 500,
+                    appointment_id=appointment.id
+                )
+                sent += 1
+            except Exception as e:
+                logger.error(f"❌ Failed to send confirmation for appointment #{appointment.id}: {str(e)}")
+        
+        reminders = 0
+        for starts_at, group in groupby(
+            appointments, key=lambda apt: datetime.combine(apt.appointment_date, apt.appointment_time)
+        ):
+            reminder_time = starts_at - timedelta(minutes=30)
+            if reminder_time <= datetime.now():
+                continue
+            try:
+                send_pre_appointment_reminders.apply_async(
+                    args=[[apt.id for apt in group]],
+                    eta=reminder_time
+                )
+                reminders += 1
+            except Exception as e:
+                logger.error(f"Failed to schedule reminders for {starts_at}: {str(e)}")
+        
+        logger.info(f"✅ Bulk notifications: {sent} confirmations, {reminders} reminder jobs")
+        return {
+            'status': 'success',
+            'confirmations_sent': sent,
+            'reminder_jobs': reminders
+        }
+
+
 def send_confirmation_email(patient_email, patient_name, doctor_name, doctor_specialization,
                            appointment_date, appointment_time, consultation_fee, appointment_id):
     """Send booking confirmation email"""
@@ -347,6 +412,38 @@ def send_pre_appointment_reminder(appointment_id):
             return {'status': 'error', 'error': str(e)}
 
 
+@shared_task(name='app.tasks.booking_notifications.send_pre_appointment_reminders')
+def send_pre_appointment_reminders(appointment_ids):
+    """Send the 30-minute reminder for several appointments starting together"""
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        appointments = Appointment.query.options(
+            joinedload(Appointment.patient),
+            joinedload(Appointment.doctor)
+        ).filter(
+            Appointment.id.in_(appointment_ids),
+            Appointment.status == 'booked'
+        ).all()
+        
+        sent = 0
+        for appointment in appointments:
+            try:
+                send_reminder_email(
+                    patient_email=appointment.patient.email,
+                    patient_name=appointment.patient.full_name,
+                    doctor_name=appointment.doctor.full_name,
+                    appointment_date=appointment.appointment_date.strftime('%B %d, %Y'),
+                    appointment_time=appointment.appointment_time.strftime('%H:%M')
+                )
+                sent += 1
+            except Exception as e:
+                logger.error(f"Failed to send reminder for appointment #{appointment.id}: {str(e)}")
+        
+        return {'status': 'success', 'reminders_sent': sent}
+
+
 def send_reminder_email(patient_email, patient_name, doctor_name, appointment_date, appointment_time):
     """Send 30-minute reminder email"""
     from flask import current_app
@@ -0,0 +1,59 @@
+from celery import shared_task
+from app import db
+from app.services.cascade_delete import CascadeDelete
+from flask import current_app
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, name='app.tasks.cascade_delete.permanent_delete')
+def permanent_delete(self, kind, target_id):
+    """
+    Cascade delete for large histories: appointments go in committed chunks
+    of CASCADE_DELETE_CHUNK, reporting progress, then the rest in one
+    transaction. The admin endpoint has already deactivated the users.
+    """
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        cascade = CascadeDelete(kind, target_id)
+        chunk_size = current_app.config.get('CASCADE_DELETE_CHUNK', 1000)
+        try:
+            total = cascade.appointment_count()
+            deleted = 0
+            while True:
+                removed = cascade.delete_appointment_chunk(chunk_size)
+                db.session.commit()
+                if not removed:
+                    break
+                deleted += removed
+                self.update_state(state='PROGRESS', meta={
+                    'deleted_appointments': deleted,
+                    'total_appointments': total,
+                    'progress': min(99, deleted * 100 // max(total, 1))
+                })
+            
+            result = cascade.run()
+            db.session.commit()
+            cascade.after_commit()
+            
+            logger.info(f"Permanently deleted {kind} {target_id} with {deleted} appointments")
+            return {
+                'status': 'success',
+                'kind': kind,
+                'id': target_id,
+                'deleted_appointments': deleted,
+                'deleted': result
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error during permanent delete of {kind} {target_id}: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'kind': kind,
+                'id': target_id
+            }
@@ -1,5 +1,6 @@
 from app import db, celery
 from app.models.availability import DoctorAvailability
+from app.models.availability_rule import AvailabilityRule
 from datetime import date, timedelta
 import logging
 
@@ -15,12 +16,18 @@ def cleanup_old_availability():
             DoctorAvailability.date < cutoff_date
         ).delete()
         
+        # Weekly rules that ended before the cutoff
+        deleted_rules = AvailabilityRule.query.filter(
+            AvailabilityRule.effective_until < cutoff_date
+        ).delete()
+        
         db.session.commit()
         
-        logger.info(f"Cleaned up {deleted_count} old availability records older than {cutoff_date}")
+        logger.info(f"Cleaned up {deleted_count} old availability records and {deleted_rules} expired rules older than {cutoff_date}")
         return {
             'status': 'success',
             'deleted_count': deleted_count,
+            'deleted_rules': deleted_rules,
             'cutoff_date': cutoff_date.isoformat()
         }
         
@@ -1,6 +1,7 @@
 from celery import shared_task
 from app import db
-from app.models import Appointment, Treatment, User
+from app.models import User
+from app.services.archive import treatment_history
 import csv
 import os
 from datetime import datetime
@@ -16,11 +17,8 @@ def export_patient_treatments(patient_id):
         if not patient:
             return {'error': 'Patient not found'}
         
-        # Get all completed appointments with treatments
-        appointments = Appointment.query.filter_by(
-            patient_id=patient_id,
-            status='completed'
-        ).order_by(Appointment.appointment_date.desc()).all()
+        # Get all completed appointments with treatments, including archived ones
+        appointments = treatment_history(patient_id)
         
         # Create CSV file
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
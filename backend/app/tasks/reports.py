@@ -1,6 +1,8 @@
 from celery import shared_task
 from app import db
-from app.models import Appointment, User, Treatment
+from app.models import Appointment, User, Treatment, DailyDoctorStats
+from app.utils.schemas import APPOINTMENT_WITH_TREATMENT
+from sqlalchemy import and_, func, distinct
 from datetime import datetime, timedelta
 from calendar import monthrange
 import logging
@@ -81,54 +83,59 @@ def send_monthly_reports():
 
 
 def generate_doctor_report_data(doctor, start_date, end_date):
-    # Get appointments for the month
-    appointments = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.appointment_date >= start_date.date(),
-        Appointment.appointment_date <= end_date.date()
-    ).all()
+    first_day, last_day = start_date.date(), end_date.date()
+    
+    # Counts, revenue and distributions from the month's daily rollup rows
+    days = DailyDoctorStats.query.filter(
+        DailyDoctorStats.doctor_id == doctor.id,
+        DailyDoctorStats.day >= first_day,
+        DailyDoctorStats.day <= last_day
+    ).order_by(DailyDoctorStats.day).all()
     
     # Calculate statistics
-    total_appointments = len(appointments)
-    completed = len([a for a in appointments if a.status == 'completed'])
-    cancelled = len([a for a in appointments if a.status == 'cancelled'])
-    booked = len([a for a in appointments if a.status == 'booked'])
+    total_appointments = sum(day.total for day in days)
+    completed = sum(day.completed for day in days)
+    cancelled = sum(day.cancelled for day in days)
+    booked = sum(day.booked for day in days)
     
     # Calculate revenue
-    total_revenue = sum(
-        float(a.consultation_fee) if a.consultation_fee and a.payment_status == 'paid' 
-        else 0 
-        for a in appointments
-    )
-    
-    # Get treatments provided
-    treatments = Treatment.query.join(Appointment).filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.appointment_date >= start_date.date(),
-        Appointment.appointment_date <= end_date.date()
-    ).all()
+    total_revenue = sum(float(day.paid_revenue) for day in days)
     
     # Appointments by day of week
     day_distribution = {}
-    for apt in appointments:
-        day_name = apt.appointment_date.strftime('%A')
-        day_distribution[day_name] = day_distribution.get(day_name, 0) + 1
+    for day in days:
+        day_name = day.day.strftime('%A')
+        day_distribution[day_name] = day_distribution.get(day_name, 0) + day.total
     
-    # Most common diagnoses
-    diagnosis_counts = {}
-    for treatment in treatments:
-        if treatment.diagnosis:
-            diagnosis_counts[treatment.diagnosis] = diagnosis_counts.get(treatment.diagnosis, 0) + 1
+    # Appointment time distribution
+    hours = [sum(counts) for counts in zip(*[day.hour_counts for day in days])] or [0] * 24
+    morning = sum(hours[:12])
+    afternoon = sum(hours[12:17])
+    evening = sum(hours[17:])
     
-    top_diagnoses = sorted(diagnosis_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    in_month = and_(
+        Appointment.doctor_id == doctor.id,
+        Appointment.appointment_date >= first_day,
+        Appointment.appointment_date <= last_day
+    )
     
-    # Appointment time distribution
-    morning = len([a for a in appointments if a.appointment_time.hour < 12])
-    afternoon = len([a for a in appointments if 12 <= a.appointment_time.hour < 17])
-    evening = len([a for a in appointments if a.appointment_time.hour >= 17])
+    # Patient demographics (unique patients); distinct across days, so not in the rollup
+    unique_patients = db.session.query(func.count(distinct(Appointment.patient_id))).filter(in_month).scalar()
+    
+    # Treatments provided and most common diagnoses
+    treatment_count = Treatment.query.join(Appointment).filter(in_month).count()
+    top_diagnoses = [
+        (diagnosis, count) for diagnosis, count in db.session.query(
+            Treatment.diagnosis, func.count(Treatment.id)
+        ).join(Appointment).filter(
+            in_month, Treatment.diagnosis != ''
+        ).group_by(Treatment.diagnosis).order_by(func.count(Treatment.id).desc()).limit(5)
+    ]
     
-    # Patient demographics (unique patients)
-    unique_patients = set(a.patient_id for a in appointments)
+    # Most recent appointments for the report table
+    appointments = APPOINTMENT_WITH_TREATMENT.query(Appointment.query).filter(in_month).order_by(
+        Appointment.appointment_date.desc(), Appointment.appointment_time.desc()
+    ).limit(10).all()
     
     return {
         'period': {
@@ -143,7 +150,7 @@ def generate_doctor_report_data(doctor, start_date, end_date):
             'booked': booked,
             'completion_rate': round((completed / total_appointments * 100) if total_appointments > 0 else 0, 1),
             'total_revenue': total_revenue,
-            'unique_patients': len(unique_patients)
+            'unique_patients': unique_patients
         },
         'distributions': {
             'by_day': day_distribution,
@@ -154,11 +161,10 @@ def generate_doctor_report_data(doctor, start_date, end_date):
             }
         },
         'treatments': {
-            'total': len(treatments),
+            'total': treatment_count,
             'top_diagnoses': top_diagnoses
         },
-        'appointments': appointments,
-        'treatments_list': treatments
+        'appointments': appointments
     }
 
 
@@ -0,0 +1,157 @@
+from celery import shared_task
+from app import db
+from app.models import WaitlistEntry
+from app.services.waitlist import pass_on_hold
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='app.tasks.waitlist.send_waitlist_offer')
+def send_waitlist_offer(entry_id):
+    """Tell a waitlisted patient that a slot is being held for them"""
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            entry = db.session.get(WaitlistEntry, entry_id)
+            if not entry or not entry.has_active_offer:
+                return {'status': 'skipped', 'reason': 'Offer no longer active'}
+            
+            send_offer_email(
+                patient_email=entry.patient.email,
+                patient_name=entry.patient.full_name,
+                doctor_name=entry.doctor.full_name,
+                appointment_date=entry.date.strftime('%B %d, %Y'),
+                appointment_time=entry.offered_time.strftime('%H:%M'),
+                hold_minutes=app.config['WAITLIST_HOLD_MINUTES'],
+                entry_id=entry.id
+            )
+            
+            return {'status': 'success', 'entry_id': entry_id}
+        except Exception as e:
+            logger.error(f"Failed to send waitlist offer: {str(e)}")
+            return {'status': 'error', 'error': str(e)}
+
+
+@shared_task(name='app.tasks.waitlist.expire_waitlist_offer')
+def expire_waitlist_offer(entry_id):
+    """End an unanswered hold and pass the slot to the next patient in line"""
+    from app import create_app
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            entry = db.session.get(WaitlistEntry, entry_id)
+            if not entry:
+                return {'status': 'skipped', 'reason': 'Entry not found'}
+            
+            expired = WaitlistEntry.query.filter_by(id=entry_id, status='offered').update(
+                {'status': 'expired'}, synchronize_session=False
+            )
+            db.session.commit()
+            
+            if not expired:
+                return {'status': 'skipped', 'reason': 'Offer already answered'}
+            
+            next_entry = pass_on_hold(entry)
+            
+            return {
+                'status': 'success',
+                'entry_id': entry_id,
+                'next_entry_id': next_entry.id if next_entry else None
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to expire waitlist offer {entry_id}: {str(e)}")
+            return {'status': 'error', 'error': str(e)}
+
+
+def send_offer_email(patient_email, patient_name, doctor_name, appointment_date,
+                     appointment_time, hold_minutes, entry_id):
+    """Send slot offer email"""
+    from flask import current_app
+    
+    subject = f"🔔 A slot opened up - {appointment_date} at {appointment_time}"
+    
+    body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                background-color: #f4f6f9;
+                padding: 20px;
+            }}
+            .container {{
+                max-width: 500px;
+                margin: 0 auto;
+                background-color: white;
+                border-radius: 10px;
+                padding: 30px;
+                box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+            }}
+            .offer-header {{
+                background: #0d6efd;
+                color: white;
+                padding: 20px;
+                border-radius: 5px;
+                text-align: center;
+                margin-bottom: 20px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="offer-header">
+                <h2 style="margin: 0;">🔔 Slot Available</h2>
+                <p style="margin: 10px 0 0 0;">A slot you were waiting for has opened up</p>
+            </div>
+            
+            <p>Dear <strong>{patient_name}</strong>,</p>
+            
+            <p>We are holding the following slot for you for the next {hold_minutes} minutes.</p>
+            
+            <div style="background: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
+                <p><strong>Doctor:</strong> Dr. {doctor_name}</p>
+                <p><strong>Date:</strong> {appointment_date}</p>
+                <p><strong>Time:</strong> {appointment_time}</p>
+            </div>
+            
+            <div style="background: #fff3cd; padding: 15px; border-radius: 5px; border-left: 4px solid #ffc107;">
+                <strong>Accept the offer from your patient dashboard before it expires.</strong>
+                If you do not respond it will be offered to the next patient on the waitlist.
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    try:
+        if not current_app.config.get('MAIL_USERNAME'):
+            print(f"\n🔔 WAITLIST OFFER #{entry_id}: {patient_name} - Dr. {doctor_name} on {appointment_date} at {appointment_time} (held {hold_minutes} min)\n")
+            return True
+        
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
+        msg['To'] = patient_email
+        
+        html_part = MIMEText(body, 'html')
+        msg.attach(html_part)
+        
+        server = smtplib.SMTP(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
+        server.starttls()
+        server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
+        server.send_message(msg)
+        server.quit()
+        
+        return True
+    except Exception as e:
+        logger.error(f"Waitlist offer email failed: {str(e)}")
+        raise
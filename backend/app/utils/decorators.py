@@ -1,31 +1,105 @@
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from collections import namedtuple
+from flask import jsonify, request, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy.orm import joinedload
+from app import db
 from app.models import User
+from app.services.rate_limit import rate_limiter
 
-def role_required(*allowed_roles):
-    """Decorator to check if user has required role"""
+# The caller as their access token describes them, for views that only need the id
+TokenUser = namedtuple('TokenUser', ['id', 'role'])
+
+_MISSING = object()
+
+
+def load_user(user_id):
+    """
+    User row for an id, loaded at most once per request (with its
+    specialization, which to_dict reads) and shared by the decorators,
+    the token revocation fallback and the view
+    """
+    users = g.setdefault('users', {})
+    user = users.get(user_id, _MISSING)
+    if user is _MISSING:
+        user = db.session.get(User, user_id, options=[joinedload(User.specialization)])
+        users[user_id] = user
+    return user
+
+
+def role_required(*allowed_roles, locations=None):
+    """
+    Decorator to check if user has required role. Tokens carry the role
+    and active state as claims (auth.login), so this needs no user query;
+    deactivated users' tokens are revoked (app.services.token_revocation).
+    Tokens issued before the claims existed fall back to the cached identity.
+    """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
-            if not user.is_active:
+            verify_jwt_in_request(locations=locations)
+            claims = get_jwt()
+
+            if 'role' in claims:
+                role, is_active = claims['role'], claims.get('active', True)
+            else:
+                identity = get_current_identity()
+                if not identity:
+                    return jsonify({'error': 'User not found'}), 404
+                role, is_active = identity['role'], identity['is_active']
+
+            if not is_active:
                 return jsonify({'error': 'Account is inactive'}), 403
-            
-            if user.role not in allowed_roles:
+
+            if role not in allowed_roles:
                 return jsonify({'error': 'Access denied'}), 403
-            
+
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def rate_limited(policy):
+    """
+    Decorator applying a RATE_LIMITS policy (app.services.rate_limit),
+    keyed by client IP, the username in the JSON body and the token's user.
+    Put it below role_required so the token is verified before it counts.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            username = data.get('username') if isinstance(data, dict) else None
+            try:
+                user_id = get_jwt_identity()
+            except RuntimeError:
+                # No token verified on this route
+                user_id = None
+
+            retry_after = rate_limiter.hit(
+                policy,
+                ip=request.remote_addr,
+                username=username if isinstance(username, str) else None,
+                user=user_id
+            )
+            if retry_after:
+                return jsonify({'error': 'Too many requests. Please retry later.'}), 429, \
+                    {'Retry-After': str(retry_after)}
+
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
 def get_current_user():
-    """Get current logged-in user"""
-    user_id = get_jwt_identity()
-    return User.query.get(user_id)
\ No newline at end of file
+    """Get current logged-in user (one query per request at most)"""
+    return load_user(get_jwt_identity())
+
+
+def get_current_identity():
+    """Current user as User.to_dict(), from the identity cache; None if deleted"""
+    from app.services.identity_cache import identity_cache
+    return identity_cache.get(get_jwt_identity())
+
+
+def get_token_user():
+    """Current user's id and role from the token, without a database lookup"""
+    return TokenUser(get_jwt_identity(), get_jwt().get('role'))
@@ -0,0 +1,160 @@
+from app import cache
+from app.models import User, Appointment
+from flask import current_app, request
+from sqlalchemy import tuple_
+from datetime import date, time
+import base64
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed or was issued by a different listing"""
+
+
+class Keyset:
+    """
+    A listing order that can be resumed from its last row: the columns it
+    sorts on, all in the same direction, ending with a unique column (id).
+
+    An index on the filter columns followed by these columns lets a page
+    seek straight to the cursor, so page 1000 costs the same as page 1.
+    """
+
+    def __init__(self, name, *columns, descending=False):
+        self.name = name
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self):
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+    def after(self, values):
+        """WHERE clause for the rows following values in listing order"""
+        key = tuple_(*self.columns)
+        return key < tuple_(*values) if self.descending else key > tuple_(*values)
+
+    def encode(self, obj):
+        values = []
+        for column in self.columns:
+            value = getattr(obj, column.key)
+            values.append(value.isoformat() if isinstance(value, (date, time)) else value)
+        raw = json.dumps([self.name, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            name, values = json.loads(raw)
+            if name != self.name or len(values) != len(self.columns):
+                raise InvalidCursor(cursor)
+            return [
+                _parse_value(column.type.python_type, value)
+                for column, value in zip(self.columns, values)
+            ]
+        except InvalidCursor:
+            raise
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+
+
+def _parse_value(python_type, value):
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is time:
+        return time.fromisoformat(value)
+    if python_type is int and not isinstance(value, int):
+        raise InvalidCursor(value)
+    return value
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, limit, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.limit = limit
+        self.total = total
+
+    def meta(self):
+        meta = {'next_cursor': self.next_cursor, 'limit': self.limit}
+        if self.total is not None:
+            meta['total'] = self.total
+        return meta
+
+
+def _cached_total(query):
+    """
+    COUNT(*) for the unpaged query, cached briefly per distinct SQL and
+    parameters so clients walking a listing don't recount on every page
+    """
+    compiled = query.statement.compile()
+    signature = str(compiled) + repr(sorted(compiled.params.items()))
+    key = 'keyset_total:' + hashlib.sha1(signature.encode()).hexdigest()
+
+    try:
+        total = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Listing total cache unavailable: {str(e)}")
+        return query.order_by(None).count()
+
+    if total is None:
+        total = query.order_by(None).count()
+        try:
+            cache.set(key, total, timeout=current_app.config.get('KEYSET_TOTAL_TIMEOUT', 60))
+        except Exception as e:
+            logger.warning(f"Failed to cache listing total: {str(e)}")
+    return total
+
+
+def keyset_page(query, keyset, cursor=None, limit=20, with_total=False):
+    """
+    One page of query in keyset order, starting after cursor (the first page
+    when empty). Raises InvalidCursor for a cursor this keyset didn't issue.
+    The total is only counted when asked for, and then cached.
+    """
+    limit = max(1, min(limit, current_app.config.get('KEYSET_MAX_LIMIT', 100)))
+
+    total = _cached_total(query) if with_total else None
+
+    if cursor:
+        query = query.filter(keyset.after(keyset.decode(cursor)))
+
+    # One extra row tells whether another page follows
+    rows = query.order_by(*keyset.order_by()).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = keyset.encode(items[-1]) if len(rows) > limit else None
+
+    return KeysetPage(items, next_cursor, limit, total)
+
+
+def wants_cursor():
+    """Listings switch from page numbers to cursors when ?cursor= is present (empty for page one)"""
+    return 'cursor' in request.args
+
+
+def request_keyset_page(query, keyset, default_limit=20):
+    """keyset_page driven by ?cursor=&limit=&with_total=1"""
+    return keyset_page(
+        query, keyset,
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', default_limit, type=int),
+        with_total=request.args.get('with_total', '').lower() in ('1', 'true', 'yes')
+    )
+
+
+# ===== LISTINGS =====
+
+# Newest first, matching the page-number listings. Admin and doctor listings
+# seek on ix_appointments_date_time / ix_appointments_doctor_date_time; a
+# patient's history is small enough to sort after the patient_id lookup
+APPOINTMENTS = Keyset(
+    'appointments',
+    Appointment.appointment_date, Appointment.appointment_time, Appointment.id,
+    descending=True
+)
+
+# Doctors and patients in id order; backed by ix_users_role_id
+USERS = Keyset('users', User.id)
@@ -0,0 +1,82 @@
+from app.models import User, Appointment, WaitlistEntry, ArchivedAppointment
+from sqlalchemy.orm import selectinload
+
+
+class Schema:
+    """
+    How one view serializes a model: the function that turns a row into a
+    dict and the relationship paths ('doctor.specialization') it reads.
+
+    query() adds a selectinload per path, so serializing a list costs one
+    extra query per relationship rather than one per row.
+    """
+
+    def __init__(self, model, dump, *paths):
+        self.model = model
+        self._dump = dump
+        self.paths = paths
+
+    def options(self):
+        options = []
+        for path in self.paths:
+            model = self.model
+            loader = None
+            for name in path.split('.'):
+                attr = getattr(model, name)
+                loader = selectinload(attr) if loader is None else loader.selectinload(attr)
+                model = attr.property.mapper.class_
+            options.append(loader)
+        return options
+
+    def query(self, query):
+        return query.options(*self.options())
+
+    def dump(self, obj):
+        return self._dump(obj)
+
+    def dump_many(self, objects):
+        return [self._dump(obj) for obj in objects]
+
+
+def _with_treatment(appointment):
+    data = appointment.to_dict()
+    if appointment.treatment:
+        data['treatment'] = appointment.treatment.to_dict()
+    return data
+
+
+def _history_entry(appointment):
+    data = _with_treatment(appointment)
+    doctor = appointment.doctor
+    data['doctor_details'] = {
+        'name': doctor.full_name,
+        'specialization': doctor.specialization.name if doctor.specialization else None
+    }
+    return data
+
+
+# ===== USERS =====
+
+# Doctor and patient listings; to_dict reads the specialization name
+USER = Schema(User, User.to_dict, 'specialization')
+
+# ===== APPOINTMENTS =====
+
+# Appointment.to_dict reads both names and whether a treatment exists
+APPOINTMENT = Schema(Appointment, Appointment.to_dict, 'patient', 'doctor', 'treatment')
+
+APPOINTMENT_WITH_TREATMENT = Schema(Appointment, _with_treatment, 'patient', 'doctor', 'treatment')
+
+# Patient treatment history and its CSV export
+APPOINTMENT_HISTORY = Schema(
+    Appointment, _history_entry, 'patient', 'doctor.specialization', 'treatment'
+)
+
+# The same entries for appointments moved to the archive tables
+ARCHIVED_HISTORY = Schema(
+    ArchivedAppointment, _history_entry, 'patient', 'doctor.specialization', 'treatment'
+)
+
+# ===== WAITLIST =====
+
+WAITLIST_ENTRY = Schema(WaitlistEntry, WaitlistEntry.to_dict, 'doctor')
@@ -1,6 +1,10 @@
 import re
 from datetime import datetime, date
 
+# Appointment times, working hours and lunch breaks sit on the 10-minute slot
+# grid (see app.services.slots); a time between two slots is never valid
+SLOT_MINUTES = 10
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -24,9 +28,9 @@ def validate_date(date_string):
         return False
 
 def validate_time(time_string):
-    """Validate time format HH:MM"""
+    """Validate time format HH:MM on a 10-minute slot boundary"""
     try:
-        datetime.strptime(time_string, '%H:%M')
-        return True
+        parsed = datetime.strptime(time_string, '%H:%M')
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+    return parsed.minute % SLOT_MINUTES == 0
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Dashboard statistics benchmark.
+
+Seeds a throwaway SQLite database (same data set as bench_indexes.py, with
+all indexes in place and the daily_doctor_stats rollup built) and compares
+the per-status COUNT queries the admin and doctor dashboards used to run
+against app.services.dashboard_stats, reporting queries per call and
+median/p95 latency for each scope.
+
+Run: python bench_dashboard_stats.py                    (1,000,000 appointments)
+     python bench_dashboard_stats.py --appointments 200000 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app import create_app, db
+from app.models import User, Appointment, Treatment
+from app.services.dashboard_stats import appointment_stats
+from app.services.daily_stats import rebuild_daily_stats
+from bench_indexes import make_config, seed
+from sqlalchemy import event
+
+
+def counts_admin():
+    """admin.dashboard before: six COUNT queries"""
+    return {
+        'active_doctors': User.query.filter_by(role='doctor', is_active=True).count(),
+        'active_patients': User.query.filter_by(role='patient', is_active=True).count(),
+        'total': Appointment.query.count(),
+        'booked': Appointment.query.filter_by(status='booked').count(),
+        'completed': Appointment.query.filter_by(status='completed').count(),
+        'cancelled': Appointment.query.filter_by(status='cancelled').count(),
+    }
+
+
+def counts_doctor_dashboard(doctor_id):
+    """doctor.dashboard before: three counts and a DISTINCT fetched into Python"""
+    patient_ids = db.session.query(Appointment.patient_id).filter(
+        Appointment.doctor_id == doctor_id
+    ).distinct().all()
+    return {
+        'total': Appointment.query.filter_by(doctor_id=doctor_id).count(),
+        'completed': Appointment.query.filter_by(doctor_id=doctor_id, status='completed').count(),
+        'booked': Appointment.query.filter_by(doctor_id=doctor_id, status='booked').count(),
+        'patients': len(patient_ids),
+    }
+
+
+def counts_doctor_performance(doctor_id, week_start):
+    """doctor.get_performance_statistics before: four counts"""
+    def count(*conditions):
+        return Appointment.query.filter(Appointment.doctor_id == doctor_id, *conditions).count()
+    return {
+        'week_completed': count(Appointment.appointment_date >= week_start, Appointment.status == 'completed'),
+        'week_cancelled': count(Appointment.appointment_date >= week_start, Appointment.status == 'cancelled'),
+        'completed': count(Appointment.status == 'completed'),
+        'cancelled': count(Appointment.status == 'cancelled'),
+    }
+
+
+def report_summary_scan(doctor_id, first_day, last_day):
+    """generate_doctor_report_data before: the month's appointments and treatments loaded and counted"""
+    appointments = Appointment.query.filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_date >= first_day,
+        Appointment.appointment_date <= last_day
+    ).all()
+    treatments = Treatment.query.join(Appointment).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_date >= first_day,
+        Appointment.appointment_date <= last_day
+    ).all()
+    day_distribution = {}
+    for apt in appointments:
+        day_name = apt.appointment_date.strftime('%A')
+        day_distribution[day_name] = day_distribution.get(day_name, 0) + 1
+    diagnoses = {}
+    for treatment in treatments:
+        diagnoses[treatment.diagnosis] = diagnoses.get(treatment.diagnosis, 0) + 1
+    return {
+        'total_appointments': len(appointments),
+        'completed': len([a for a in appointments if a.status == 'completed']),
+        'cancelled': len([a for a in appointments if a.status == 'cancelled']),
+        'booked': len([a for a in appointments if a.status == 'booked']),
+        'total_revenue': sum(float(a.consultation_fee) if a.consultation_fee and a.payment_status == 'paid'
+                             else 0 for a in appointments),
+        'unique_patients': len(set(a.patient_id for a in appointments)),
+    }
+
+
+def measure(fn, repeat):
+    statements = []
+
+    def record(*args):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return result, len(statements), statistics.median(timings), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per variant')
+    args = parser.parse_args()
+
+    config, db_path = make_config()
+    app = create_app(config)
+    # app.tasks registers its Celery tasks on the app's Celery instance
+    from app.tasks.reports import generate_doctor_report_data
+    today = date.today()
+    week_start = today - timedelta(days=7)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(args.appointments, today)
+        print(f'Seeded {args.appointments:,} appointments in {time.perf_counter() - started:.1f}s ({db_path})')
+
+        # Bulk seeding bypasses the ORM hook that maintains the rollup
+        started = time.perf_counter()
+        rollup_rows = rebuild_daily_stats()
+        db.session.connection().exec_driver_sql('ANALYZE')
+        db.session.commit()
+        print(f'Built {rollup_rows:,} daily rollup rows in {time.perf_counter() - started:.1f}s\n')
+
+        doctor_id = db.session.query(Appointment.doctor_id).group_by(Appointment.doctor_id).order_by(
+            db.func.count().desc()).limit(1).scalar()
+
+        doctor = db.session.get(User, doctor_id)
+        month_end = today.replace(day=1) - timedelta(days=1)
+        month_start = datetime.combine(month_end.replace(day=1), datetime.min.time())
+        month_end = datetime.combine(month_end, datetime.min.time())
+
+        cases = [
+            ('admin dashboard (hospital)',
+             counts_admin,
+             lambda: appointment_stats(include_users=True)),
+            ('doctor dashboard',
+             lambda: counts_doctor_dashboard(doctor_id),
+             lambda: appointment_stats(doctor_id=doctor_id, include_patients=True)),
+            ('doctor performance statistics',
+             lambda: counts_doctor_performance(doctor_id, week_start),
+             lambda: appointment_stats(doctor_id=doctor_id, since=week_start)),
+            ('monthly report summary',
+             lambda: report_summary_scan(doctor_id, month_start.date(), month_end.date()),
+             lambda: generate_doctor_report_data(doctor, month_start, month_end)['summary']),
+        ]
+
+        print(f"{'endpoint':<32} {'variant':<12} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9}")
+        print('-' * 73)
+        for name, before, after in cases:
+            old, old_queries, old_p50, old_p95 = measure(before, args.repeat)
+            new, new_queries, new_p50, new_p95 = measure(after, args.repeat)
+
+            # Both variants must agree on every number they share
+            flat = dict(new, **{f'week_{k}': v for k, v in new.get('since', {}).items()})
+            mismatched = [key for key, value in old.items() if flat.get(key) != value]
+            if mismatched:
+                raise SystemExit(f'{name}: results differ for {mismatched}')
+
+            print(f'{name:<32} {"counts":<12} {old_queries:>7} {old_p50:>9.2f} {old_p95:>9.2f}')
+            print(f'{"":<32} {"rollup":<12} {new_queries:>7} {new_p50:>9.2f} {new_p95:>9.2f}'
+                  f'   {old_p50 / max(new_p50, 1e-6):.1f}x')
+
+
+if __name__ == '__main__':
+    main()
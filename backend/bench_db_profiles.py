@@ -0,0 +1,194 @@
+"""
+Database engine profile benchmark.
+
+Seeds a database per profile (bench_indexes.py data set), then runs reader
+threads (doctor dashboard statistics and upcoming-week listing) alongside
+writer threads (one booking per commit) for a fixed time. Reports read and
+write throughput, latency and "database is locked" failures per profile:
+
+  sqlite-rollback   SQLite defaults: rollback journal, synchronous=FULL
+  sqlite-wal        Config's SQLite profile: WAL, busy_timeout, NORMAL sync,
+                    cache and mmap sizes (app.db_profiles)
+  server            --database-url with Config's pool settings; must point
+                    at an empty scratch database, its tables are dropped
+
+Run: python bench_db_profiles.py
+     python bench_db_profiles.py --readers 8 --writers 4 --seconds 20
+     python bench_db_profiles.py --database-url postgresql://bench@localhost/bench_scratch
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app import create_app, db
+from app.models import Appointment
+from app.services.dashboard_stats import appointment_stats
+from bench_indexes import make_config, seed, FUTURE_DAYS, SLOTS_PER_DAY
+from sqlalchemy.exc import OperationalError
+
+
+def profile_configs(database_url):
+    """(name, config class) for each profile to run"""
+    rollback, _ = make_config()
+    rollback.SQLITE_JOURNAL_MODE = None
+    rollback.SQLITE_BUSY_TIMEOUT = None
+    rollback.SQLITE_SYNCHRONOUS = None
+    rollback.SQLITE_CACHE_SIZE = None
+    rollback.SQLITE_MMAP_SIZE = None
+
+    wal, _ = make_config()
+    profiles = [('sqlite-rollback', rollback), ('sqlite-wal', wal)]
+
+    if database_url:
+        server, _ = make_config()
+        server.SQLALCHEMY_DATABASE_URI = database_url
+        profiles.append(('server', server))
+    return profiles
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.read_ms = []
+        self.write_ms = []
+        self.locked = 0
+
+    def add(self, kind, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            (self.read_ms if kind == 'read' else self.write_ms).append(elapsed)
+
+
+def reader(app, doctor_ids, stop, stats):
+    rng = random.Random()
+    today = date.today()
+    with app.app_context():
+        while not stop.is_set():
+            doctor_id = rng.choice(doctor_ids)
+            started = time.perf_counter()
+            try:
+                appointment_stats(doctor_id=doctor_id, include_patients=True)
+                Appointment.query.filter(
+                    Appointment.doctor_id == doctor_id,
+                    Appointment.appointment_date >= today,
+                    Appointment.appointment_date <= today + timedelta(days=7),
+                    Appointment.status == 'booked'
+                ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+                db.session.rollback()
+            except OperationalError:
+                db.session.rollback()
+                with stats.lock:
+                    stats.locked += 1
+                continue
+            stats.add('read', started)
+
+
+def writer(app, doctor_ids, patient_ids, slots, stop, stats):
+    rng = random.Random()
+    first_day = date.today() + timedelta(days=FUTURE_DAYS)
+    with app.app_context():
+        while not stop.is_set():
+            # Fresh slots past the seeded window, so bookings never collide
+            n = next(slots)
+            doctor_index, rest = n % len(doctor_ids), n // len(doctor_ids)
+            day, slot = divmod(rest, SLOTS_PER_DAY)
+            started = time.perf_counter()
+            try:
+                db.session.add(Appointment(
+                    patient_id=rng.choice(patient_ids),
+                    doctor_id=doctor_ids[doctor_index],
+                    appointment_date=first_day + timedelta(days=day),
+                    appointment_time=dtime(9 + slot // 6, (slot % 6) * 10),
+                    status='booked',
+                    consultation_fee=500,
+                    payment_status='paid',
+                    created_at=datetime.utcnow()
+                ))
+                db.session.commit()
+            except OperationalError:
+                db.session.rollback()
+                with stats.lock:
+                    stats.locked += 1
+                continue
+            stats.add('write', started)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_profile(config, args):
+    app = create_app(config)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        doctor_ids, patient_ids = seed(args.appointments, date.today())
+        if db.engine.dialect.name == 'sqlite':
+            db.session.connection().exec_driver_sql('ANALYZE')
+        else:
+            db.session.connection().exec_driver_sql('ANALYZE appointments')
+        db.session.commit()
+        journal = (db.session.connection().exec_driver_sql('PRAGMA journal_mode').scalar()
+                   if db.engine.dialect.name == 'sqlite' else db.engine.dialect.name)
+        db.session.rollback()
+
+    stats = Stats()
+    stop = threading.Event()
+    slots = itertools.count()
+    threads = [
+        threading.Thread(target=reader, args=(app, doctor_ids, stop, stats))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=writer, args=(app, doctor_ids, patient_ids, slots, stop, stats))
+        for _ in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            db.drop_all()
+        db.engine.dispose()
+    return journal, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--database-url', help='server database for the "server" profile')
+    args = parser.parse_args()
+
+    print(f'{args.appointments:,} appointments, {args.readers} readers, {args.writers} writers, '
+          f'{args.seconds:g}s per profile\n')
+    print(f"{'profile':<16} {'journal':<10} {'reads/s':>8} {'read p50/p95 ms':>16} "
+          f"{'writes/s':>9} {'write p50/p95 ms':>17} {'locked':>7}")
+    print('-' * 90)
+    for name, config in profile_configs(args.database_url):
+        journal, stats = run_profile(config, args)
+        print(f'{name:<16} {journal:<10} {len(stats.read_ms) / args.seconds:>8.1f} '
+              f'{statistics.median(stats.read_ms or [0]):>7.1f}/{percentile(stats.read_ms, 0.95):<8.1f} '
+              f'{len(stats.write_ms) / args.seconds:>9.1f} '
+              f'{statistics.median(stats.write_ms or [0]):>8.1f}/{percentile(stats.write_ms, 0.95):<8.1f} '
+              f'{stats.locked:>7}')
+
+
+if __name__ == '__main__':
+    main()
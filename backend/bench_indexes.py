@@ -0,0 +1,275 @@
+"""
+Query index benchmark.
+
+Seeds a throwaway SQLite database with a large appointment history, then
+runs the hot appointment, user and availability queries without the
+indexes from migration b53a29bba280 and again with them. Reports the query
+plan and median/p95 latency of each query before and after.
+
+Run: python bench_indexes.py                       (1,000,000 appointments)
+     python bench_indexes.py --appointments 200000 --repeat 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+from app import create_app, db
+from app.models import User, Appointment, DoctorAvailability
+from app.services.slots import taken_times_range
+from sqlalchemy import event, insert
+
+# Indexes added by the migration; dropped for the "before" run
+NEW_INDEXES = [
+    'ix_appointments_doctor_date_status',
+    'ix_appointments_patient_status_date',
+    'ix_appointments_booked_date',
+    'ix_appointments_created_at',
+    'ix_users_role_active',
+]
+
+DOCTORS = 200
+PATIENTS = 50000
+HISTORY_DAYS = 730
+FUTURE_DAYS = 60
+SLOTS_PER_DAY = 48  # 09:00-17:00 in 10-minute slots
+CHUNK = 20000
+
+
+def make_config():
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CACHE_TYPE = 'SimpleCache'
+        SLOT_ENGINE_BACKEND = 'memory'
+        SLOT_EVENTS_BACKEND = 'memory'
+
+    return BenchConfig, db_path
+
+
+def insert_chunked(table, rows):
+    for offset in range(0, len(rows), CHUNK):
+        db.session.execute(insert(table), rows[offset:offset + CHUNK])
+
+
+def seed(appointments, today):
+    """Doctors, patients, availability and `appointments` spread over two years"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    insert_chunked(User.__table__, [
+        dict(username=f'doctor{i}', email=f'doctor{i}@bench.test', password_hash='unused',
+             role='doctor', is_active=i % 20 != 0, full_name=f'Dr. {i}', consultation_fee=500,
+             created_at=now)
+        for i in range(DOCTORS)
+    ])
+    insert_chunked(User.__table__, [
+        dict(username=f'patient{i}', email=f'patient{i}@bench.test', password_hash='unused',
+             role='patient', is_active=i % 50 != 0, full_name=f'Patient {i}', consultation_fee=0,
+             created_at=now)
+        for i in range(PATIENTS)
+    ])
+    doctor_ids = [row.id for row in db.session.query(User.id).filter(User.role == 'doctor')]
+    patient_ids = [row.id for row in db.session.query(User.id).filter(User.role == 'patient')]
+
+    first_day = today - timedelta(days=HISTORY_DAYS)
+    days = HISTORY_DAYS + FUTURE_DAYS
+
+    insert_chunked(DoctorAvailability.__table__, [
+        dict(doctor_id=doctor_id, date=today + timedelta(days=offset), start_time=dtime(9),
+             end_time=dtime(17), is_available=True, lunch_break_start=None,
+             lunch_break_end=None, slot_capacity=SLOTS_PER_DAY, created_at=now)
+        for doctor_id in doctor_ids for offset in range(FUTURE_DAYS)
+    ])
+
+    # Distinct (doctor, day, slot) triples keep the booked-slot index unique
+    total_slots = len(doctor_ids) * days * SLOTS_PER_DAY
+    picks = rng.sample(range(total_slots), min(appointments, total_slots))
+    rows = []
+    for pick in picks:
+        doctor_index, rest = divmod(pick, days * SLOTS_PER_DAY)
+        day_offset, slot = divmod(rest, SLOTS_PER_DAY)
+        day = first_day + timedelta(days=day_offset)
+        if day >= today:
+            status = 'booked' if rng.random() < 0.9 else 'cancelled'
+        else:
+            status = rng.choices(['completed', 'cancelled', 'booked'], [85, 14, 1])[0]
+        rows.append(dict(
+            patient_id=rng.choice(patient_ids),
+            doctor_id=doctor_ids[doctor_index],
+            appointment_date=day,
+            appointment_time=dtime(9 + slot // 6, (slot % 6) * 10),
+            status=status,
+            reason='',
+            consultation_fee=500,
+            payment_status='paid',
+            created_at=datetime.combine(day, dtime(8)) - timedelta(days=rng.randint(1, 30)),
+            updated_at=now
+        ))
+        if len(rows) == CHUNK:
+            db.session.execute(insert(Appointment.__table__), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Appointment.__table__), rows)
+    db.session.commit()
+    return doctor_ids, patient_ids
+
+
+def hot_queries(doctor_id, patient_id, today):
+    """(name, callable) pairs mirroring the queries the routes and tasks run"""
+    week_later = today + timedelta(days=7)
+    yesterday = today - timedelta(days=1)
+    return [
+        ('booking conflict check (taken_times_range)',
+         lambda: taken_times_range([doctor_id], today, week_later)),
+        ('doctor dashboard: upcoming week',
+         lambda: Appointment.query.filter(
+             Appointment.doctor_id == doctor_id,
+             Appointment.appointment_date >= today,
+             Appointment.appointment_date <= week_later,
+             Appointment.status == 'booked'
+         ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()),
+        ('doctor dashboard: completed count',
+         lambda: Appointment.query.filter_by(doctor_id=doctor_id, status='completed').count()),
+        ('patient dashboard: upcoming',
+         lambda: Appointment.query.filter(
+             Appointment.patient_id == patient_id,
+             Appointment.appointment_date >= today,
+             Appointment.status == 'booked'
+         ).order_by(Appointment.appointment_date, Appointment.appointment_time).limit(5).all()),
+        ('patient history: completed',
+         lambda: Appointment.query.filter_by(
+             patient_id=patient_id, status='completed'
+         ).order_by(Appointment.appointment_date.desc()).all()),
+        ('send_daily_reminders',
+         lambda: Appointment.query.filter_by(appointment_date=today, status='booked').all()),
+        ('cancel_missed_appointments',
+         lambda: Appointment.query.filter(
+             Appointment.appointment_date == yesterday,
+             Appointment.status == 'booked'
+         ).all()),
+        ('admin dashboard: recent appointments',
+         lambda: Appointment.query.order_by(Appointment.created_at.desc()).limit(10).all()),
+        ('active doctors (role, is_active)',
+         lambda: User.query.filter_by(role='doctor', is_active=True).all()),
+        ('doctor availability for a day',
+         lambda: DoctorAvailability.query.filter_by(doctor_id=doctor_id, date=week_later).first()),
+    ]
+
+
+def capture_sql(fn):
+    """Run fn once and return the (statement, parameters) of its queries"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return captured
+
+
+def query_plan(fn):
+    plans = []
+    connection = db.session.connection()
+    for statement, parameters in capture_sql(fn):
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        plans.append('; '.join(row[-1] for row in rows))
+    return ' | '.join(plans)
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def run_queries(queries, repeat):
+    results = {}
+    for name, fn in queries:
+        fn()  # warm the page cache
+        results[name] = (query_plan(fn),) + measure(fn, repeat)
+    return results
+
+
+def set_indexes(create):
+    indexes = {
+        index.name: index
+        for table in (Appointment.__table__, User.__table__)
+        for index in table.indexes
+    }
+    started = time.perf_counter()
+    connection = db.session.connection()
+    for name in NEW_INDEXES:
+        if create:
+            indexes[name].create(connection)
+        else:
+            indexes[name].drop(connection)
+    connection.exec_driver_sql('ANALYZE')
+    db.session.commit()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per query')
+    args = parser.parse_args()
+
+    config, db_path = make_config()
+    app = create_app(config)
+    today = date.today()
+
+    with app.app_context():
+        db.create_all()
+        set_indexes(create=False)
+
+        started = time.perf_counter()
+        doctor_ids, patient_ids = seed(args.appointments, today)
+        print(f'Seeded {args.appointments:,} appointments, {len(doctor_ids)} doctors and '
+              f'{len(patient_ids):,} patients in {time.perf_counter() - started:.1f}s ({db_path})\n')
+
+        # The busiest doctor and patient make the unindexed scans no cheaper
+        doctor_id = db.session.query(Appointment.doctor_id).group_by(Appointment.doctor_id).order_by(
+            db.func.count().desc()).limit(1).scalar()
+        patient_id = db.session.query(Appointment.patient_id).group_by(Appointment.patient_id).order_by(
+            db.func.count().desc()).limit(1).scalar()
+        queries = hot_queries(doctor_id, patient_id, today)
+
+        db.session.connection().exec_driver_sql('ANALYZE')
+        before = run_queries(queries, args.repeat)
+        build_seconds = set_indexes(create=True)
+        after = run_queries(queries, args.repeat)
+
+    print(f"{'query':<44} {'before p50/p95 ms':>19} {'after p50/p95 ms':>18} {'speedup':>8}")
+    print('-' * 92)
+    for name, _ in queries:
+        _, before_p50, before_p95 = before[name]
+        _, after_p50, after_p95 = after[name]
+        print(f'{name:<44} {before_p50:>9.2f}/{before_p95:<9.2f} {after_p50:>8.2f}/{after_p95:<9.2f} '
+              f'{before_p50 / max(after_p50, 1e-6):>7.1f}x')
+
+    print(f'\nBuilding the {len(NEW_INDEXES)} indexes took {build_seconds:.1f}s\n')
+    print('Query plans')
+    for name, _ in queries:
+        print(f'  {name}\n    before: {before[name][0]}\n    after:  {after[name][0]}')
+
+
+if __name__ == '__main__':
+    main()
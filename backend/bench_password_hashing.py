@@ -0,0 +1,152 @@
+"""
+Password hashing benchmark: a login storm next to ordinary API traffic.
+
+Login threads post to /api/auth/login as fast as they can while other
+threads read /api/patient/profile (a cheap, cached endpoint) through the
+same app. Reports logins/sec and the profile reads' throughput and
+p50/p99 latency for each hashing mode:
+
+  idle      no logins; the profile reads' unloaded latency
+  inline    bcrypt on the request threads (PASSWORD_HASH_WORKERS = 0)
+  pool      bcrypt on a pool of --pool-workers threads (app.services.passwords)
+
+Logins refused with 503 because the hashing queue was full are counted
+separately.
+
+Run: python bench_password_hashing.py
+     python bench_password_hashing.py --login-threads 16 --pool-workers 1 --rounds 12 --seconds 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app import create_app, db
+from app.models import User
+from app.services.passwords import password_hasher
+from bench_indexes import make_config
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+PASSWORD = 'bench-password'
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.login_ms = []
+        self.read_ms = []
+        self.busy = 0
+
+    def add(self, kind, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            (self.login_ms if kind == 'login' else self.read_ms).append(elapsed)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def login_storm(app, usernames, stop, stats):
+    rng = random.Random()
+    client = app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json={'username': rng.choice(usernames), 'password': PASSWORD})
+        if response.status_code == 503:
+            with stats.lock:
+                stats.busy += 1
+            continue
+        assert response.status_code == 200, response.get_json()
+        stats.add('login', started)
+
+
+def reader(app, headers, stop, stats):
+    client = app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get('/api/patient/profile', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        stats.add('read', started)
+
+
+def run_mode(mode, args):
+    config, _ = make_config()
+    config.BCRYPT_LOG_ROUNDS = args.rounds
+    config.PASSWORD_HASH_WORKERS = args.pool_workers if mode == 'pool' else 0
+    config.TOKEN_REVOCATION_BACKEND = 'memory'
+    config.IDENTITY_CACHE_BACKEND = 'memory'
+    # The storm comes from one address; measure hashing, not the login limits
+    config.RATE_LIMIT_ENABLED = False
+
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        # Every user shares one hash; verifying it costs the same as distinct ones
+        password_hash = password_hasher.hash(PASSWORD)
+        db.session.execute(insert(User.__table__), [
+            dict(username=f'patient{i}', email=f'patient{i}@bench.test', password_hash=password_hash,
+                 role='patient', is_active=True, full_name=f'Patient {i}')
+            for i in range(args.users)
+        ])
+        db.session.commit()
+        reader_id = db.session.query(User.id).filter_by(username='patient0').scalar()
+        headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=reader_id, additional_claims={'role': 'patient', 'active': True}
+        )}
+
+    usernames = [f'patient{i}' for i in range(args.users)]
+    stats = Stats()
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(app, headers, stop, stats)) for _ in range(args.read_threads)]
+    if mode != 'idle':
+        threads += [
+            threading.Thread(target=login_storm, args=(app, usernames, stop, stats))
+            for _ in range(args.login_threads)
+        ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--read-threads', type=int, default=2)
+    parser.add_argument('--pool-workers', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f'bcrypt cost {args.rounds}, {args.login_threads} login threads, {args.read_threads} profile readers, '
+          f'pool of {args.pool_workers}, {os.cpu_count()} CPUs, {args.seconds:g}s per mode\n')
+    print(f"{'mode':<8} {'logins/s':>9} {'login p50/p99 ms':>17} {'503s':>6} "
+          f"{'reads/s':>8} {'read p50/p99 ms':>16}")
+    print('-' * 70)
+    for mode in ('idle', 'inline', 'pool'):
+        stats = run_mode(mode, args)
+        print(f'{mode:<8} {len(stats.login_ms) / args.seconds:>9.1f} '
+              f'{statistics.median(stats.login_ms or [0]):>8.0f}/{percentile(stats.login_ms, 0.99):<8.0f} '
+              f'{stats.busy:>6} {len(stats.read_ms) / args.seconds:>8.1f} '
+              f'{statistics.median(stats.read_ms or [0]):>7.1f}/{percentile(stats.read_ms, 0.99):<8.1f}')
+
+
+if __name__ == '__main__':
+    main()
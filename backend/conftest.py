@@ -0,0 +1,113 @@
+"""
+Shared pytest fixtures: an app on a throwaway SQLite database with every
+Redis-backed service in process memory, plus user and token helpers.
+
+Tests open their own app contexts (with app.app_context()) around database
+work; a context held across requests would be reused by the test client and
+carry g (and its per-request user cache) from one request to the next.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+from app import create_app, db
+from app.models import User, Department
+from flask_jwt_extended import create_access_token
+
+
+def make_config(**overrides):
+    db_path = os.path.join(tempfile.mkdtemp(), 'test.db')
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CACHE_TYPE = 'SimpleCache'
+        SLOT_ENGINE_BACKEND = 'memory'
+        SLOT_EVENTS_BACKEND = 'memory'
+        TOKEN_REVOCATION_BACKEND = 'memory'
+        IDENTITY_CACHE_BACKEND = 'memory'
+        RATE_LIMIT_BACKEND = 'memory'
+        RATE_LIMIT_ENABLED = False
+        BCRYPT_LOG_ROUNDS = 4
+        PASSWORD_HASH_WORKERS = 0
+
+    for key, value in overrides.items():
+        setattr(TestConfig, key, value)
+    return TestConfig
+
+
+@pytest.fixture
+def app(request):
+    """App with an empty schema; mark a test with @pytest.mark.config(KEY=value) to override config"""
+    marker = request.node.get_closest_marker('config')
+    app = create_app(make_config(**(marker.kwargs if marker else {})))
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user and return its id: make_user('doctor', department_id=..., username=...)"""
+    counter = iter(range(1, 100000))
+
+    def make(role, **fields):
+        n = next(counter)
+        fields.setdefault('username', f'{role}{n}')
+        fields.setdefault('email', f"{fields['username']}@test.com")
+        fields.setdefault('full_name', f'{role.title()} {n}')
+        fields.setdefault('phone', '1234567890')
+        if role == 'doctor':
+            fields.setdefault('consultation_fee', 500)
+        with app.app_context():
+            user = User(role=role, **fields)
+            user.password_hash = 'unused'
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return make
+
+
+@pytest.fixture
+def make_department(app):
+    def make(name='Cardiology'):
+        with app.app_context():
+            department = Department(name=name)
+            db.session.add(department)
+            db.session.commit()
+            return department.id
+
+    return make
+
+
+@pytest.fixture
+def auth(app):
+    """Authorization header for a user id, with the role claims login issues"""
+    def header(user_id):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            token = create_access_token(
+                identity=user.id,
+                additional_claims={'role': user.role, 'active': user.is_active}
+            )
+        return {'Authorization': f'Bearer {token}'}
+
+    return header
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'config(**settings): override app config for the app fixture')
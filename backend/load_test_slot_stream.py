@@ -0,0 +1,207 @@
+"""
+Slot change stream load test.
+
+Runs the API in one threaded worker, opens an increasing number of
+concurrent /api/patient/slots/stream subscribers from a separate process,
+publishes slot events and reports how many reached every subscriber and
+how long that took. A level counts as sustained when every event reaches
+every subscriber within the p99 latency budget.
+
+Run: python load_test_slot_stream.py --subscribers 100 250 500 1000
+     python load_test_slot_stream.py --backend redis   (needs a Redis server)
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+from app import create_app, db
+from app.models import User
+from app.services.slot_events import slot_events, BOOKED
+from flask_jwt_extended import create_access_token
+from werkzeug.serving import make_server
+
+
+def make_config(backend):
+    db_path = os.path.join(tempfile.mkdtemp(), 'load.db')
+
+    class LoadConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CACHE_TYPE = 'SimpleCache'
+        SLOT_ENGINE_BACKEND = 'memory'
+        SLOT_EVENTS_BACKEND = backend
+        SLOT_EVENTS_STREAM_SECONDS = 3600
+
+    return LoadConfig
+
+
+def seed(app):
+    """One doctor and one patient; returns (doctor_id, patient token)"""
+    with app.app_context():
+        db.create_all()
+        doctor = User(username='doctor', email='doctor@test.com', role='doctor',
+                      full_name='Dr. Load', phone='1234567890')
+        patient = User(username='patient', email='patient@test.com', role='patient',
+                       full_name='Patient', phone='1234567890')
+        doctor.password_hash = patient.password_hash = 'unused'
+        db.session.add_all([doctor, patient])
+        db.session.commit()
+        return doctor.id, create_access_token(identity=patient.id)
+
+
+def subscriber(port, path, ready, received):
+    """Read one stream until it closes, recording when each slot event arrived"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        event = None
+        while True:
+            line = response.fp.readline()
+            if not line:
+                return
+            line = line.decode().rstrip('\n')
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                if event == 'snapshot':
+                    ready.release()
+                elif event == 'slot':
+                    received.append((json.loads(line[6:])['time'], time.time()))
+                event = None
+    except OSError:
+        return
+    finally:
+        conn.close()
+
+
+def client_process(port, path, count, ready_counter, results):
+    """Open `count` streams with one thread each and report their receipts"""
+    ready = threading.Semaphore(0)
+    streams = [[] for _ in range(count)]
+    threads = [
+        threading.Thread(target=subscriber, args=(port, path, ready, streams[i]), daemon=True)
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for _ in range(count):
+        ready.acquire()
+        with ready_counter.get_lock():
+            ready_counter.value += 1
+    for thread in threads:
+        thread.join()
+    results.put(streams)
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_level(app, port, doctor_id, token, count, events, interval):
+    day = date.today() + timedelta(days=1)
+    path = f'/api/patient/slots/stream?doctor_id={doctor_id}&date={day.isoformat()}&jwt={token}'
+
+    ready_counter = multiprocessing.Value('i', 0)
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=client_process, args=(port, path, count, ready_counter, results)
+    )
+
+    started = time.time()
+    process.start()
+    while ready_counter.value < count:
+        if time.time() - started > 120:
+            raise RuntimeError(f'only {ready_counter.value}/{count} subscribers connected')
+        time.sleep(0.05)
+    connect_seconds = time.time() - started
+
+    sent = {}
+    for i in range(events):
+        t = dtime(9 + i // 6, (i % 6) * 10)
+        sent[t.strftime('%H:%M')] = time.time()
+        slot_events.publish(doctor_id, day, t, BOOKED)
+        time.sleep(interval)
+
+    # Give the last events time to drain, then end every stream
+    time.sleep(1)
+    slot_events.close_all()
+
+    streams = results.get(timeout=120)
+    process.join(timeout=30)
+
+    latencies = [
+        (received_at - sent[slot]) * 1000
+        for stream in streams for slot, received_at in stream if slot in sent
+    ]
+    return {
+        'subscribers': count,
+        'connect_s': connect_seconds,
+        'delivered': len(latencies),
+        'expected': count * events,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies) if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[100, 250, 500, 1000])
+    parser.add_argument('--events', type=int, default=20, help='slot events published per level')
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds between events')
+    parser.add_argument('--max-p99-ms', type=float, default=500)
+    parser.add_argument('--backend', choices=['memory', 'redis'], default='memory')
+    args = parser.parse_args()
+
+    # Per-request access logs would dominate the output
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.getLogger('app.services.slot_events').setLevel(logging.ERROR)
+
+    app = create_app(make_config(args.backend))
+    doctor_id, token = seed(app)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'One threaded worker on port {server.port}, {args.backend} event backend, '
+          f'{args.events} events per level\n')
+
+    header = f"{'subscribers':>11} {'connect s':>9} {'delivered':>17} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  result"
+    print(header)
+    print('-' * len(header))
+
+    sustained = 0
+    for count in args.subscribers:
+        try:
+            row = run_level(app, server.port, doctor_id, token, count, args.events, args.interval)
+        except Exception as e:
+            print(f'{count:>11}  failed: {e}')
+            break
+        ok = row['delivered'] == row['expected'] and row['p99_ms'] <= args.max_p99_ms
+        print(f"{row['subscribers']:>11} {row['connect_s']:>9.2f} "
+              f"{row['delivered']:>8}/{row['expected']:<8} {row['p50_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}  {'ok' if ok else 'DEGRADED'}")
+        if not ok:
+            break
+        sustained = count
+
+    print(f'\nSustained: {sustained} concurrent subscribers on one worker '
+          f'(all events delivered, p99 <= {args.max_p99_ms:.0f} ms)')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""never reuse appointment and treatment ids
+
+Revision ID: 166b2cb0a1c5
+Revises: 14ba1dc2aff8
+Create Date: 2026-10-18 07:34:38.659004
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '166b2cb0a1c5'
+down_revision = '14ba1dc2aff8'
+branch_labels = None
+depends_on = None
+
+# Live table and the archive table its rows move to with their ids
+TABLES = (('appointments', 'appointments_archive'), ('treatments', 'treatments_archive'))
+
+
+def upgrade():
+    # SQLite reuses the highest rowid once those rows are deleted (moved to
+    # the archive), which then collides with the archived id. AUTOINCREMENT
+    # never hands an id out twice. Server databases use sequences already.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, archive in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+        # Start past every id already archived, not only the live ones
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', MAX("
+            f"(SELECT COALESCE(MAX(id), 0) FROM {table}), "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {archive}))"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, _ in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
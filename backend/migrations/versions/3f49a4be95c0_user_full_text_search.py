@@ -0,0 +1,66 @@
+"""user full text search
+
+Revision ID: 3f49a4be95c0
+Revises: 6afef5532cfc
+Create Date: 2026-10-18 06:55:39.858905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f49a4be95c0'
+down_revision = '6afef5532cfc'
+branch_labels = None
+depends_on = None
+
+
+FIELDS = ('full_name', 'username', 'email', 'phone')
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "full_name, username, email, phone, content='users', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, full_name, username, email, phone) "
+    "VALUES (new.id, new.full_name, new.username, new.email, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name, username, email, phone) "
+    "VALUES ('delete', old.id, old.full_name, old.username, old.email, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, username, email, phone "
+    "ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name, username, email, phone) "
+    "VALUES ('delete', old.id, old.full_name, old.username, old.email, old.phone); "
+    "INSERT INTO users_fts(rowid, full_name, username, email, phone) "
+    "VALUES (new.id, new.full_name, new.username, new.email, new.phone); END",
+    # Index the users that already exist
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS users_fts_update',
+    'DROP TRIGGER IF EXISTS users_fts_delete',
+    'DROP TRIGGER IF EXISTS users_fts_insert',
+    'DROP TABLE IF EXISTS users_fts',
+]
+
+POSTGRES_UPGRADE = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS ix_users_{field}_trgm ON users USING gin ({field} gin_trgm_ops)'
+    for field in FIELDS
+]
+
+POSTGRES_DOWNGRADE = [f'DROP INDEX IF EXISTS ix_users_{field}_trgm' for field in FIELDS]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
@@ -0,0 +1,91 @@
+"""
+Cold storage: old finished appointments move to the archive tables with
+their treatments, ids are never handed out again afterwards, and patient
+history reads both tables.
+
+Run: python -m pytest test_archive.py -q
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from app import db
+from app.models import Appointment, Treatment, ArchivedAppointment, ArchivedTreatment
+from app.services.daily_stats import check_daily_stats
+
+OLD = date.today() - timedelta(days=400)
+
+
+@pytest.fixture
+def people(make_user, make_department):
+    return make_user('doctor', specialization_id=make_department()), make_user('patient')
+
+
+def add_appointment(app, doctor, patient, day, status, diagnosis=None, t=time(10, 0)):
+    with app.app_context():
+        appointment = Appointment(doctor_id=doctor, patient_id=patient, appointment_date=day,
+                                  appointment_time=t, status=status, consultation_fee=500,
+                                  payment_status='paid')
+        db.session.add(appointment)
+        db.session.flush()
+        if diagnosis:
+            db.session.add(Treatment(appointment_id=appointment.id, diagnosis=diagnosis))
+        db.session.commit()
+        return appointment.id
+
+
+def archive_all(app):
+    result = app.test_cli_runner().invoke(args=['archive', 'run', '--all'])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_archive_moves_finished_appointments_with_treatments(app, people):
+    doctor, patient = people
+    completed = add_appointment(app, doctor, patient, OLD, 'completed', diagnosis='Flu')
+    cancelled = add_appointment(app, doctor, patient, OLD, 'cancelled', t=time(11, 0))
+    recent = add_appointment(app, doctor, patient, date.today() - timedelta(days=3), 'completed')
+    booked = add_appointment(app, doctor, patient, date.today() + timedelta(days=3), 'booked')
+
+    assert 'Archived 2 appointments' in archive_all(app)
+
+    with app.app_context():
+        assert {row.id for row in ArchivedAppointment.query} == {completed, cancelled}
+        assert {row.id for row in Appointment.query} == {recent, booked}
+        assert ArchivedTreatment.query.one().appointment_id == completed
+        assert Treatment.query.count() == 0
+        # The rollup reads archived appointments too, so nothing changed
+        assert check_daily_stats() == []
+
+
+def test_ids_are_not_reused_after_archiving_the_newest(app, people):
+    doctor, patient = people
+    archived = [add_appointment(app, doctor, patient, OLD, 'completed', diagnosis=f'Visit {i}',
+                                t=time(9 + i, 0)) for i in range(3)]
+    archive_all(app)
+
+    # Every live row is gone; SQLite would otherwise start again at id 1
+    new = add_appointment(app, doctor, patient, OLD, 'completed', diagnosis='Later', t=time(15, 0))
+    assert new > max(archived)
+
+    archive_all(app)
+    with app.app_context():
+        assert sorted(row.id for row in ArchivedAppointment.query) == archived + [new]
+        assert len({row.id for row in ArchivedTreatment.query}) == 4
+
+
+def test_history_merges_live_and_archived_visits(app, client, auth, people):
+    doctor, patient = people
+    old = add_appointment(app, doctor, patient, OLD, 'completed', diagnosis='Archived flu')
+    add_appointment(app, doctor, patient, OLD, 'cancelled', t=time(11, 0))
+    archive_all(app)
+    recent = add_appointment(app, doctor, patient, date.today() - timedelta(days=3), 'completed',
+                             diagnosis='Checkup')
+
+    response = client.get('/api/patient/history', headers=auth(patient))
+    assert response.status_code == 200
+    history = response.get_json()['history']
+
+    assert [entry['id'] for entry in history] == [recent, old]
+    assert [entry['treatment']['diagnosis'] for entry in history] == ['Checkup', 'Archived flu']
+    assert history[1]['doctor_details']['specialization'] == 'Cardiology'
@@ -0,0 +1,123 @@
+"""
+Availability saves: lunch breaks survive saves that don't name them, and
+the portable (no ON CONFLICT) path writes the same rows.
+
+Run: python -m pytest test_availability_bulk.py -q
+"""
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import DoctorAvailability, AvailabilityRule
+
+
+@pytest.fixture
+def doctor(make_user, make_department):
+    return make_user('doctor', specialization_id=make_department())
+
+
+@pytest.fixture
+def admin(make_user):
+    return make_user('admin')
+
+
+def add_day(app, doctor, day, lunch=(time(13, 0), time(14, 0))):
+    with app.app_context():
+        db.session.add(DoctorAvailability(
+            doctor_id=doctor, date=day, start_time=time(9, 0), end_time=time(17, 0),
+            lunch_break_start=lunch[0], lunch_break_end=lunch[1]
+        ))
+        db.session.commit()
+
+
+def stored_day(app, doctor, day):
+    with app.app_context():
+        avail = DoctorAvailability.query.filter_by(doctor_id=doctor, date=day).one()
+        return avail.to_dict(), avail.slot_capacity
+
+
+def test_admin_week_save_keeps_lunch_break(app, client, auth, admin, doctor):
+    day = date.today() + timedelta(days=1)
+    add_day(app, doctor, day)
+
+    # What the admin modal sends: hours only
+    response = client.post('/api/admin/availability/batch', headers=auth(admin), json={'entries': [
+        {'doctor_id': doctor, 'date': day.isoformat(), 'start_time': '08:00', 'end_time': '17:00',
+         'is_available': True}
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['summary'] == {'created': 0, 'updated': 1, 'superseded': 0, 'error': 0}
+
+    saved, capacity = stored_day(app, doctor, day)
+    assert (saved['start_time'], saved['lunch_break_start'], saved['lunch_break_end']) == ('08:00', '13:00', '14:00')
+    assert capacity == 8 * 6  # 9 working hours less the lunch hour
+
+
+def test_admin_single_day_save_keeps_lunch_break(app, client, auth, admin, doctor):
+    day = date.today() + timedelta(days=1)
+    add_day(app, doctor, day)
+
+    response = client.post(f'/api/admin/doctors/{doctor}/availability', headers=auth(admin), json={
+        'date': day.isoformat(), 'start_time': '09:00', 'end_time': '18:00'
+    })
+    assert response.status_code == 201
+    assert response.get_json()['message'] == 'Availability updated successfully'
+    saved, _ = stored_day(app, doctor, day)
+    assert (saved['end_time'], saved['lunch_break_start']) == ('18:00', '13:00')
+
+    response = client.post(f'/api/admin/doctors/{doctor}/availability', headers=auth(admin), json={
+        'date': day.isoformat(), 'start_time': '17:00', 'end_time': '09:00'
+    })
+    assert response.status_code == 400
+
+
+def test_explicit_empty_lunch_break_clears_it(app, client, auth, admin, doctor):
+    day = date.today() + timedelta(days=1)
+    add_day(app, doctor, day)
+
+    client.post('/api/admin/availability/batch', headers=auth(admin), json={'entries': [
+        {'doctor_id': doctor, 'date': day.isoformat(), 'start_time': '09:00', 'end_time': '17:00',
+         'lunch_break_start': None, 'lunch_break_end': None}
+    ]})
+
+    saved, capacity = stored_day(app, doctor, day)
+    assert saved['lunch_break_start'] is None
+    assert capacity == 8 * 6
+
+
+def test_override_of_rule_day_inherits_rule_lunch_break(app, client, auth, admin, doctor):
+    day = date.today() + timedelta(days=1)
+    with app.app_context():
+        db.session.add(AvailabilityRule(
+            doctor_id=doctor, weekday=day.weekday(), start_time=time(9, 0), end_time=time(17, 0),
+            lunch_break_start=time(12, 0), lunch_break_end=time(12, 30), effective_from=date.today()
+        ))
+        db.session.commit()
+
+    client.post('/api/admin/availability/batch', headers=auth(admin), json={'entries': [
+        {'doctor_id': doctor, 'date': day.isoformat(), 'start_time': '10:00', 'end_time': '17:00'}
+    ]})
+
+    saved, _ = stored_day(app, doctor, day)
+    assert (saved['start_time'], saved['lunch_break_start'], saved['lunch_break_end']) == ('10:00', '12:00', '12:30')
+
+
+def test_portable_upsert_matches_on_conflict(app, client, auth, admin, doctor):
+    kept = date.today() + timedelta(days=1)
+    new = date.today() + timedelta(days=2)
+    add_day(app, doctor, kept)
+
+    with mock.patch('app.services.availability_bulk._insert_for_dialect', return_value=None):
+        response = client.post('/api/admin/availability/batch', headers=auth(admin), json={'entries': [
+            {'doctor_id': doctor, 'date': kept.isoformat(), 'start_time': '08:00', 'end_time': '16:00'},
+            {'doctor_id': doctor, 'date': new.isoformat(), 'start_time': '09:00', 'end_time': '12:00'},
+        ]})
+
+    assert response.get_json()['summary'] == {'created': 1, 'updated': 1, 'superseded': 0, 'error': 0}
+    saved, capacity = stored_day(app, doctor, kept)
+    assert (saved['start_time'], saved['end_time'], saved['lunch_break_start']) == ('08:00', '16:00', '13:00')
+    assert capacity == 7 * 6
+    saved, capacity = stored_day(app, doctor, new)
+    assert (saved['start_time'], saved['lunch_break_start'], capacity) == ('09:00', None, 18)
@@ -0,0 +1,94 @@
+"""
+Weekly availability rules: overlapping rules for a weekday are refused,
+recurring weekly hours replace the ones in force and keep their lunch break,
+and days expanded from a rule carry a stable id.
+
+Run: python -m pytest test_availability_rules.py -q
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from app import db
+from app.models import AvailabilityRule
+
+
+@pytest.fixture
+def doctor(make_user, make_department):
+    return make_user('doctor', specialization_id=make_department())
+
+
+def add_rule(app, doctor, weekday, effective_from, effective_until=None):
+    with app.app_context():
+        rule = AvailabilityRule(doctor_id=doctor, weekday=weekday, start_time=time(9, 0),
+                                end_time=time(17, 0), effective_from=effective_from,
+                                effective_until=effective_until)
+        db.session.add(rule)
+        db.session.commit()
+        return rule.id
+
+
+def test_overlapping_rule_for_a_weekday_is_refused(app, client, auth, doctor):
+    today = date.today()
+    existing = add_rule(app, doctor, 0, today, today + timedelta(days=30))
+
+    response = client.post('/api/doctor/availability/rules', headers=auth(doctor), json={
+        'weekdays': [0, 1], 'start_time': '10:00', 'end_time': '16:00'
+    })
+    assert response.status_code == 409
+    assert response.get_json()['conflicting_rule_ids'] == [existing]
+
+    # Starting after the existing rule ends is fine
+    response = client.post('/api/doctor/availability/rules', headers=auth(doctor), json={
+        'weekdays': [0], 'start_time': '10:00', 'end_time': '16:00',
+        'effective_from': (today + timedelta(days=31)).isoformat()
+    })
+    assert response.status_code == 201
+    later = response.get_json()['rules'][0]['id']
+
+    # ...until an update stretches one over the other
+    response = client.put(f'/api/doctor/availability/rules/{existing}', headers=auth(doctor), json={
+        'effective_until': None
+    })
+    assert response.status_code == 409
+    assert response.get_json()['conflicting_rule_ids'] == [later]
+
+
+def test_recurring_hours_replace_rules_in_force(app, client, auth, doctor):
+    today = date.today()
+    started = add_rule(app, doctor, today.weekday(), today - timedelta(days=14))
+    upcoming = add_rule(app, doctor, (today.weekday() + 1) % 7, today + timedelta(days=7))
+
+    for _ in range(2):
+        response = client.post('/api/doctor/availability/bulk', headers=auth(doctor), json={
+            'recurring': True, 'start_time': '08:00', 'end_time': '16:00',
+            'lunch_break_start': '12:00', 'lunch_break_end': '12:30'
+        })
+        assert response.status_code == 201
+
+    with app.app_context():
+        rules = AvailabilityRule.query.all()
+        assert db.session.get(AvailabilityRule, upcoming) is None
+        assert db.session.get(AvailabilityRule, started).effective_until == today - timedelta(days=1)
+        current = [rule for rule in rules if rule.id != started]
+        assert sorted(rule.weekday for rule in current) == list(range(7))
+        assert {(rule.lunch_break_start, rule.lunch_break_end) for rule in current} == {(time(12, 0), time(12, 30))}
+
+    response = client.post('/api/doctor/availability/bulk', headers=auth(doctor), json={
+        'recurring': True, 'start_time': '08:00', 'end_time': '16:00', 'lunch_break_start': '12:00'
+    })
+    assert response.status_code == 400
+
+
+def test_rule_days_have_stable_unique_ids(app, client, auth, doctor):
+    today = date.today()
+    rule = add_rule(app, doctor, today.weekday(), today)
+    add_rule(app, doctor, (today.weekday() + 1) % 7, today)
+
+    days = client.get('/api/doctor/availability', headers=auth(doctor)).get_json()['availability']
+    ids = [day['id'] for day in days]
+    assert len(days) == 3  # today, tomorrow and today next week
+    assert len(set(ids)) == 3
+    assert f'rule-{rule}-{today.isoformat()}' in ids
+    assert ids == [day['id'] for day in
+                   client.get('/api/doctor/availability', headers=auth(doctor)).get_json()['availability']]
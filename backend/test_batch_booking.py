@@ -0,0 +1,115 @@
+"""
+Batch booking: items are decided against one snapshot, later items see
+slots taken by earlier ones, and a single booking that wins a slot between
+planning and commit makes the batch re-plan instead of failing whole.
+
+Run: python -m pytest test_batch_booking.py -q
+"""
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import Appointment, DoctorAvailability, DailyDoctorStats
+from app.services import batch_booking
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def no_notifications(app):
+    with mock.patch('app.routes.admin.send_bulk_booking_notifications') as task:
+        yield task
+
+
+@pytest.fixture
+def clinic(app, make_user, make_department):
+    doctor = make_user('doctor', specialization_id=make_department())
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor, date=TOMORROW,
+                                          start_time=time(9, 0), end_time=time(10, 0)))
+        db.session.commit()
+    return make_user('admin'), doctor, [make_user('patient') for _ in range(3)]
+
+
+def item(patient, doctor, t):
+    return {'patient_id': patient, 'doctor_id': doctor,
+            'appointment_date': TOMORROW.isoformat(), 'appointment_time': t}
+
+
+def book(client, auth, admin, items):
+    return client.post('/api/admin/appointments/batch', headers=auth(admin), json={'appointments': items})
+
+
+def test_batch_books_and_reports_each_item(app, client, auth, clinic, no_notifications):
+    admin, doctor, patients = clinic
+    response = book(client, auth, admin, [
+        item(patients[0], doctor, '09:00'),
+        item(patients[1], doctor, '09:00'),
+        item(patients[2], doctor, '12:00'),
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['status'] for result in body['results']] == ['booked', 'conflict', 'error']
+    assert body['summary'] == {'booked': 1, 'conflict': 1, 'error': 1}
+    no_notifications.delay.assert_called_once_with([body['results'][0]['appointment_id']])
+
+
+def test_batch_bookings_are_paid_like_single_bookings(app, client, auth, clinic):
+    admin, doctor, patients = clinic
+    response = book(client, auth, admin, [
+        item(patients[0], doctor, '09:00'),
+        dict(item(patients[1], doctor, '09:10'), payment_status='pending'),
+    ])
+    assert response.get_json()['summary']['booked'] == 2
+
+    with app.app_context():
+        booked = Appointment.query.filter_by(doctor_id=doctor).order_by(Appointment.appointment_time).all()
+        assert [a.payment_status for a in booked] == ['paid', 'pending']
+        stats = DailyDoctorStats.query.filter_by(doctor_id=doctor, day=TOMORROW).one()
+        assert stats.paid_revenue == booked[0].consultation_fee
+
+
+def test_slot_taken_after_planning_is_replanned(app, client, auth, clinic):
+    admin, doctor, patients = clinic
+    plan = batch_booking._plan
+    calls = []
+
+    def plan_then_lose_race(parsed, results):
+        planned = plan(parsed, results)
+        if not calls:
+            # A single booking commits 09:10 between the snapshot and the insert
+            with db.engine.begin() as connection:
+                connection.execute(Appointment.__table__.insert().values(
+                    doctor_id=doctor, patient_id=patients[2], appointment_date=TOMORROW,
+                    appointment_time=time(9, 10), status='booked', consultation_fee=500
+                ))
+        calls.append(len(planned))
+        return planned
+
+    with mock.patch('app.services.batch_booking._plan', plan_then_lose_race):
+        response = book(client, auth, admin, [
+            item(patients[0], doctor, '09:00'),
+            item(patients[1], doctor, '09:10'),
+        ])
+
+    assert calls == [2, 1]
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['booked', 'conflict']
+    with app.app_context():
+        booked = Appointment.query.filter_by(doctor_id=doctor, status='booked').all()
+        assert sorted((a.patient_id, a.appointment_time) for a in booked) == [
+            (patients[0], time(9, 0)), (patients[2], time(9, 10))
+        ]
+
+
+def test_batch_gives_up_when_every_plan_loses(app, client, auth, clinic):
+    admin, doctor, patients = clinic
+    with mock.patch('app.services.batch_booking.commit_slot_change',
+                    side_effect=batch_booking.SlotConflict()) as commit:
+        response = book(client, auth, admin, [item(patients[0], doctor, '09:00')])
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert commit.call_count == batch_booking.BATCH_ATTEMPTS
@@ -0,0 +1,143 @@
+"""
+Permanent cascade delete of a department, doctor or patient: the counts of
+removed rows per table, what is left behind, and the chunked background
+path for large histories.
+
+Run: python -m pytest test_cascade_delete.py -q
+"""
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import (User, Department, Appointment, Treatment, ArchivedAppointment, DoctorAvailability,
+                        AvailabilityRule, WaitlistEntry, DailyDoctorStats)
+from app.services.cascade_delete import CascadeDelete
+from app.services.daily_stats import check_daily_stats
+
+OLD = date.today() - timedelta(days=400)
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture
+def hospital(app, make_user, make_department):
+    """
+    Cardiology with two doctors and Neurology with one. Every doctor has a day
+    of availability, a weekly rule, one archived and two live appointments
+    with the same patient (the completed ones with a treatment), and a
+    waitlist entry from another patient.
+    """
+    cardiology, neurology = make_department('Cardiology'), make_department('Neurology')
+    doctors = [make_user('doctor', specialization_id=department)
+               for department in (cardiology, cardiology, neurology)]
+    patient, waiting = make_user('patient'), make_user('patient')
+
+    with app.app_context():
+        for doctor in doctors:
+            db.session.add(DoctorAvailability(doctor_id=doctor, date=TOMORROW,
+                                              start_time=time(9, 0), end_time=time(12, 0)))
+            db.session.add(AvailabilityRule(doctor_id=doctor, weekday=0, start_time=time(9, 0),
+                                            end_time=time(12, 0), effective_from=date.today()))
+            db.session.add(WaitlistEntry(doctor_id=doctor, patient_id=waiting, date=TOMORROW))
+            for day, status in ((OLD, 'completed'), (date.today() - timedelta(days=1), 'completed'),
+                                (TOMORROW, 'booked')):
+                appointment = Appointment(doctor_id=doctor, patient_id=patient, appointment_date=day,
+                                          appointment_time=time(9, 0), status=status, consultation_fee=500)
+                db.session.add(appointment)
+                db.session.flush()
+                if status == 'completed':
+                    db.session.add(Treatment(appointment_id=appointment.id, diagnosis='Checkup'))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['archive', 'run', '--all'])
+    assert result.exit_code == 0, result.output
+    return cardiology, doctors, patient, waiting
+
+
+def cascade(app, kind, target_id):
+    with app.app_context():
+        delete = CascadeDelete(kind, target_id)
+        deleted = delete.run()
+        db.session.commit()
+        delete.after_commit()
+        return deleted
+
+
+def counts(app):
+    with app.app_context():
+        return {model.__tablename__: model.query.count() for model in (
+            User, Department, Appointment, ArchivedAppointment, Treatment,
+            DoctorAvailability, AvailabilityRule, WaitlistEntry, DailyDoctorStats
+        )}
+
+
+def test_department_delete_takes_its_doctors_and_their_data(app, hospital):
+    cardiology, doctors, patient, waiting = hospital
+
+    assert cascade(app, 'department', cardiology) == {
+        'appointments': 4, 'appointments_archive': 2, 'waitlist_entries': 2,
+        'daily_doctor_stats': 6, 'doctor_availability': 2, 'availability_rules': 2,
+        'users': 2, 'departments': 1,
+    }
+    # Neurology's doctor and both patients stay, with only Neurology's rows
+    assert counts(app) == {
+        'users': 3, 'departments': 1, 'appointments': 2, 'appointments_archive': 1, 'treatments': 1,
+        'doctor_availability': 1, 'availability_rules': 1, 'waitlist_entries': 1, 'daily_doctor_stats': 3,
+    }
+
+
+def test_doctor_delete(app, hospital):
+    _, doctors, _, _ = hospital
+
+    assert cascade(app, 'doctor', doctors[0]) == {
+        'appointments': 2, 'appointments_archive': 1, 'waitlist_entries': 1,
+        'daily_doctor_stats': 3, 'doctor_availability': 1, 'availability_rules': 1, 'users': 1,
+    }
+    with app.app_context():
+        assert db.session.get(User, doctors[0]) is None
+        assert check_daily_stats() == []
+
+
+def test_patient_delete_refreshes_other_doctors_rollups(app, hospital):
+    _, doctors, patient, waiting = hospital
+
+    assert cascade(app, 'patient', patient) == {
+        'appointments': 6, 'appointments_archive': 3, 'waitlist_entries': 0, 'users': 1,
+    }
+    assert cascade(app, 'patient', waiting) == {
+        'appointments': 0, 'appointments_archive': 0, 'waitlist_entries': 3, 'users': 1,
+    }
+    with app.app_context():
+        # The doctors keep their availability; their rollup days emptied out
+        assert DoctorAvailability.query.count() == 3
+        assert DailyDoctorStats.query.count() == 0
+        assert check_daily_stats() == []
+
+
+@pytest.mark.config(CASCADE_DELETE_SYNC_LIMIT=1, CASCADE_DELETE_CHUNK=1)
+def test_large_history_is_deleted_in_chunks(app, client, auth, make_user, hospital):
+    from app.tasks.cascade_delete import permanent_delete
+
+    _, doctors, _, _ = hospital
+    admin = make_user('admin')
+
+    with mock.patch('app.routes.admin.permanent_delete') as task:
+        task.delay.return_value.id = 'task-1'
+        response = client.delete(f'/api/admin/doctors/{doctors[0]}/permanent', headers=auth(admin))
+    assert response.status_code == 202
+    task.delay.assert_called_once_with('doctor', doctors[0])
+    with app.app_context():
+        assert db.session.get(User, doctors[0]).is_active is False
+
+    with mock.patch('app.create_app', return_value=app), \
+            mock.patch.object(permanent_delete, 'update_state') as progress:
+        result = permanent_delete('doctor', doctors[0])
+
+    assert result['status'] == 'success'
+    assert result['deleted_appointments'] == 3
+    assert progress.call_count == 3
+    assert result['deleted']['users'] == 1
+    with app.app_context():
+        assert Appointment.query.filter_by(doctor_id=doctors[0]).count() == 0
+        assert ArchivedAppointment.query.filter_by(doctor_id=doctors[0]).count() == 0
@@ -0,0 +1,105 @@
+"""
+Concurrent booking stress test.
+
+Fires hundreds of parallel bookings at one doctor slot and checks that exactly
+one wins, both with the slot engine in front and with the database unique
+index as the only guard.
+
+Run: python -m pytest test_concurrent_booking.py -q
+"""
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+from app import create_app, db
+from app.models import User, Department, Appointment, DoctorAvailability
+from flask_jwt_extended import create_access_token
+
+PARALLEL_BOOKINGS = 200
+
+
+def make_config(engine_enabled):
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+
+    class StressConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CACHE_TYPE = 'SimpleCache'
+        SLOT_ENGINE_ENABLED = engine_enabled
+        SLOT_ENGINE_BACKEND = 'memory'
+        BOOKING_COMMIT_RETRIES = 10
+
+    return StressConfig
+
+
+def seed(app):
+    """One doctor available tomorrow and PARALLEL_BOOKINGS patients"""
+    with app.app_context():
+        db.create_all()
+
+        department = Department(name='Cardiology')
+        db.session.add(department)
+        db.session.flush()
+
+        doctor = User(username='doctor', email='doctor@test.com', role='doctor',
+                      full_name='Dr. Stress', phone='1234567890',
+                      specialization_id=department.id, consultation_fee=500)
+        doctor.password_hash = 'unused'
+        db.session.add(doctor)
+        db.session.flush()
+
+        db.session.add(DoctorAvailability(
+            doctor_id=doctor.id,
+            date=date.today() + timedelta(days=1),
+            start_time=time(9, 0),
+            end_time=time(17, 0)
+        ))
+
+        tokens = []
+        for i in range(PARALLEL_BOOKINGS):
+            patient = User(username=f'patient{i}', email=f'patient{i}@test.com',
+                           role='patient', full_name=f'Patient {i}', phone='1234567890')
+            patient.password_hash = 'unused'
+            db.session.add(patient)
+            db.session.flush()
+            tokens.append(create_access_token(identity=patient.id))
+
+        db.session.commit()
+        return doctor.id, tokens
+
+
+@pytest.mark.parametrize('engine_enabled', [True, False], ids=['slot-engine', 'db-index-only'])
+def test_parallel_bookings_one_winner(engine_enabled):
+    app = create_app(make_config(engine_enabled))
+    doctor_id, tokens = seed(app)
+    payload = {
+        'doctor_id': doctor_id,
+        'appointment_date': (date.today() + timedelta(days=1)).isoformat(),
+        'appointment_time': '10:00'
+    }
+
+    def book(token):
+        client = app.test_client()
+        response = client.post('/api/patient/appointments', json=payload,
+                               headers={'Authorization': f'Bearer {token}'})
+        return response.status_code
+
+    with mock.patch('app.routes.patient.send_booking_confirmation'), \
+            mock.patch('app.routes.patient.send_pre_appointment_reminder'):
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            statuses = list(pool.map(book, tokens))
+
+    assert statuses.count(201) == 1
+    assert statuses.count(409) == PARALLEL_BOOKINGS - 1
+
+    with app.app_context():
+        booked = Appointment.query.filter_by(doctor_id=doctor_id, status='booked').count()
+        assert booked == 1
@@ -0,0 +1,113 @@
+"""
+Daily doctor stats rollup: every way an appointment changes (booking,
+batch booking, reschedule, cancel, complete, admin edit) leaves
+`flask stats check` clean, and the check finds and repairs drift.
+
+Run: python -m pytest test_daily_stats.py -q
+"""
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import DailyDoctorStats, DoctorAvailability
+
+DAY = date.today() + timedelta(days=1)
+NEXT_DAY = date.today() + timedelta(days=2)
+
+
+@pytest.fixture(autouse=True)
+def no_notifications(app):
+    with mock.patch('app.routes.patient.send_booking_confirmation'), \
+            mock.patch('app.routes.patient.send_pre_appointment_reminder'), \
+            mock.patch('app.routes.admin.send_bulk_booking_notifications'):
+        yield
+
+
+@pytest.fixture
+def doctor(app, make_user, make_department):
+    doctor = make_user('doctor', specialization_id=make_department())
+    with app.app_context():
+        for day in (DAY, NEXT_DAY):
+            db.session.add(DoctorAvailability(doctor_id=doctor, date=day,
+                                              start_time=time(9, 0), end_time=time(12, 0)))
+        db.session.commit()
+    return doctor
+
+
+def stats_check(app, *args):
+    return app.test_cli_runner().invoke(args=['stats', 'check', *args])
+
+
+def assert_consistent(app):
+    result = stats_check(app)
+    assert result.exit_code == 0, result.output
+    assert 'Rollup is consistent' in result.output
+
+
+def rollup(app, doctor, day):
+    with app.app_context():
+        row = DailyDoctorStats.query.filter_by(doctor_id=doctor, day=day).first()
+        return row and (row.total, row.booked, row.completed, row.cancelled)
+
+
+def test_rollup_follows_every_appointment_change(app, client, auth, make_user, doctor):
+    patients = [make_user('patient') for _ in range(4)]
+    ids = []
+    for patient, t in zip(patients[:3], ('09:00', '09:10', '09:20')):
+        response = client.post('/api/patient/appointments', headers=auth(patient), json={
+            'doctor_id': doctor, 'appointment_date': DAY.isoformat(), 'appointment_time': t
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['appointment']['id'])
+    assert rollup(app, doctor, DAY) == (3, 3, 0, 0)
+    assert_consistent(app)
+
+    admin = make_user('admin')
+    response = client.post('/api/admin/appointments/batch', headers=auth(admin), json={'appointments': [
+        {'patient_id': patients[3], 'doctor_id': doctor,
+         'appointment_date': DAY.isoformat(), 'appointment_time': '10:00'}
+    ]})
+    assert response.get_json()['summary']['booked'] == 1
+    assert rollup(app, doctor, DAY) == (4, 4, 0, 0)
+    assert_consistent(app)
+
+    response = client.put(f'/api/patient/appointments/{ids[0]}/reschedule', headers=auth(patients[0]), json={
+        'appointment_date': NEXT_DAY.isoformat(), 'appointment_time': '11:00'
+    })
+    assert response.status_code == 200
+    assert rollup(app, doctor, NEXT_DAY) == (1, 1, 0, 0)
+    assert_consistent(app)
+
+    assert client.post(f'/api/patient/appointments/{ids[1]}/cancel', headers=auth(patients[1])).status_code == 200
+    assert client.post(f'/api/doctor/appointments/{ids[2]}/complete', headers=auth(doctor)).status_code == 200
+    assert rollup(app, doctor, DAY) == (3, 1, 1, 1)
+    assert_consistent(app)
+
+    response = client.put(f'/api/admin/appointments/{ids[0]}', headers=auth(admin), json={
+        'appointment_date': DAY.isoformat(), 'appointment_time': '11:00'
+    })
+    assert response.status_code == 200
+    assert rollup(app, doctor, NEXT_DAY) is None
+    assert rollup(app, doctor, DAY) == (4, 2, 1, 1)
+    assert_consistent(app)
+
+
+def test_check_reports_and_repairs_drift(app, client, auth, make_user, doctor):
+    patient = make_user('patient')
+    client.post('/api/patient/appointments', headers=auth(patient), json={
+        'doctor_id': doctor, 'appointment_date': DAY.isoformat(), 'appointment_time': '09:00'
+    })
+    with app.app_context():
+        DailyDoctorStats.query.filter_by(doctor_id=doctor, day=DAY).update({'booked': 5})
+        db.session.commit()
+
+    result = stats_check(app)
+    assert result.exit_code == 1
+    assert f'doctor {doctor} {DAY} booked: rollup=5 actual=1' in result.output
+
+    result = stats_check(app, '--repair')
+    assert result.exit_code == 0
+    assert 'Repaired 1 doctor-days' in result.output
+    assert_consistent(app)
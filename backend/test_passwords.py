@@ -0,0 +1,57 @@
+"""
+Password hashing under load: every route that hashes or verifies a
+password answers 503 with Retry-After when the hashing pool is full,
+instead of failing with a 500.
+
+Run: python -m pytest test_passwords.py -q
+"""
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import User
+from app.services.passwords import password_hasher, HashingBusy
+
+
+@pytest.fixture
+def busy():
+    with mock.patch.object(password_hasher, '_run', side_effect=HashingBusy()):
+        yield
+
+
+def assert_busy(response):
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_admin_doctor_routes_report_busy_hashing(app, client, auth, make_user, make_department, busy):
+    admin = make_user('admin')
+    department = make_department()
+    doctor = make_user('doctor', specialization_id=department)
+
+    assert_busy(client.post('/api/admin/doctors', headers=auth(admin), json={
+        'username': 'newdoc', 'email': 'newdoc@test.com', 'password': 'secret123',
+        'full_name': 'New Doctor', 'phone': '1234567890', 'specialization_id': department
+    }))
+    assert_busy(client.put(f'/api/admin/doctors/{doctor}', headers=auth(admin), json={
+        'full_name': 'Renamed', 'password': 'secret123'
+    }))
+
+    with app.app_context():
+        assert User.query.filter_by(username='newdoc').first() is None
+        assert db.session.get(User, doctor).full_name != 'Renamed'
+
+
+def test_patient_routes_report_busy_hashing(client, auth, make_user, busy):
+    admin, patient = make_user('admin'), make_user('patient')
+
+    assert_busy(client.put(f'/api/admin/patients/{patient}', headers=auth(admin), json={
+        'password': 'secret123'
+    }))
+    assert_busy(client.post('/api/patient/change-password', headers=auth(patient), json={
+        'current_password': 'old-secret', 'new_password': 'new-secret'
+    }))
+    assert_busy(client.post('/api/auth/change-password', headers=auth(patient), json={
+        'current_password': 'old-secret', 'new_password': 'new-secret'
+    }))
@@ -0,0 +1,78 @@
+"""
+Rate limits on login, registration and booking: a client that empties its
+bucket gets 429 with Retry-After, other clients keep their own buckets, the
+admin counters record who was throttled, and an unreachable Redis falls
+back to process memory.
+
+Run: python -m pytest test_rate_limit.py -q
+"""
+import pytest
+
+LIMITS = {
+    'login': {'ip': (5, 60), 'username': (2, 60)},
+    'register': {'ip': (1, 600)},
+    'booking': {'user': (2, 60)},
+}
+limited = pytest.mark.config(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LIMITS)
+
+
+def login(client, username):
+    return client.post('/api/auth/login', json={'username': username, 'password': 'wrong'})
+
+
+def assert_throttled(response, retry_after):
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(retry_after)
+
+
+@limited
+def test_login_is_limited_per_username_and_ip(client):
+    assert [login(client, 'alice').status_code for _ in range(2)] == [401, 401]
+    # Two tokens refill in 60s, so the next one is 30s away
+    assert_throttled(login(client, 'alice'), 30)
+
+    # Other usernames have their own buckets until the ip bucket runs dry;
+    # the throttled attempt above took no ip token either
+    assert [login(client, name).status_code for name in ('bob', 'bob', 'carol')] == [401, 401, 401]
+    assert_throttled(login(client, 'dave'), 12)
+
+
+@limited
+def test_register_is_limited_per_ip(client):
+    assert client.post('/api/auth/register', json={}).status_code == 400
+    assert_throttled(client.post('/api/auth/register', json={}), 600)
+
+
+@limited
+def test_booking_is_limited_per_user(client, auth, make_user):
+    patient, other = make_user('patient'), make_user('patient')
+    for _ in range(2):
+        assert client.post('/api/patient/appointments', headers=auth(patient), json={}).status_code == 400
+    assert_throttled(client.post('/api/patient/appointments', headers=auth(patient), json={}), 30)
+    assert_throttled(client.put('/api/patient/appointments/1/reschedule', headers=auth(patient), json={}), 30)
+
+    assert client.post('/api/patient/appointments', headers=auth(other), json={}).status_code == 400
+
+
+@limited
+def test_counters_report_throttled_requests(client, auth, make_user):
+    for _ in range(3):
+        login(client, 'alice')
+
+    response = client.get('/api/admin/rate-limits', headers=auth(make_user('admin')))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['policies']['login']['username'] == {'burst': 2, 'seconds': 60}
+    assert body['counters']['login'] == {'allowed': 2, 'throttled': 1, 'throttled_by': {'username': 1}}
+    assert body['counters']['booking'] == {'allowed': 0, 'throttled': 0, 'throttled_by': {}}
+
+
+@pytest.mark.config(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='redis', RATE_LIMITS=LIMITS,
+                    REDIS_URL='redis://127.0.0.1:1/0')
+def test_unreachable_redis_falls_back_to_memory(client):
+    assert [login(client, 'alice').status_code for _ in range(2)] == [401, 401]
+    assert_throttled(login(client, 'alice'), 30)
+
+
+def test_disabled_limiter_never_throttles(client):
+    assert all(login(client, 'alice').status_code == 401 for _ in range(15))
@@ -0,0 +1,70 @@
+"""
+Slot grid: times between two 10-minute slots are rejected, and giving up
+one of two older bookings that share a slot leaves the slot taken.
+
+Run: python -m pytest test_slot_grid.py -q
+"""
+from datetime import date, time, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import Appointment, DoctorAvailability
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def no_notifications(app):
+    with mock.patch('app.routes.patient.send_booking_confirmation'), \
+            mock.patch('app.routes.patient.send_pre_appointment_reminder'):
+        yield
+
+
+@pytest.fixture
+def doctor(app, make_user, make_department):
+    doctor = make_user('doctor', specialization_id=make_department())
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor, date=TOMORROW,
+                                          start_time=time(9, 0), end_time=time(12, 0)))
+        db.session.commit()
+    return doctor
+
+
+def book(client, auth, patient, doctor, t):
+    return client.post('/api/patient/appointments', headers=auth(patient), json={
+        'doctor_id': doctor, 'appointment_date': TOMORROW.isoformat(), 'appointment_time': t
+    })
+
+
+def test_times_off_the_grid_are_rejected(client, auth, make_user, doctor):
+    patient = make_user('patient')
+    response = book(client, auth, patient, doctor, '10:05')
+    assert response.status_code == 400
+
+    admin = make_user('admin')
+    response = client.post('/api/admin/availability/batch', headers=auth(admin), json={'entries': [
+        {'doctor_id': doctor, 'date': TOMORROW.isoformat(), 'start_time': '09:00', 'end_time': '17:00',
+         'lunch_break_start': '12:05', 'lunch_break_end': '13:00'}
+    ]})
+    assert response.get_json()['summary']['error'] == 1
+
+
+def test_cancelling_one_of_two_bookings_in_a_slot_keeps_it_taken(app, client, auth, make_user, doctor):
+    first, second, late = make_user('patient'), make_user('patient'), make_user('patient')
+    with app.app_context():
+        # Booked before times had to be on the grid: both sit in the 10:00 slot
+        legacy = [Appointment(doctor_id=doctor, patient_id=patient, appointment_date=TOMORROW,
+                              appointment_time=t, status='booked', consultation_fee=500)
+                  for patient, t in ((first, time(10, 0)), (second, time(10, 5)))]
+        db.session.add_all(legacy)
+        db.session.commit()
+        first_id = legacy[0].id
+
+    assert book(client, auth, late, doctor, '10:00').status_code == 409
+
+    response = client.post(f'/api/patient/appointments/{first_id}/cancel', headers=auth(first))
+    assert response.status_code == 200
+    assert book(client, auth, late, doctor, '10:00').status_code == 409
+    assert book(client, auth, late, doctor, '10:10').status_code == 201
@@ -0,0 +1,57 @@
+"""
+Slot change stream tokens: the stream only opens with a short-lived stream
+token in the query string, and that token is good for nothing else.
+
+Run: python -m pytest test_slot_stream.py -q
+"""
+from datetime import date, timedelta
+
+import pytest
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture
+def stream_token(client, auth, make_user):
+    patient = make_user('patient')
+    response = client.post('/api/patient/slots/stream-token', headers=auth(patient))
+    assert response.status_code == 200
+    return patient, response.get_json()['stream_token']
+
+
+def stream_url(doctor_id, token):
+    return f'/api/patient/slots/stream?doctor_id={doctor_id}&date={TOMORROW.isoformat()}&jwt={token}'
+
+
+@pytest.mark.config(SLOT_EVENTS_STREAM_SECONDS=0)
+def test_stream_opens_with_stream_token(client, make_user, make_department, stream_token):
+    doctor = make_user('doctor', specialization_id=make_department())
+    _, token = stream_token
+
+    response = client.get(stream_url(doctor, token))
+    assert response.status_code == 200
+    assert 'event: snapshot\ndata: {"taken_slots": []}' in response.get_data(as_text=True)
+
+
+def test_session_token_stays_out_of_the_url(client, auth, make_user):
+    patient = make_user('patient')
+    session_token = auth(patient)['Authorization'].split()[1]
+
+    assert client.get(stream_url(1, session_token)).status_code == 401
+    # Nor can the stream be opened with the header, which EventSource can't send anyway
+    assert client.get(stream_url(1, ''), headers=auth(patient)).status_code == 401
+
+
+def test_stream_token_opens_nothing_else(client, stream_token):
+    _, token = stream_token
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.get('/api/patient/appointments', headers=headers).status_code == 401
+    assert client.post('/api/patient/slots/stream-token', headers=headers).status_code == 401
+
+
+@pytest.mark.config(SLOT_EVENTS_TOKEN_SECONDS=-1)
+def test_expired_stream_token_is_rejected(client, stream_token):
+    _, token = stream_token
+    assert client.get(stream_url(1, token)).status_code == 401
@@ -0,0 +1,88 @@
+"""
+Token revocation: deactivating a user ends their existing sessions, a
+token issued right after reactivation works even within the same second,
+a deactivation that can't be stored in Redis doesn't commit, and the
+in-process store stays bounded.
+
+Run: python -m pytest test_token_revocation.py -q
+"""
+import time
+from unittest import mock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app import db
+from app.models import User
+from app.services.token_revocation import token_revocation
+
+
+def set_active(app, user_id, active):
+    with app.app_context():
+        db.session.get(User, user_id).is_active = active
+        db.session.commit()
+
+
+def test_deactivation_ends_sessions_but_not_the_next_login(app, client, auth, make_user):
+    patient = make_user('patient')
+    old = auth(patient)
+    assert client.get('/api/auth/me', headers=old).status_code == 200
+
+    set_active(app, patient, False)
+    set_active(app, patient, True)
+    new = auth(patient)
+
+    # Usually all within one second, which the whole-second iat can't order
+    assert client.get('/api/auth/me', headers=old).status_code == 401
+    assert client.get('/api/auth/me', headers=new).status_code == 200
+
+
+class FlakyRedis:
+    """Shared revocation keys, with writes failing while `down`"""
+
+    def __init__(self):
+        self.keys = {}
+        self.down = False
+
+    def set(self, key, value, ex=None):
+        if self.down:
+            raise ConnectionError('Redis is down')
+        self.keys[key] = str(value).encode()
+
+    def get(self, key):
+        return self.keys.get(key)
+
+
+@pytest.mark.config(TOKEN_REVOCATION_BACKEND='redis')
+def test_deactivation_fails_until_redis_stores_it(app, client, auth, make_user):
+    admin, patient = make_user('admin'), make_user('patient')
+    token = auth(patient)
+    redis = FlakyRedis()
+
+    with mock.patch('app.services.token_revocation.redis_client', redis):
+        redis.down = True
+        response = client.delete(f'/api/admin/patients/{patient}', headers=auth(admin))
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        with app.app_context():
+            assert db.session.get(User, patient).is_active is True
+
+        redis.down = False
+        assert client.delete(f'/api/admin/patients/{patient}', headers=auth(admin)).status_code == 200
+
+        # Another worker knows only what Redis holds
+        token_revocation.memory.clear()
+        assert client.get('/api/auth/me', headers=token).status_code == 401
+
+
+@pytest.mark.config(TOKEN_REVOCATION_MEMORY_SIZE=3)
+def test_memory_store_is_bounded(app):
+    for user_id in range(1, 6):
+        token_revocation.revoke_user(user_id)
+    assert list(token_revocation.memory) == [3, 4, 5]
+
+    # Revocations older than a token's lifetime are dropped first
+    token_revocation.memory.clear()
+    token_revocation.revoke_user(1, at=time.time() - token_revocation.ttl - 1)
+    token_revocation.revoke_user(2)
+    assert list(token_revocation.memory) == [2]
@@ -0,0 +1,233 @@
+"""
+Waitlist flow: a cancelled slot is held for the first waiting patient,
+shown as taken to everyone else, and either accepted or expired and passed
+on to the next patient in line.
+
+Run: python -m pytest test_waitlist.py -q
+"""
+from datetime import date, time, datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from app import db
+from app.models import User, Appointment, DoctorAvailability, WaitlistEntry
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def no_notifications(app):
+    with mock.patch('app.routes.patient.send_booking_confirmation'), \
+            mock.patch('app.routes.patient.send_pre_appointment_reminder'), \
+            mock.patch('app.services.waitlist._enqueue_offer'):
+        yield
+
+
+@pytest.fixture
+def full_day(app, client, auth, make_user, make_department):
+    """A doctor with two slots tomorrow, both booked, and two patients waiting"""
+    doctor = make_user('doctor', specialization_id=make_department())
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor, date=TOMORROW,
+                                          start_time=time(9, 0), end_time=time(9, 20)))
+        db.session.commit()
+
+    booked = {}
+    for t in ('09:00', '09:10'):
+        patient = make_user('patient')
+        response = client.post('/api/patient/appointments', headers=auth(patient), json={
+            'doctor_id': doctor, 'appointment_date': TOMORROW.isoformat(), 'appointment_time': t
+        })
+        assert response.status_code == 201
+        booked[t] = (patient, response.get_json()['appointment']['id'])
+
+    waiting = []
+    for _ in range(2):
+        patient = make_user('patient')
+        response = client.post('/api/patient/waitlist', headers=auth(patient), json={
+            'doctor_id': doctor, 'date': TOMORROW.isoformat()
+        })
+        assert response.status_code == 201
+        waiting.append((patient, response.get_json()['entry']['id']))
+
+    return doctor, booked, waiting
+
+
+def cancel(client, auth, booked, t='09:00'):
+    patient, appointment_id = booked[t]
+    response = client.post(f'/api/patient/appointments/{appointment_id}/cancel', headers=auth(patient))
+    assert response.status_code == 200
+
+
+def entry_status(app, entry_id):
+    with app.app_context():
+        entry = db.session.get(WaitlistEntry, entry_id)
+        return entry.status, entry.offered_time
+
+
+def test_cancelled_slot_is_held_for_first_waiting_patient(app, client, auth, make_user, full_day):
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+
+    assert entry_status(app, waiting[0][1]) == ('offered', time(9, 0))
+    assert entry_status(app, waiting[1][1]) == ('waiting', None)
+
+    # Everyone else sees the held slot as taken and can't book it
+    outsider = make_user('patient')
+    response = client.get(f'/api/patient/booked-slots?doctor_id={doctor}&date={TOMORROW.isoformat()}',
+                          headers=auth(outsider))
+    assert response.get_json()['booked_slots'] == ['09:00', '09:10']
+    response = client.post('/api/patient/appointments', headers=auth(outsider), json={
+        'doctor_id': doctor, 'appointment_date': TOMORROW.isoformat(), 'appointment_time': '09:00'
+    })
+    assert response.status_code == 409
+
+
+def test_held_slot_is_not_listed_as_free(app, client, auth, make_user, full_day):
+    from app.services.slots import slot_engine, DayBitmap
+
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    with app.app_context():
+        department = db.session.get(User, doctor).specialization_id
+
+    outsider = make_user('patient')
+    # The booked and held slots fill the day, which the grouped counts show
+    # without a bitmap; others are loaded in one batch per window
+    with mock.patch.object(slot_engine, 'get_day', side_effect=AssertionError('per-day load')), \
+            mock.patch.object(DayBitmap, 'from_availability', side_effect=AssertionError('bitmap built')):
+        response = client.get(f'/api/patient/next-available?specialization_id={department}',
+                              headers=auth(outsider))
+    assert response.get_json()['slots'] == []
+
+    response = client.get(f'/api/patient/doctors?summary=1&specialization_id={department}',
+                          headers=auth(outsider))
+    assert response.get_json()['doctors'][0]['slots_remaining'] == 0
+
+
+def test_accepting_offer_books_held_slot(app, client, auth, full_day):
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    patient, entry_id = waiting[0]
+
+    response = client.post(f'/api/patient/waitlist/{entry_id}/accept', headers=auth(patient), json={})
+    assert response.status_code == 201
+    assert response.get_json()['appointment']['appointment_time'] == '09:00'
+    assert entry_status(app, entry_id)[0] == 'booked'
+
+    response = client.post(f'/api/patient/waitlist/{entry_id}/accept', headers=auth(patient), json={})
+    assert response.status_code == 410
+
+
+def test_expired_offer_passes_to_next_patient(app, client, auth, full_day):
+    from app.tasks.waitlist import expire_waitlist_offer
+
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    (first, first_entry), (second, second_entry) = waiting
+
+    with mock.patch('app.create_app', return_value=app):
+        result = expire_waitlist_offer(first_entry)
+    assert result['next_entry_id'] == second_entry
+    assert entry_status(app, first_entry)[0] == 'expired'
+    assert entry_status(app, second_entry) == ('offered', time(9, 0))
+
+    response = client.post(f'/api/patient/waitlist/{first_entry}/accept', headers=auth(first), json={})
+    assert response.status_code == 410
+    response = client.post(f'/api/patient/waitlist/{second_entry}/accept', headers=auth(second), json={})
+    assert response.status_code == 201
+
+
+def test_leaving_after_offer_expired_passes_it_on(app, client, auth, full_day):
+    from app.tasks.waitlist import expire_waitlist_offer
+
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    (first, first_entry), (second, second_entry) = waiting
+
+    # Expired, but the expiry job hasn't run yet
+    with app.app_context():
+        db.session.get(WaitlistEntry, first_entry).offer_expires_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+
+    assert client.delete(f'/api/patient/waitlist/{first_entry}', headers=auth(first)).status_code == 200
+    assert entry_status(app, first_entry)[0] == 'cancelled'
+    assert entry_status(app, second_entry) == ('offered', time(9, 0))
+
+    with mock.patch('app.create_app', return_value=app):
+        assert expire_waitlist_offer(first_entry)['status'] == 'skipped'
+    assert entry_status(app, second_entry) == ('offered', time(9, 0))
+
+
+def test_admin_move_offers_freed_slot_unless_retaken(app, client, auth, make_user, full_day):
+    doctor, booked, waiting = full_day
+    admin, outsider = make_user('admin'), make_user('patient')
+    with app.app_context():
+        db.session.add(DoctorAvailability(doctor_id=doctor, date=TOMORROW + timedelta(days=1),
+                                          start_time=time(9, 0), end_time=time(9, 20)))
+        db.session.commit()
+
+    from app.routes import admin as admin_routes
+    commit = admin_routes.commit_slot_change
+
+    def commit_then_rebook(apply_change):
+        commit(apply_change)
+        # Someone else books 09:00 before the route gets to offer it
+        with db.engine.begin() as connection:
+            connection.execute(Appointment.__table__.insert().values(
+                doctor_id=doctor, patient_id=outsider, appointment_date=TOMORROW,
+                appointment_time=time(9, 0), status='booked', consultation_fee=500
+            ))
+
+    with mock.patch('app.routes.admin.commit_slot_change', commit_then_rebook):
+        response = client.put(f'/api/admin/appointments/{booked["09:00"][1]}', headers=auth(admin), json={
+            'appointment_date': (TOMORROW + timedelta(days=1)).isoformat()
+        })
+    assert response.status_code == 200
+    assert entry_status(app, waiting[0][1]) == ('waiting', None)
+
+    response = client.put(f'/api/admin/appointments/{booked["09:10"][1]}', headers=auth(admin), json={
+        'status': 'cancelled'
+    })
+    assert response.status_code == 200
+    assert entry_status(app, waiting[0][1]) == ('offered', time(9, 10))
+
+
+def test_offer_expiring_during_accept_is_not_booked(app, client, auth, full_day):
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    patient, entry_id = waiting[0]
+
+    from app.routes import patient as patient_routes
+    commit = patient_routes.commit_slot_change
+
+    def expire_then_commit(apply_change):
+        # The expiry job wins the race after the route's own offer check
+        with db.engine.begin() as connection:
+            connection.execute(WaitlistEntry.__table__.update().where(
+                WaitlistEntry.__table__.c.id == entry_id
+            ).values(status='expired'))
+        commit(apply_change)
+
+    with mock.patch('app.routes.patient.commit_slot_change', expire_then_commit):
+        response = client.post(f'/api/patient/waitlist/{entry_id}/accept', headers=auth(patient), json={})
+
+    assert response.status_code == 409
+    assert entry_status(app, entry_id)[0] == 'expired'
+    with app.app_context():
+        assert Appointment.query.filter_by(patient_id=patient).count() == 0
+
+
+def test_offer_for_deactivated_doctor_is_not_booked(app, client, auth, full_day):
+    doctor, booked, waiting = full_day
+    cancel(client, auth, booked)
+    patient, entry_id = waiting[0]
+
+    with app.app_context():
+        db.session.get(WaitlistEntry, entry_id).doctor.is_active = False
+        db.session.commit()
+
+    response = client.post(f'/api/patient/waitlist/{entry_id}/accept', headers=auth(patient), json={})
+    assert response.status_code == 404
+    assert entry_status(app, entry_id)[0] == 'offered'
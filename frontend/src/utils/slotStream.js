@@ -0,0 +1,51 @@
+import apiClient from '@/utils/api'
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5000'
+const RECONNECT_MS = 3000
+
+// Live slot changes for one doctor and date over server-sent events.
+// EventSource cannot send headers, so the URL carries a short-lived stream
+// token instead of the session token. The token is only good for opening
+// a stream, so every reconnect (the server ends streams after a few
+// minutes) fetches a new one; each connection starts with a fresh snapshot.
+export const subscribeSlotChanges = (doctorId, date, { onSnapshot, onSlot }) => {
+  let source = null
+  let closed = false
+  let retryTimer = null
+
+  const retry = () => {
+    if (!closed) {
+      retryTimer = setTimeout(connect, RECONNECT_MS)
+    }
+  }
+
+  const connect = async () => {
+    let token
+    try {
+      const response = await apiClient.post('/api/patient/slots/stream-token')
+      token = response.data.stream_token
+    } catch (error) {
+      retry()
+      return
+    }
+    if (closed) return
+
+    const params = new URLSearchParams({ doctor_id: doctorId, date, jwt: token })
+    source = new EventSource(`${API_BASE_URL}/api/patient/slots/stream?${params}`)
+    source.addEventListener('snapshot', (event) => onSnapshot(JSON.parse(event.data).taken_slots))
+    source.addEventListener('slot', (event) => onSlot(JSON.parse(event.data)))
+    // Don't let the browser reconnect with a token that may have expired
+    source.onerror = () => {
+      source.close()
+      retry()
+    }
+  }
+
+  connect()
+
+  return () => {
+    closed = true
+    clearTimeout(retryTimer)
+    if (source) source.close()
+  }
+}